@@ -0,0 +1,44 @@
+"""
+Small benchmarks to measure the performance of the hot paths of the viewers.
+They run without a visible window by using the dummy video driver of SDL.
+"""
+import os
+import time
+from typing import Callable, Tuple
+
+import numpy as np
+
+# keeps the output of benchmarks machine-readable
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+
+def init_headless(screen_size: Tuple[int, int] = (1280, 720)):
+    """
+    Initializes pygame with the dummy video driver and creates a screen of the given size.
+
+    :param screen_size: The size of the screen to create
+    :return: The created screen surface
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    import pygame as pg
+    pg.init()
+    return pg.display.set_mode(screen_size)
+
+
+def measure(func: Callable, repeat: int = 20, warmup: int = 2) -> float:
+    """
+    Calls func repeatedly and returns the median runtime of one call in milliseconds.
+
+    :param func: The function to measure. Is called without arguments.
+    :param repeat: The number of measured calls
+    :param warmup: The number of calls before measuring starts
+    """
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000.0
@@ -0,0 +1,103 @@
+"""
+Measures the memory allocated by the stages of the frames of the dim2 viewer with tracemalloc, while the coordinate
+system of a reference scene is dragged and zoomed. Reported are the 95th percentile and the maximum of the peak bytes
+of every stage, which show the temporary arrays of a frame, and the source lines, that hold the most memory.
+The viewer records the same statistics with the environment variable LINEAR_ALGEBRA_TRACE_ALLOCATIONS.
+
+Run with: python3 -m linear_algebra_testcase.benchmarks.allocations [--frames 200] [--top 15]
+"""
+import argparse
+import tracemalloc
+from typing import Dict
+
+import pygame as pg
+
+from linear_algebra_testcase.benchmarks import init_headless
+
+REFERENCE_ELEMENTS = 20
+REFERENCE_FRAMES = 200
+# tracing makes frames slow, so the test measures fewer frames
+TEST_FRAMES = 60
+# frames before this one build the user interface and fill the caches and are not measured
+WARMUP_FRAMES = 10
+# the upper bound of the 95th percentile of the peak bytes of a whole frame of the reference scene, about five times
+# the measured peak
+MAX_FRAME_PEAK_BYTES = 256 * 2**10
+
+
+def create_frame_events(index: int):
+    """
+    Returns the events of the frame with the given index: the coordinate system is dragged from the bottom left, where
+    the reference scene has no elements, in a square and zoomed every tenth frame.
+    """
+    if index == 0:
+        return [pg.event.Event(pg.MOUSEMOTION, pos=(200, 600), rel=(0, 0), buttons=(0, 0, 0), touch=False),
+                pg.event.Event(pg.MOUSEBUTTONDOWN, pos=(200, 600), button=1, touch=False)]
+    if index % 10 == 0:
+        return [pg.event.Event(pg.MOUSEWHEEL, x=0, y=1 if index % 20 else -1, flipped=False, touch=False)]
+    rel = [(3, 0), (0, -3), (-3, 0), (0, 3)][index // 25 % 4]
+    return [pg.event.Event(pg.MOUSEMOTION, pos=(200, 600), rel=rel, buttons=(1, 0, 0), touch=False)]
+
+
+def measure_frame_allocations(num_frames: int = REFERENCE_FRAMES, num_elements: int = REFERENCE_ELEMENTS):
+    """
+    Runs the frames of the reference scene in a dim2 viewer, whose profiler tracks allocations.
+
+    :return: The profiler of the viewer
+    """
+    init_headless()
+
+    from linear_algebra_testcase.benchmarks.ui_build import create_element_buffer
+    from linear_algebra_testcase.common.profiler import FrameProfiler
+    from linear_algebra_testcase.dim2.__main__ import Main
+
+    main = Main()
+    # definitions are evaluated while updating, so all allocations are traced in this process
+    main.element_buffer.close()
+    main.element_buffer.evaluator = None
+    reference = create_element_buffer(num_elements)
+    main.element_buffer.elements.extend(reference.elements)
+    main.element_buffer.transforms.extend(reference.transforms)
+    main.element_buffer.transformed.extend(reference.transformed)
+
+    profiler = FrameProfiler(capacity=num_frames, enabled=False, track_allocations=True)
+    main.profiler = profiler
+    main.renderer.profiler = profiler
+    for index in range(num_frames + WARMUP_FRAMES):
+        if index == WARMUP_FRAMES:
+            profiler.enabled = True
+        main.handle_events(create_frame_events(index), index * 16)
+    return profiler
+
+
+def test_frame_allocations():
+    stats = measure_frame_allocations(TEST_FRAMES).get_allocation_stats()['peak']
+    tracemalloc.stop()
+    assert stats['total']['count'] == TEST_FRAMES
+    assert stats['total']['p95'] < MAX_FRAME_PEAK_BYTES, stats['total']
+
+
+def format_stats(stats: Dict[str, Dict[str, float]]) -> str:
+    lines = ['{:<18} {:>10} {:>10}'.format('stage [KiB]', 'p95', 'max')]
+    for name, stage_stats in stats.items():
+        lines.append('{:<18} {:>10.1f} {:>10.1f}'.format(name, stage_stats['p95'] / 1024, stage_stats['max'] / 1024))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures the memory allocated by the frames of the dim2 viewer.')
+    parser.add_argument('--frames', type=int, default=REFERENCE_FRAMES, help='the number of measured frames')
+    parser.add_argument('--top', type=int, default=15, help='the number of source lines to report')
+    args = parser.parse_args()
+
+    profiler = measure_frame_allocations(args.frames)
+    allocation_stats = profiler.get_allocation_stats()
+    print('peak bytes per frame')
+    print(format_stats(allocation_stats['peak']))
+    print('net bytes per frame')
+    print(format_stats(allocation_stats['net']))
+    print(profiler.get_allocation_report(args.top))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Measures an animated definition against the number of points. Compares evaluating the definition for every rendered
+frame with showing a frame, that was precomputed by evaluate_frames. Precomputing all frames happens once after an
+element used by the definition changed. It is compared with evaluating all frames one by one.
+
+Run with: python3 -m linear_algebra_testcase.benchmarks.animation
+"""
+import numpy as np
+
+from linear_algebra_testcase.benchmarks import measure
+
+POINT_COUNTS = [100, 1000, 10000, 100000]
+DEFINITION = 'rot(t) @ u1 * (1.5 + np.sin(3 * t))'
+
+
+def main():
+    from linear_algebra_testcase.common.animation import TIME_NAME, evaluate_frames, get_frame_times
+    from linear_algebra_testcase.common.elements_core import ElementBuffer, RenderKind
+    from linear_algebra_testcase.common.expressions import Expression
+    from linear_algebra_testcase.dim2.elements import CustomTransformed, MultiVectorObject
+
+    constants = CustomTransformed.get_eval_constants()
+    expression = Expression(DEFINITION, frozenset(constants))
+    rng = np.random.default_rng(0)
+    print('{:>8} {:>8} {:>16} {:>16} {:>21} {:>16}'.format(
+        'points', 'frames', 'eval frame [us]', 'show frame [us]', 'frames one by one [ms]', 'precompute [ms]'
+    ))
+    for num_points in POINT_COUNTS:
+        variables = dict(constants)
+        variables['u1'] = rng.uniform(-10.0, 10.0, size=(2, num_points))
+        frames = evaluate_frames(expression, variables, {'u1': 0})
+        times = get_frame_times(len(frames))
+
+        def eval_frame():
+            # a new version, so cached sub-expressions are not reused
+            expression.evaluate(dict(variables, **{TIME_NAME: 1.0}), {'u1': object(), TIME_NAME: object()})
+
+        def one_by_one():
+            version = object()
+            for time in times:
+                expression.evaluate(dict(variables, **{TIME_NAME: time}), {'u1': version, TIME_NAME: float(time)})
+
+        def precompute():
+            evaluate_frames(expression, variables, {'u1': object()}, len(times))
+
+        element_buffer = ElementBuffer()
+        element_buffer.elements.append(MultiVectorObject('u1', variables['u1']))
+        custom = CustomTransformed('t1', RenderKind.POINT, element_buffer)
+        custom.definition = DEFINITION
+        custom.compile_definition()
+        element_buffer.transformed.append(custom)
+        element_buffer.update()
+
+        def show_frame():
+            element_buffer.time += 1.0 / 30.0
+            custom.update()
+
+        eval_time = measure(eval_frame, repeat=20)
+        show_time = measure(show_frame, repeat=100)
+        one_by_one_time = measure(one_by_one, repeat=5)
+        precompute_time = measure(precompute, repeat=5)
+        print('{:>8} {:>8} {:>16.2f} {:>16.2f} {:>21.3f} {:>16.3f}'.format(
+            num_points, len(times), eval_time * 1000, show_time * 1000, one_by_one_time, precompute_time
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Measures the throughput of CoordinateSystem.transform and CoordinateSystem.transform_inverse of the dim2 coordinate
+system, compared to transforming with a pseudo inverse computed on every call.
+Also compares transforming the arrays of many elements one by one with a single call to transform_batch.
+
+Run with: python3 -m linear_algebra_testcase.benchmarks.coordinate_system
+"""
+import numpy as np
+
+from linear_algebra_testcase.benchmarks import measure
+
+POINT_COUNTS = [1, 100, 10000]
+ELEMENT_COUNTS = [10, 100, 1000]
+
+
+def transform_inverse_pinv(coordinate_system, mat: np.ndarray):
+    """
+    Reference implementation, that computes the pseudo inverse on every call.
+    """
+    from linear_algebra_testcase.dim2.coordinate_system import transform
+
+    return transform(np.linalg.pinv(coordinate_system.coord), mat)
+
+
+def main():
+    from linear_algebra_testcase.dim2.coordinate_system import CoordinateSystem
+
+    coordinate_system = CoordinateSystem()
+    rng = np.random.default_rng(0)
+    print('{:>8} {:>16} {:>15} {:>22}'.format('points', 'transform [us]', 'pinv [us]', 'cached inverse [us]'))
+    for num_points in POINT_COUNTS:
+        points = rng.uniform(-6.0, 6.0, size=(2, num_points))
+        if num_points == 1:
+            points = points[:, 0]  # a single mouse position of shape [2,]
+        forward = measure(lambda: coordinate_system.transform(points), repeat=200)
+        pinv = measure(lambda: transform_inverse_pinv(coordinate_system, points), repeat=200)
+        cached = measure(lambda: coordinate_system.transform_inverse(points), repeat=200)
+        print('{:>8} {:>16.2f} {:>15.2f} {:>22.2f}'.format(num_points, forward * 1000, pinv * 1000, cached * 1000))
+
+    print()
+    print('{:>8} {:>18} {:>12}'.format('elements', 'per element [us]', 'batch [us]'))
+    for num_elements in ELEMENT_COUNTS:
+        # elements with 1 to 41 points, like vectors, transforms and unit circles
+        arrays = [rng.uniform(-6.0, 6.0, size=(2, 1 + index % 3 * 20)) for index in range(num_elements)]
+        per_element = measure(lambda: [coordinate_system.transform(array) for array in arrays], repeat=50)
+        batch = measure(lambda: coordinate_system.transform_batch(arrays), repeat=50)
+        print('{:>8} {:>18.2f} {:>12.2f}'.format(num_elements, per_element * 1000, batch * 1000))
+
+
+if __name__ == '__main__':
+    main()
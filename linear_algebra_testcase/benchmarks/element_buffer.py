@@ -0,0 +1,67 @@
+"""
+Measures rendering and hover testing of scenes with many vectors, with the coordinates stored in the PointArena of the
+ElementBuffer compared to elements, that own their coordinates.
+Half of the vectors are outside the screen, so the arena can cull them. Removing measures removing every tenth vector
+from the arena and appending the same number of new vectors.
+
+Run with: python3 -m linear_algebra_testcase.benchmarks.element_buffer
+"""
+import numpy as np
+
+from linear_algebra_testcase.benchmarks import init_headless, measure
+
+ELEMENT_COUNTS = [100, 1000, 5000]
+
+
+def create_vectors(num_elements: int, rng: np.random.Generator):
+    from linear_algebra_testcase.common.elements_core import RenderKind
+    from linear_algebra_testcase.dim2.elements import Vector
+
+    return [
+        Vector('v{}'.format(index), rng.uniform(-12.0, 12.0, size=2), RenderKind.POINT)
+        for index in range(num_elements)
+    ]
+
+
+def main():
+    screen = init_headless()
+
+    from linear_algebra_testcase.common.elements_core import ElementBuffer, render_elements
+    from linear_algebra_testcase.dim2.coordinate_system import CoordinateSystem
+
+    coordinate_system = CoordinateSystem()
+    mouse_position = np.array([640, 360])
+    rng = np.random.default_rng(0)
+    print('{:>8} {:>18} {:>14} {:>17} {:>13} {:>13}'.format(
+        'elements', 'render owned [ms]', 'render arena', 'hover owned [ms]', 'hover arena', 'remove arena'
+    ))
+    for num_elements in ELEMENT_COUNTS:
+        owned = create_vectors(num_elements, rng)
+        element_buffer = ElementBuffer()
+        element_buffer.elements.extend(create_vectors(num_elements, rng))
+        element_buffer.update()
+
+        def hover(elements):
+            # a mouse motion changes the coordinate system, so cached hover results can not be reused
+            coordinate_system.translate(np.array([0.0, 0.0]))
+            return [element.is_hovered(mouse_position, coordinate_system) for element in elements]
+
+        def remove():
+            for element in element_buffer.elements[::10]:
+                element.has_to_be_removed = True
+            element_buffer.remove_elements()
+            element_buffer.elements.extend(create_vectors(num_elements - len(element_buffer.elements), rng))
+            element_buffer.update()
+
+        render_owned = measure(lambda: render_elements(screen, coordinate_system, owned))
+        render_arena = measure(lambda: render_elements(screen, coordinate_system, element_buffer.elements))
+        hover_owned = measure(lambda: hover(owned))
+        hover_arena = measure(lambda: hover(element_buffer.elements))
+        remove_arena = measure(remove, repeat=5)
+        print('{:>8} {:>18.3f} {:>14.3f} {:>17.3f} {:>13.3f} {:>13.3f}'.format(
+            num_elements, render_owned, render_arena, hover_owned, hover_arena, remove_arena
+        ))
+
+
+if __name__ == '__main__':
+    main()
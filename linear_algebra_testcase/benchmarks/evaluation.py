@@ -0,0 +1,78 @@
+"""
+Measures how long a change of a MultiVectorObject blocks the viewer, while a CustomTransformed over it is evaluated
+again. Compares the evaluation while updating the ElementBuffer with the evaluation in the worker process of a
+WorkerEvaluator. Both include the time to change the coordinates. For the worker, the time until the result arrives is
+measured as well.
+
+Run with: python3 -m linear_algebra_testcase.benchmarks.evaluation
+"""
+import time
+
+import numpy as np
+
+from linear_algebra_testcase.benchmarks import measure
+
+POINT_COUNTS = [10000, 100000, 1000000]
+DEFINITION = 'np.sin(u1) * np.linalg.norm(u1, axis=0) + np.cumsum(u1, axis=1) / u1.shape[1]'
+
+
+def create_element_buffer(evaluator, num_points: int):
+    from linear_algebra_testcase.common.elements_core import ElementBuffer, RenderKind
+    from linear_algebra_testcase.dim2.elements import CustomTransformed, MultiVectorObject
+
+    element_buffer = ElementBuffer(evaluator)
+    element_buffer.elements.append(MultiVectorObject('u1', np.random.default_rng(0).normal(size=(2, num_points))))
+    custom = CustomTransformed('t1', RenderKind.POINT, element_buffer)
+    custom.definition = DEFINITION
+    custom.compile_definition()
+    element_buffer.transformed.append(custom)
+    return element_buffer
+
+
+def wait_for_results(element_buffer):
+    element_buffer.update()
+    while element_buffer.is_evaluating():
+        time.sleep(0.0005)
+        element_buffer.update()
+
+
+def main():
+    from linear_algebra_testcase.common.evaluation import WorkerEvaluator
+    from linear_algebra_testcase.dim2.elements import CustomTransformed
+
+    evaluator = WorkerEvaluator(CustomTransformed.get_eval_constants)
+    print('{:>8} {:>18} {:>18} {:>20}'.format('points', 'inline block [ms]', 'worker block [ms]', 'worker result [ms]'))
+    for num_points in POINT_COUNTS:
+        inline_buffer = create_element_buffer(None, num_points)
+        worker_buffer = create_element_buffer(evaluator, num_points)
+        wait_for_results(worker_buffer)
+
+        def change(element_buffer):
+            vectors = element_buffer.elements[0]
+            vectors.coordinates = vectors.coordinates * 1.0001
+
+        def block(element_buffer):
+            change(element_buffer)
+            element_buffer.update()
+
+        def result():
+            change(worker_buffer)
+            wait_for_results(worker_buffer)
+
+        inline_time = measure(lambda: block(inline_buffer), repeat=10)
+        # the waiting for the result is not part of the measured blocking time
+        worker_times = []
+        for _ in range(10):
+            start = time.perf_counter()
+            block(worker_buffer)
+            worker_times.append((time.perf_counter() - start) * 1000.0)
+            wait_for_results(worker_buffer)
+        result_time = measure(result, repeat=10)
+        print('{:>8} {:>18.3f} {:>18.3f} {:>20.3f}'.format(
+            num_points, inline_time, float(np.median(worker_times)), result_time
+        ))
+    evaluator.close()
+
+
+if __name__ == '__main__':
+    main()
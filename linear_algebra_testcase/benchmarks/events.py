@@ -0,0 +1,56 @@
+"""
+Measures the time to handle a mouse motion against the number of vectors in the scene. Compares broadcasting the
+event to every element with the EventDispatcher of the ElementBuffer.
+
+Run with: python3 -m linear_algebra_testcase.benchmarks.events
+"""
+import numpy as np
+
+from linear_algebra_testcase.benchmarks import init_headless, measure
+
+ELEMENT_COUNTS = [100, 1000, 10000]
+
+
+def broadcast(element_buffer, event, coordinate_system, mouse_position: np.ndarray):
+    """
+    Reference implementation, that lets every element handle the event.
+    """
+    for element in element_buffer.all_elements():
+        element.handle_event(event, coordinate_system, mouse_position)
+
+
+def main():
+    init_headless()
+
+    import pygame as pg
+    from linear_algebra_testcase.common.elements_core import ElementBuffer
+    from linear_algebra_testcase.dim2.coordinate_system import CoordinateSystem
+    from linear_algebra_testcase.dim2.elements import Vector, Transform2D
+
+    coordinate_system = CoordinateSystem()
+    rng = np.random.default_rng(0)
+    mouse_positions = rng.integers(0, 720, size=(50, 2))
+    events = [pg.event.Event(pg.MOUSEMOTION, pos=tuple(mouse), rel=(1, 1), buttons=(0, 0, 0))
+              for mouse in mouse_positions]
+    print('{:>8} {:>16} {:>15}'.format('elements', 'broadcast [us]', 'dispatch [us]'))
+    for num_elements in ELEMENT_COUNTS:
+        element_buffer = ElementBuffer()
+        element_buffer.elements.extend(
+            Vector('v{}'.format(index), rng.uniform(-6.0, 6.0, size=2)) for index in range(num_elements)
+        )
+        element_buffer.transforms.append(Transform2D('T1'))
+        element_buffer.update()
+
+        def handle(handler):
+            for event, mouse in zip(events, mouse_positions):
+                handler(event, coordinate_system, mouse)
+
+        broadcast_time = measure(lambda: handle(lambda *args: broadcast(element_buffer, *args)), repeat=5)
+        dispatch_time = measure(lambda: handle(element_buffer.handle_event), repeat=5)
+        print('{:>8} {:>16.2f} {:>15.2f}'.format(
+            num_elements, broadcast_time * 1000 / len(events), dispatch_time * 1000 / len(events)
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Measures the evaluation of a CustomTransformed definition over a MultiVectorObject against the number of its points.
+Compares evaluating the compiled definition with eval on every frame with the update of the CustomTransformed, while
+nothing changed, after the transform changed and after the points changed. After the transform changed, only the
+part of the definition, that uses the transform, is evaluated again.
+
+Run with: python3 -m linear_algebra_testcase.benchmarks.expressions
+"""
+import numpy as np
+
+from linear_algebra_testcase.benchmarks import measure
+
+POINT_COUNTS = [10000, 100000, 1000000]
+DEFINITION = 'T1 @ (np.sin(u1) * np.linalg.norm(u1, axis=0) + u1)'
+
+
+def main():
+    from linear_algebra_testcase.common.elements_core import ElementBuffer, RenderKind
+    from linear_algebra_testcase.dim2.elements import CustomTransformed, MultiVectorObject, Transform2D
+
+    rng = np.random.default_rng(0)
+    code = compile(DEFINITION, '<string>', 'eval')
+    print('{:>8} {:>10} {:>10} {:>17} {:>14}'.format(
+        'points', 'eval [ms]', 'idle [ms]', 'transform changed', 'points changed'
+    ))
+    for num_points in POINT_COUNTS:
+        element_buffer = ElementBuffer()
+        vectors = MultiVectorObject('u1', rng.uniform(-10.0, 10.0, size=(2, num_points)))
+        transform = Transform2D('T1')
+        element_buffer.elements.append(vectors)
+        element_buffer.transforms.append(transform)
+        custom = CustomTransformed('t1', RenderKind.POINT, element_buffer)
+        custom.definition = DEFINITION
+        custom.compile_definition()
+        element_buffer.transformed.append(custom)
+        element_buffer.update()
+
+        def evaluate():
+            eval_locals = {'np': np, 'u1': vectors.get_array(), 'T1': transform.get_array()}
+            return eval(code, {}, eval_locals)
+
+        def change_transform():
+            transform.matrix = transform.matrix * 1.0001
+            custom.update()
+
+        def change_points():
+            vectors.coordinates = vectors.coordinates * 1.0001
+            custom.update()
+
+        eval_time = measure(evaluate, repeat=10)
+        idle_time = measure(custom.update, repeat=10)
+        transform_time = measure(change_transform, repeat=10)
+        points_time = measure(change_points, repeat=10)
+        print('{:>8} {:>10.3f} {:>10.3f} {:>17.3f} {:>14.3f}'.format(
+            num_points, eval_time, idle_time, transform_time, points_time
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Compares elements with cartesian and homogeneous coordinate storage on large point clouds.
+For the projection of a MultiVectorObject (dim2) and a MultiVectorObject3D (dim3) and for applying an affine transform
+to them, the runtime and the peak of memory allocated per call are measured.
+
+Run with: python3 -m linear_algebra_testcase.benchmarks.homogeneous
+"""
+import tracemalloc
+from typing import Callable
+
+import numpy as np
+
+from linear_algebra_testcase.benchmarks import measure
+
+POINT_COUNTS = [100000, 1000000]
+
+
+def measure_allocation(func: Callable) -> float:
+    """
+    Calls func once and returns the peak of memory allocated during the call in MiB.
+    """
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    func()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20
+
+
+def main():
+    from linear_algebra_testcase.common.elements_core import RenderKind
+    from linear_algebra_testcase.dim2.coordinate_system import CoordinateSystem
+    from linear_algebra_testcase.dim2.elements import MultiVectorObject, Translate2D, Transformed2D
+    from linear_algebra_testcase.dim3.coordinate_system import CoordinateSystem as CoordinateSystem3D
+    from linear_algebra_testcase.dim3.elements import MultiVectorObject3D, Translate3D, Transformed as Transformed3D
+
+    coordinate_system = CoordinateSystem()
+    coordinate_system_3d = CoordinateSystem3D(position=np.array([1.1, 1.0, 2.8]))
+    rng = np.random.default_rng(0)
+
+    print('{:>4} {:>10} {:>12} {:>12} {:>10} {:>12} {:>10}'.format(
+        'dim', 'points', 'storage', 'project [ms]', '[MiB]', 'affine [ms]', '[MiB]'
+    ))
+    for num_points in POINT_COUNTS:
+        points = rng.uniform(-6.0, 6.0, size=(2, num_points))
+        points_3d = rng.uniform(-6.0, 6.0, size=(num_points, 3))
+        for homogeneous in (False, True):
+            storage = 'homogeneous' if homogeneous else 'cartesian'
+
+            element = MultiVectorObject('u1', points, RenderKind.POINT, homogeneous=homogeneous)
+            transformed = Transformed2D('t1', element, Translate2D('T1'), RenderKind.POINT)
+            project = lambda: coordinate_system.transform(element.get_projectable_array())
+            affine = transformed.get_position
+            print('{:>4} {:>10} {:>12} {:>12.3f} {:>10.2f} {:>12.3f} {:>10.2f}'.format(
+                2, num_points, storage, measure(project, repeat=5), measure_allocation(project),
+                measure(affine, repeat=5), measure_allocation(affine)
+            ))
+
+            element_3d = MultiVectorObject3D('c1', points_3d, np.zeros((0, 2), dtype=int), homogeneous=homogeneous)
+            transformed_3d = Transformed3D('t1', element_3d, Translate3D('T1'), RenderKind.POINT)
+            project_3d = lambda: coordinate_system_3d.transform(element_3d.get_projectable_array(), clip=False)
+            affine_3d = transformed_3d.get_position
+            print('{:>4} {:>10} {:>12} {:>12.3f} {:>10.2f} {:>12.3f} {:>10.2f}'.format(
+                3, num_points, storage, measure(project_3d, repeat=5), measure_allocation(project_3d),
+                measure(affine_3d, repeat=5), measure_allocation(affine_3d)
+            ))
+
+
+if __name__ == '__main__':
+    main()
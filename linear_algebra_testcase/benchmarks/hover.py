@@ -0,0 +1,56 @@
+"""
+Measures hover testing against the number of hoverable points. Compares a linear scan, that transforms all points
+and computes their distance to the mouse, with a query of the spatial index of the PointArena. Building the index is
+measured separately, as it only happens after the coordinate system or an element changed.
+
+Run with: python3 -m linear_algebra_testcase.benchmarks.hover
+"""
+import numpy as np
+
+from linear_algebra_testcase.benchmarks import measure
+
+POINT_COUNTS = [10000, 100000]
+POINTS_PER_ELEMENT = 100
+
+
+def linear_scan(arena, coordinate_system, mouse_position: np.ndarray) -> np.ndarray:
+    """
+    Reference implementation, that tests every point of the arena.
+    """
+    screen_points = coordinate_system.transform(arena.get_projectable_array()).T
+    return np.flatnonzero(np.sum((screen_points - mouse_position)**2, axis=1) < 100)
+
+
+def main():
+    from linear_algebra_testcase.common.elements_core import ElementBuffer, HOVER_DISTANCE
+    from linear_algebra_testcase.dim2.coordinate_system import CoordinateSystem
+    from linear_algebra_testcase.dim2.elements import MultiVectorObject
+
+    coordinate_system = CoordinateSystem()
+    rng = np.random.default_rng(0)
+    mouse_positions = rng.uniform(0.0, 1000.0, size=(100, 2))
+    print('{:>8} {:>18} {:>15} {:>16}'.format('points', 'linear scan [us]', 'index query', 'index build [ms]'))
+    for num_points in POINT_COUNTS:
+        element_buffer = ElementBuffer()
+        element_buffer.elements.extend(
+            MultiVectorObject('u{}'.format(index), rng.uniform(-10.0, 10.0, size=(2, POINTS_PER_ELEMENT)))
+            for index in range(num_points // POINTS_PER_ELEMENT)
+        )
+        element_buffer.update()
+        arena = element_buffer.arena
+
+        def build():
+            arena.screen_grid = None
+            arena.get_screen_grid(coordinate_system)
+
+        screen_grid, _slots = arena.get_screen_grid(coordinate_system)
+        scan = measure(lambda: [linear_scan(arena, coordinate_system, mouse) for mouse in mouse_positions], repeat=10)
+        query = measure(lambda: [screen_grid.query(mouse, HOVER_DISTANCE) for mouse in mouse_positions], repeat=10)
+        build_time = measure(build, repeat=10)
+        print('{:>8} {:>18.2f} {:>15.2f} {:>16.3f}'.format(
+            num_points, scan * 1000 / len(mouse_positions), query * 1000 / len(mouse_positions), build_time
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Measures the frame time of rendering a MultiVectorObject against its number of points.
+
+Run with: python3 -m linear_algebra_testcase.benchmarks.render
+"""
+import numpy as np
+
+from linear_algebra_testcase.benchmarks import init_headless, measure
+
+POINT_COUNTS = [100, 1000, 10000, 50000]
+
+
+def render_per_point(screen, element, coordinate_system):
+    """
+    Reference implementation, that draws every line or circle with its own pg.draw call.
+    """
+    import pygame as pg
+    from linear_algebra_testcase.common.elements_core import GREEN, RenderKind
+
+    transformed_vec = coordinate_system.transform(element.get_array()).T
+    for point in transformed_vec:
+        if element.render_kind == RenderKind.POINT:
+            pg.draw.circle(screen, GREEN, point, 3)
+        elif element.render_kind == RenderKind.LINE:
+            pg.draw.line(screen, GREEN, coordinate_system.get_zero_point(), point, width=1)
+
+
+def main():
+    screen = init_headless()
+
+    from linear_algebra_testcase.common.elements_core import RenderKind
+    from linear_algebra_testcase.dim2.coordinate_system import CoordinateSystem
+    from linear_algebra_testcase.dim2.elements import MultiVectorObject
+
+    coordinate_system = CoordinateSystem()
+    rng = np.random.default_rng(0)
+    print('{:>6} {:>8} {:>16} {:>14}'.format('kind', 'points', 'per point [ms]', 'batched [ms]'))
+    for render_kind in RenderKind:
+        for num_points in POINT_COUNTS:
+            element = MultiVectorObject('u1', rng.uniform(-6.0, 6.0, size=(2, num_points)), render_kind)
+            per_point = measure(lambda: render_per_point(screen, element, coordinate_system), repeat=5)
+            batched = measure(lambda: element.render(screen, coordinate_system), repeat=5)
+            print('{:>6} {:>8} {:>16.3f} {:>14.3f}'.format(render_kind.name, num_points, per_point, batched))
+
+
+if __name__ == '__main__':
+    main()
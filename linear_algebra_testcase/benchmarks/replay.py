@@ -0,0 +1,107 @@
+"""
+Replays a recording of the events of a viewer headlessly and reports the distribution of the frame times, so a stutter
+can be reproduced and measured exactly. Record with:
+
+    LINEAR_ALGEBRA_RECORD=recording.jsonl.gz python3 -m linear_algebra_testcase.dim2
+
+The frames are replayed as fast as possible or with --realtime at the recorded times. The time of the animations is
+always the recorded time. Definitions of CustomTransformed elements are evaluated in a worker process like in the
+viewer, so their results can arrive in other frames than during the recording. With --inline-evaluation they are
+evaluated while updating, which makes the replay deterministic.
+
+Run with: python3 -m linear_algebra_testcase.benchmarks.replay recording.jsonl.gz [--realtime] [--inline-evaluation]
+                                                                                   [--output frame_times.json]
+"""
+import argparse
+import json
+import os
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from linear_algebra_testcase.benchmarks import init_headless
+
+PERCENTILES = [50, 90, 95, 99]
+
+
+def get_frame_time_stats(frame_times: List[float]) -> Dict[str, float]:
+    """
+    Returns the number of frames, the mean, the percentiles and the maximum of the given frame times in milliseconds.
+    """
+    if not frame_times:
+        return {'frames': 0}
+    frame_times = np.asarray(frame_times)
+    stats = {'frames': len(frame_times), 'mean': float(frame_times.mean())}
+    for percentile, value in zip(PERCENTILES, np.percentile(frame_times, PERCENTILES)):
+        stats['p{}'.format(percentile)] = float(value)
+    stats['max'] = float(frame_times.max())
+    return stats
+
+
+def replay(path: str, realtime: bool = False, inline_evaluation: bool = False) -> List[float]:
+    """
+    Replays the recording at the given path with a new Main of the recorded dimension.
+
+    :param path: The path of the recording
+    :param realtime: Whether to wait until the recorded time of every frame
+    :param inline_evaluation: Whether to evaluate definitions while updating instead of in a worker process
+    :return: The time of every frame in milliseconds
+    """
+    from linear_algebra_testcase.common.metrics import METRICS_ENV_VAR
+    from linear_algebra_testcase.common.recording import RECORDING_ENV_VAR, load_recording
+
+    header, frames = load_recording(path)
+    init_headless(tuple(header['screen_size']))
+    # the replay must not record itself or export metrics of the recorded times
+    os.environ.pop(RECORDING_ENV_VAR, None)
+    os.environ.pop(METRICS_ENV_VAR, None)
+    if header['dimension'] == 2:
+        from linear_algebra_testcase.dim2.__main__ import Main
+    else:
+        from linear_algebra_testcase.dim3.__main__ import Main
+    main = Main()
+    if inline_evaluation:
+        main.element_buffer.close()
+        main.element_buffer.evaluator = None
+
+    frame_times = []
+    start = time.perf_counter()
+    first_ticks = frames[0][0] if frames else 0
+    for ticks, events in frames:
+        if realtime:
+            delay = (ticks - first_ticks) / 1000.0 - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+        frame_start = time.perf_counter()
+        main.handle_events(events, ticks)
+        frame_times.append((time.perf_counter() - frame_start) * 1000.0)
+        if not main.controller.running:
+            break
+    main.element_buffer.close()
+    return frame_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replays a recording of a viewer and reports the frame times.')
+    parser.add_argument('recording', help='the recording written with the environment variable LINEAR_ALGEBRA_RECORD')
+    parser.add_argument('--realtime', action='store_true', help='replay the frames at the recorded times')
+    parser.add_argument('--inline-evaluation', action='store_true',
+                        help='evaluate definitions while updating, so the replay is deterministic')
+    parser.add_argument('--output', help='write the frame times and their statistics as JSON to this file')
+    args = parser.parse_args()
+
+    frame_times = replay(args.recording, args.realtime, args.inline_evaluation)
+    stats = get_frame_time_stats(frame_times)
+    for name, value in stats.items():
+        print('{:<8} {:>10}'.format(name, value if name == 'frames' else '{:.3f}'.format(value)))
+    slowest = np.argsort(frame_times)[::-1][:5]
+    print('slowest frames: ' + ', '.join('#{} {:.3f} ms'.format(index, frame_times[index]) for index in slowest))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'unit': 'ms', 'stats': stats, 'frame_times': frame_times}, file)
+            file.write('\n')
+
+
+if __name__ == '__main__':
+    main()
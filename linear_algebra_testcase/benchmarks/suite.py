@@ -0,0 +1,296 @@
+"""
+Runs a fixed set of benchmarks of the hot paths and compares the results with a stored baseline, so performance
+regressions are found before deploying. Measured are CoordinateSystem.transform of dim2 and dim3, full frames of
+render() against the number of points and elements, UserInterface.build() against the number of elements, hover
+testing and the evaluation of a CustomTransformed. All results are medians in milliseconds.
+
+The results are written as JSON with --output. A benchmark is a regression, if it is slower than tolerance times its
+baseline and at least MIN_REGRESSION_MS slower. Then the exit status is 1. The baseline was measured on a development
+machine, so on other machines it should first be recreated with --update-baseline from a known good commit.
+
+Run with: python3 -m linear_algebra_testcase.benchmarks.suite [--output results.json] [--baseline baseline.json]
+                                                              [--update-baseline] [--tolerance 1.5] [--filter render]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from linear_algebra_testcase.benchmarks import init_headless, measure
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DEFAULT_TOLERANCE = 1.5
+# differences below this number of milliseconds are measurement noise
+MIN_REGRESSION_MS = 0.05
+TRANSFORM_POINT_COUNTS = [1000, 100000]
+RENDER_POINT_COUNTS = [1000, 50000]
+RENDER_ELEMENT_COUNTS = [20, 200]
+UI_ELEMENT_COUNTS = [50, 500]
+HOVER_POINT_COUNTS = [10000, 100000]
+CUSTOM_POINT_COUNTS = [10000, 100000]
+NUM_MOUSE_POSITIONS = 100
+
+# a benchmark creates its scene and returns the function to measure and the number of measured calls
+Benchmark = Callable[[], Tuple[Callable[[], object], int]]
+
+
+def transform_2d(num_points: int) -> Benchmark:
+    def create():
+        from linear_algebra_testcase.dim2.coordinate_system import CoordinateSystem
+
+        coordinate_system = CoordinateSystem()
+        vecs = np.random.default_rng(0).uniform(-10.0, 10.0, size=(2, num_points))
+        return lambda: coordinate_system.transform(vecs), 20
+    return create
+
+
+def transform_3d(num_points: int) -> Benchmark:
+    def create():
+        from linear_algebra_testcase.dim3.coordinate_system import CoordinateSystem
+
+        coordinate_system = CoordinateSystem(position=np.array([1.1, 1.0, 2.8]))
+        vecs = np.random.default_rng(0).uniform(-2.0, 2.0, size=(num_points, 3))
+        return lambda: coordinate_system.transform(vecs), 20
+    return create
+
+
+def render_frame_2d(element_buffer) -> Callable[[], None]:
+    """
+    Returns a function, that renders a whole frame of the given element buffer like the dim2 viewer without dirty
+    rects.
+    """
+    import pygame as pg
+    from linear_algebra_testcase.common.fonts import get_font
+    from linear_algebra_testcase.common.user_interface import UserInterface
+    from linear_algebra_testcase.common.utils import Dimension
+    from linear_algebra_testcase.dim2.coordinate_system import CoordinateSystem
+    from linear_algebra_testcase.dim2.render import CoordinateSystemLayer, render
+
+    screen = pg.display.get_surface()
+    coordinate_system = CoordinateSystem()
+    user_interface = UserInterface()
+    user_interface.build(element_buffer, Dimension.d2)
+    layer = CoordinateSystemLayer()
+    font = get_font()
+    return lambda: render(screen, coordinate_system, element_buffer, font, user_interface, layer)
+
+
+def render_points_2d(num_points: int) -> Benchmark:
+    def create():
+        from linear_algebra_testcase.common.elements_core import ElementBuffer, RenderKind
+        from linear_algebra_testcase.dim2.elements import MultiVectorObject
+
+        element_buffer = ElementBuffer()
+        element_buffer.elements.append(MultiVectorObject(
+            'u1', np.random.default_rng(0).uniform(-6.0, 6.0, size=(2, num_points)), RenderKind.POINT
+        ))
+        return render_frame_2d(element_buffer), 10
+    return create
+
+
+def render_elements_2d(num_elements: int) -> Benchmark:
+    def create():
+        from linear_algebra_testcase.benchmarks.ui_build import create_element_buffer
+
+        return render_frame_2d(create_element_buffer(num_elements)), 10
+    return create
+
+
+def render_points_3d(num_points: int) -> Benchmark:
+    def create():
+        import pygame as pg
+        from linear_algebra_testcase.common.elements_core import ElementBuffer, RenderKind
+        from linear_algebra_testcase.common.fonts import get_font
+        from linear_algebra_testcase.common.user_interface import UserInterface
+        from linear_algebra_testcase.common.utils import Dimension
+        from linear_algebra_testcase.dim3.coordinate_system import CoordinateSystem
+        from linear_algebra_testcase.dim3.elements import MultiVectorObject3D
+        from linear_algebra_testcase.dim3.render import render
+
+        element_buffer = ElementBuffer()
+        element_buffer.elements.append(MultiVectorObject3D(
+            'c1', np.random.default_rng(0).uniform(-2.0, 2.0, size=(num_points, 3)), np.zeros((0, 2), dtype=int),
+            RenderKind.POINT
+        ))
+        screen = pg.display.get_surface()
+        coordinate_system = CoordinateSystem(position=np.array([1.1, 1.0, 2.8]))
+        user_interface = UserInterface()
+        user_interface.build(element_buffer, Dimension.d3)
+        font = get_font()
+        return lambda: render(screen, coordinate_system, element_buffer, font, user_interface), 10
+    return create
+
+
+def ui_build(num_elements: int, first: bool) -> Benchmark:
+    def create():
+        from linear_algebra_testcase.benchmarks.ui_build import create_element_buffer
+        from linear_algebra_testcase.common.user_interface import UserInterface
+        from linear_algebra_testcase.common.utils import Dimension
+
+        element_buffer = create_element_buffer(num_elements)
+        if first:
+            return lambda: UserInterface().build(element_buffer, Dimension.d2), 5
+        user_interface = UserInterface()
+        return lambda: user_interface.build(element_buffer, Dimension.d2), 20
+    return create
+
+
+def hover(num_points: int, moved: bool) -> Benchmark:
+    def create():
+        from linear_algebra_testcase.common.elements_core import ElementBuffer
+        from linear_algebra_testcase.dim2.coordinate_system import CoordinateSystem
+        from linear_algebra_testcase.dim2.elements import MultiVectorObject
+
+        rng = np.random.default_rng(0)
+        coordinate_system = CoordinateSystem()
+        element_buffer = ElementBuffer()
+        element_buffer.elements.extend(
+            MultiVectorObject('u{}'.format(index), rng.uniform(-10.0, 10.0, size=(2, 100)))
+            for index in range(num_points // 100)
+        )
+        element_buffer.update()
+        mouse_positions = rng.uniform(0.0, 1000.0, size=(NUM_MOUSE_POSITIONS, 2))
+        if moved:
+            def hover_moved():
+                # the spatial index is built again after the coordinate system changed
+                coordinate_system.translate(np.array([0.0, 0.0]))
+                element_buffer.get_hovered_elements(mouse_positions[0], coordinate_system)
+            return hover_moved, 10
+        return lambda: [
+            element_buffer.get_hovered_elements(mouse, coordinate_system) for mouse in mouse_positions
+        ], 10
+    return create
+
+
+def custom_transformed(num_points: int) -> Benchmark:
+    def create():
+        from linear_algebra_testcase.benchmarks.expressions import DEFINITION
+        from linear_algebra_testcase.common.elements_core import ElementBuffer, RenderKind
+        from linear_algebra_testcase.dim2.elements import CustomTransformed, MultiVectorObject, Transform2D
+
+        element_buffer = ElementBuffer()
+        vectors = MultiVectorObject('u1', np.random.default_rng(0).uniform(-10.0, 10.0, size=(2, num_points)))
+        element_buffer.elements.append(vectors)
+        element_buffer.transforms.append(Transform2D('T1'))
+        custom = CustomTransformed('t1', RenderKind.POINT, element_buffer)
+        custom.definition = DEFINITION
+        custom.compile_definition()
+        element_buffer.transformed.append(custom)
+        element_buffer.update()
+
+        def change_points():
+            vectors.coordinates = vectors.coordinates * 1.0001
+            custom.update()
+        return change_points, 10
+    return create
+
+
+def get_benchmarks() -> Dict[str, Benchmark]:
+    benchmarks = {}
+    for num_points in TRANSFORM_POINT_COUNTS:
+        benchmarks['transform/dim2/{}'.format(num_points)] = transform_2d(num_points)
+        benchmarks['transform/dim3/{}'.format(num_points)] = transform_3d(num_points)
+    for num_points in RENDER_POINT_COUNTS:
+        benchmarks['render/dim2/points/{}'.format(num_points)] = render_points_2d(num_points)
+        benchmarks['render/dim3/points/{}'.format(num_points)] = render_points_3d(num_points)
+    for num_elements in RENDER_ELEMENT_COUNTS:
+        benchmarks['render/dim2/elements/{}'.format(num_elements)] = render_elements_2d(num_elements)
+    for num_elements in UI_ELEMENT_COUNTS:
+        benchmarks['ui_build/first/{}'.format(num_elements)] = ui_build(num_elements, True)
+        benchmarks['ui_build/rebuild/{}'.format(num_elements)] = ui_build(num_elements, False)
+    for num_points in HOVER_POINT_COUNTS:
+        benchmarks['hover/query/{}'.format(num_points)] = hover(num_points, False)
+        benchmarks['hover/moved/{}'.format(num_points)] = hover(num_points, True)
+    for num_points in CUSTOM_POINT_COUNTS:
+        benchmarks['custom_transformed/{}'.format(num_points)] = custom_transformed(num_points)
+    return benchmarks
+
+
+def run_benchmarks(name_filter: Optional[str] = None) -> Dict[str, float]:
+    """
+    Runs all benchmarks, whose names contain name_filter, and returns their median runtimes in milliseconds.
+    """
+    init_headless()
+    results = {}
+    for name, create in get_benchmarks().items():
+        if name_filter and name_filter not in name:
+            continue
+        func, repeat = create()
+        results[name] = measure(func, repeat=repeat)
+        print('{:<32} {:>10.3f}'.format(name, results[name]), file=sys.stderr)
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    """
+    Prints the results next to the baseline and returns the names of the benchmarks, that regressed.
+    """
+    regressions = []
+    print('{:<32} {:>14} {:>12} {:>8}'.format('benchmark', 'baseline [ms]', 'result [ms]', 'ratio'))
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            print('{:<32} {:>14} {:>12.3f} {:>8}'.format(name, '-', result, 'new'))
+            continue
+        ratio = result / expected if expected > 0 else float('inf')
+        regressed = ratio > tolerance and result - expected > MIN_REGRESSION_MS
+        if regressed:
+            regressions.append(name)
+        print('{:<32} {:>14.3f} {:>12.3f} {:>8.2f}{}'.format(
+            name, expected, result, ratio, '  REGRESSION' if regressed else ''
+        ))
+    return regressions
+
+
+def create_report(results: Dict[str, float]) -> Dict:
+    import pygame as pg
+
+    return {
+        'unit': 'ms',
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pygame': pg.version.ver,
+        'results': results,
+    }
+
+
+def write_report(report: Dict, path: str):
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2)
+        file.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs the benchmark suite and compares it with a baseline.')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='the JSON file with the baseline results')
+    parser.add_argument('--update-baseline', action='store_true', help='write the results as new baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='results slower than tolerance times the baseline are regressions')
+    parser.add_argument('--filter', help='only run benchmarks, whose names contain this text')
+    args = parser.parse_args()
+
+    report = create_report(run_benchmarks(args.filter))
+    if args.output:
+        write_report(report, args.output)
+    if args.update_baseline:
+        write_report(report, args.baseline)
+        return
+    if not os.path.exists(args.baseline):
+        print('No baseline found at {}'.format(args.baseline), file=sys.stderr)
+        return
+    with open(args.baseline) as file:
+        baseline = json.load(file)['results']
+    regressions = compare(report['results'], baseline, args.tolerance)
+    if regressions:
+        print('{} benchmarks regressed: {}'.format(len(regressions), ', '.join(regressions)), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
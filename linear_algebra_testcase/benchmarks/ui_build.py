@@ -0,0 +1,58 @@
+"""
+Measures the time of UserInterface.build() against the number of elements.
+
+Run with: python3 -m linear_algebra_testcase.benchmarks.ui_build
+"""
+import numpy as np
+
+from linear_algebra_testcase.benchmarks import init_headless, measure
+
+ELEMENT_COUNTS = [10, 50, 200, 500]
+
+
+def create_element_buffer(num_elements: int):
+    """
+    Creates an element buffer with num_elements elements equally distributed over vectors, unit circles, transforms
+    and transformed.
+    """
+    from linear_algebra_testcase.common.elements_core import ElementBuffer, RenderKind
+    from linear_algebra_testcase.dim2.elements import Vector, MultiVectorObject, Transform2D, Transformed2D
+
+    element_buffer = ElementBuffer()
+    for index in range(num_elements):
+        kind = index % 4
+        if kind == 0:
+            element_buffer.elements.append(Vector('v{}'.format(index), np.array([1.0, 0.5])))
+        elif kind == 1:
+            element_buffer.elements.append(
+                MultiVectorObject('u{}'.format(index), MultiVectorObject.generate_unit_circle(40))
+            )
+        elif kind == 2:
+            element_buffer.transforms.append(Transform2D('T{}'.format(index)))
+        else:
+            element_buffer.transformed.append(
+                Transformed2D('t{}'.format(index), element_buffer.elements[-1], element_buffer.transforms[-1],
+                              RenderKind.LINE)
+            )
+    return element_buffer
+
+
+def main():
+    init_headless()
+
+    from linear_algebra_testcase.common.user_interface import UserInterface
+    from linear_algebra_testcase.common.utils import Dimension
+
+    print('{:>9} {:>16} {:>15}'.format('elements', 'first build [ms]', 'rebuild [ms]'))
+    for num_elements in ELEMENT_COUNTS:
+        element_buffer = create_element_buffer(num_elements)
+        first_build = measure(
+            lambda: UserInterface().build(element_buffer, Dimension.d2), repeat=3, warmup=1
+        )
+        user_interface = UserInterface()
+        rebuild = measure(lambda: user_interface.build(element_buffer, Dimension.d2))
+        print('{:>9} {:>16.3f} {:>15.3f}'.format(num_elements, first_build, rebuild))
+
+
+if __name__ == '__main__':
+    main()
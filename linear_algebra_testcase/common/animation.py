@@ -0,0 +1,100 @@
+from typing import Any, Hashable, List, Mapping, Union
+
+import numpy as np
+
+from linear_algebra_testcase.common.expressions import Expression
+
+# the name of the time variable in definitions
+TIME_NAME = 't'
+# t runs from 0 to 2 pi in 2 pi seconds and starts again, so periodic functions of t loop seamlessly
+ANIMATION_PERIOD = 2 * np.pi
+ANIMATION_FRAME_RATE = 30
+ANIMATION_FRAMES = round(ANIMATION_PERIOD * ANIMATION_FRAME_RATE)
+# the number of milliseconds between frames
+ANIMATION_FRAME_INTERVAL = 1000 // ANIMATION_FRAME_RATE
+# definitions with large results are precomputed for fewer frames, so all frames fit into this number of bytes
+MAX_FRAMES_BYTES = 64 * 2**20
+# frames are evaluated together, until their results have this number of bytes. Larger arrays do not reduce the
+# overhead of an evaluation any further, but do not fit into the cache anymore.
+FRAMES_CHUNK_BYTES = 256 * 2**10
+
+
+def get_frame_times(num_frames: int) -> np.ndarray:
+    """
+    Returns the values of the time variable for the given number of frames evenly spaced over the animation period.
+    """
+    return np.arange(num_frames) * (ANIMATION_PERIOD / num_frames)
+
+
+def get_frame_index(time: float, num_frames: int) -> int:
+    """
+    Returns the index of the frame, that is shown at the given time in seconds.
+    """
+    return int((time % ANIMATION_PERIOD) / ANIMATION_PERIOD * num_frames) % num_frames
+
+
+def evaluate_frames(
+        expression: Expression, variables: Mapping[str, Any], versions: Mapping[str, Hashable],
+        num_frames: int = ANIMATION_FRAMES
+) -> Union[np.ndarray, List[np.ndarray]]:
+    """
+    Evaluates an expression, that uses the time variable, for all frames of the animation period.
+    The expression is evaluated with the time variable as an array of the times of several frames, which works for
+    expressions built from elementwise numpy functions and broadcasting. The number of frames of one evaluation is
+    chosen, so its result has about FRAMES_CHUNK_BYTES. The first evaluation is compared with evaluations for single
+    frames. If the expression can not be evaluated for several frames or the results are too large, it is evaluated
+    for every frame.
+
+    :param expression: The expression to evaluate
+    :param variables: The values of the constants and names used by the expression, except the time variable
+    :param versions: The versions of the names used by the expression
+    :param num_frames: The number of frames. Fewer frames are evaluated, if the frames exceed MAX_FRAMES_BYTES.
+    :return: The results of all frames of shape [frames, ...] or a list of the results, if their shapes or types
+             differ
+    :raise ValueError: If the result is not numeric
+    """
+    def evaluate(time, time_version: Hashable) -> np.ndarray:
+        eval_locals = dict(variables)
+        eval_locals[TIME_NAME] = time
+        frame_versions = dict(versions)
+        frame_versions[TIME_NAME] = time_version
+        result = np.asarray(expression.evaluate(eval_locals, frame_versions))
+        if not (np.issubdtype(result.dtype, np.number) or result.dtype == bool):
+            raise ValueError('result is not numpy array')
+        return result
+
+    def evaluate_chunk(start: int) -> np.ndarray:
+        # the time variable varies along a new first axis
+        chunk_times = times[start:start + chunk_size]
+        chunk = evaluate(chunk_times.reshape((len(chunk_times),) + (1,) * first.ndim), ('frames', num_frames, start))
+        if chunk.shape != (len(chunk_times),) + first.shape:
+            raise ValueError('Invalid frames shape: {}'.format(chunk.shape))
+        return chunk
+
+    times = get_frame_times(num_frames)
+    first = evaluate(times[0], ('time', float(times[0])))
+    num_frames = max(2, min(num_frames, MAX_FRAMES_BYTES // max(first.nbytes, 1)))
+    times = get_frame_times(num_frames)
+    chunk_size = min(num_frames, FRAMES_CHUNK_BYTES // max(first.nbytes, 1))
+    if chunk_size > 1:
+        try:
+            chunk = evaluate_chunk(0)
+            last = evaluate(times[chunk_size - 1], ('time', float(times[chunk_size - 1])))
+            if np.allclose(chunk[0], first, equal_nan=True) and np.allclose(chunk[-1], last, equal_nan=True):
+                frames = np.empty((num_frames,) + first.shape, dtype=chunk.dtype)
+                frames[:chunk_size] = chunk
+                for start in range(chunk_size, num_frames, chunk_size):
+                    frames[start:start + chunk_size] = evaluate_chunk(start)
+                return frames
+        except Exception:
+            pass
+    frames = np.empty((num_frames,) + first.shape, dtype=first.dtype)
+    frames[0] = first
+    for index in range(1, num_frames):
+        result = evaluate(times[index], ('time', float(times[index])))
+        if result.shape != first.shape or result.dtype != first.dtype:
+            # the results can not be stored in one array
+            remaining = [evaluate(time, ('time', float(time))) for time in times[index + 1:]]
+            return list(frames[:index]) + [result] + remaining
+        frames[index] = result
+    return frames
@@ -0,0 +1,145 @@
+import argparse
+import cProfile
+import io
+import os
+import pstats
+import time
+from typing import Optional
+
+import pygame as pg
+
+CAPTURE_KEY = pg.K_F5
+# the number of frames captured after pressing the capture key
+CAPTURE_FRAMES = 120
+# the number of functions in the summary
+CAPTURE_SUMMARY_LIMIT = 20
+
+
+class ProfileCapture:
+    """
+    Profiles the next frames with cProfile, so profiles can be taken from a running viewer without attaching an
+    external profiler. After the last frame, the profile is written to a timestamped .pstats file, that can be opened
+    with pstats or snakeviz, and the functions with the most cumulative time are written to a .txt file next to it and
+    printed.
+    """
+    def __init__(self, num_frames: int = CAPTURE_FRAMES, directory: str = '.'):
+        """
+        :param num_frames: The number of frames to capture after pressing the capture key
+        :param directory: The directory of the written files
+        """
+        self.num_frames = num_frames
+        self.directory = directory
+        self.profile: Optional[cProfile.Profile] = None
+        self.remaining_frames = 0
+        self.captured_frames = 0
+        self.in_frame = False
+        self.last_path: Optional[str] = None
+
+    def is_capturing(self) -> bool:
+        return self.profile is not None
+
+    def start(self, num_frames: Optional[int] = None):
+        """
+        Captures the next frames. Does nothing, if frames are captured already.
+
+        :param num_frames: The number of frames to capture. If None, num_frames of the capture is used.
+        """
+        if self.profile is not None:
+            return
+        self.profile = cProfile.Profile()
+        self.remaining_frames = self.num_frames if num_frames is None else num_frames
+        self.captured_frames = 0
+
+    def handle_event(self, event: pg.event.Event) -> bool:
+        """
+        Starts a capture, if the capture key was pressed.
+
+        :return: True, if a capture was started
+        """
+        if event.type == pg.KEYDOWN and event.key == CAPTURE_KEY and self.profile is None:
+            self.start()
+            return True
+        return False
+
+    def begin_frame(self):
+        if self.profile is not None:
+            try:
+                self.profile.enable()
+                self.in_frame = True
+            except ValueError as e:
+                # another profiler is active, like a cProfile of the whole process
+                print('Can not capture a profile: {}'.format(e))
+                self.profile = None
+
+    def end_frame(self):
+        """
+        Stops profiling the current frame and writes the profile, if it was the last frame to capture.
+        """
+        # a capture started by an event of this frame begins with the next frame
+        if not self.in_frame:
+            return
+        self.profile.disable()
+        self.in_frame = False
+        self.captured_frames += 1
+        self.remaining_frames -= 1
+        if self.remaining_frames <= 0:
+            self.write()
+
+    def close(self):
+        """
+        Writes the frames captured so far, if the viewer ends during a capture.
+        """
+        if self.profile is not None and self.captured_frames:
+            self.write()
+        self.profile = None
+
+    def write(self) -> str:
+        """
+        Writes the captured profile and its summary and ends the capture.
+
+        :return: The path of the .pstats file
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        base_path = os.path.join(self.directory, 'profile-{}-{:03d}'.format(
+            time.strftime('%Y%m%d-%H%M%S'), int(time.time() * 1000) % 1000
+        ))
+        path = base_path + '.pstats'
+        self.profile.dump_stats(path)
+        summary = self.get_summary()
+        with open(base_path + '.txt', 'w') as file:
+            file.write(summary)
+        print(summary)
+        print('Profile written to {}'.format(path))
+        self.profile = None
+        self.last_path = path
+        return path
+
+    def get_summary(self, limit: int = CAPTURE_SUMMARY_LIMIT) -> str:
+        """
+        Returns the functions with the most cumulative time in the captured frames.
+        """
+        stream = io.StringIO()
+        stream.write('{} frames\n'.format(self.captured_frames))
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        return stream.getvalue()
+
+
+def add_capture_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--profile-frames', type=int, default=0, metavar='N',
+                        help='profile the first N frames with cProfile. F{} profiles the next frames at any time.'
+                        .format(CAPTURE_KEY - pg.K_F1 + 1))
+    parser.add_argument('--profile-dir', default='.', help='the directory of the written profiles')
+
+
+def create_profile_capture(args: argparse.Namespace) -> ProfileCapture:
+    """
+    Creates a ProfileCapture from the arguments added by add_capture_arguments(). If --profile-frames was given, the
+    first frames are captured and the capture key captures the same number of frames.
+    """
+    if args.profile_frames > 0:
+        profile_capture = ProfileCapture(args.profile_frames, args.profile_dir)
+        profile_capture.start()
+    else:
+        profile_capture = ProfileCapture(directory=args.profile_dir)
+    return profile_capture
@@ -0,0 +1,270 @@
+import abc
+import time
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pygame as pg
+
+from linear_algebra_testcase.common.animation import TIME_NAME, evaluate_frames, get_frame_index
+from linear_algebra_testcase.common.elements_core import Element, RenderKind, values_equal
+from linear_algebra_testcase.common.expressions import Expression
+
+
+class CustomTransformedBase(Element):
+    """
+    An element, whose points are the result of a python expression using the other elements by name. The definition is
+    evaluated, when it or one of the used elements changed, in the worker process of the evaluator of the element buffer
+    or while updating. Subclasses provide the constants of the definitions, read the result into the points of their
+    dimension and render them.
+    """
+    # these are updated while evaluating
+    UNVERSIONED_ATTRIBUTES = Element.UNVERSIONED_ATTRIBUTES | {
+        'error', 'last_error', 'last_result', 'result_points', 'evaluated_version', 'resolving_version',
+        'result_version', 'frames', 'frame_index'
+    }
+    EVENT_TYPES = frozenset()
+
+    def __init__(self, name: str, render_kind: RenderKind, element_buffer):
+        super().__init__(name, render_kind)
+        self.definition = ""
+        self.compiled_definition = None
+        self.dependency_names = frozenset()
+        self.error = None
+        self.last_error = None
+        self.last_result = None
+        self.result_points: Optional[np.ndarray] = None
+        self.evaluated_version = None
+        self.resolving_version = False
+        # changes, when the result of an evaluation in a worker process arrives
+        self.result_version = 0
+        # the results of all frames, if the definition uses the time variable
+        self.frames: Optional[Union[np.ndarray, List[np.ndarray]]] = None
+        self.frame_index: Optional[int] = None
+        self.element_buffer = element_buffer
+
+    def compile_definition(self):
+        self.error = None
+        self.last_error = None
+        try:
+            self.compiled_definition = Expression(self.definition, frozenset(self.get_eval_constants()))
+            self.dependency_names = self.compiled_definition.names
+        except SyntaxError as e:
+            self.compiled_definition = None
+            self.dependency_names = frozenset()
+            self.error = repr(e)
+            self.last_error = self.error
+
+    def set_definition(self, definition):
+        self.definition = definition
+        self.error = None
+        self.last_error = None
+        self.compiled_definition = None
+        self.dependency_names = frozenset()
+
+    @staticmethod
+    @abc.abstractmethod
+    def get_eval_constants() -> Dict[str, Any]:
+        """
+        Returns the modules and functions, that can be used in definitions.
+        """
+        pass
+
+    def get_array(self):
+        return self.last_result
+
+    def get_dependencies(self):
+        # the elements, whose names are used in the definition
+        return [
+            element for element in self.element_buffer.get_elements_by_name(self.dependency_names)
+            if element is not self
+        ]
+
+    def uses_time(self) -> bool:
+        return TIME_NAME in self.dependency_names
+
+    def is_animated(self) -> bool:
+        return self.frames is not None
+
+    def get_frame_index(self) -> int:
+        return get_frame_index(self.element_buffer.time, len(self.frames))
+
+    def get_version(self):
+        version = self.get_input_version()
+        if self.frames is not None:
+            # the shown frame changes with the time
+            return version, self.get_frame_index()
+        return version
+
+    def get_input_version(self):
+        """
+        Returns the version of the definition and the elements used by it. The definition is evaluated again, if it
+        changes.
+        """
+        if self.resolving_version:
+            # circular definition
+            return self.version
+        self.resolving_version = True
+        try:
+            # a removed element can be replaced by an element with the same name and version counter
+            dependency_versions = tuple(
+                (id(dependency), dependency.get_version()) for dependency in self.get_dependencies()
+            )
+            return self.version, self.result_version, dependency_versions
+        finally:
+            self.resolving_version = False
+
+    def get_render_state(self):
+        self.update()
+        # results from the worker process change the result version and the shown frame is part of the version
+        return self.visible, self.hovered, self.render_kind, self.color_index, self.get_version()
+
+    def get_render_points(self):
+        self.update()
+        return None if self.result_points is None else self.result_points.real
+
+    def update(self):
+        """
+        Evaluates the definition, if the definition or one of the elements used by the definition changed since the
+        last evaluation. Elements evaluated in a worker process wait for the evaluation of the elements they depend on.
+        If the definition uses the time variable, the frame of the current time is shown.
+        """
+        version = self.get_input_version()
+        if version != self.evaluated_version and not self.is_waiting_for_dependencies():
+            self.evaluated_version = version
+            self.evaluate()
+        if self.frames is not None:
+            self.show_frame(self.get_frame_index())
+
+    def is_waiting_for_dependencies(self) -> bool:
+        # evaluating with the old results of dependencies, that are still evaluated, would be wasted
+        return any(
+            isinstance(dependency, CustomTransformedBase) and dependency.is_evaluating()
+            for dependency in self.get_dependencies()
+        )
+
+    def evaluate(self):
+        """
+        Evaluates the definition and updates last_result, result_points and error. If the element buffer has an
+        evaluator, the definition is evaluated in its worker process and the result is set, when it arrives.
+        Definitions using the time variable are evaluated for all frames of the animation at once.
+        """
+        if not self.compiled_definition:
+            self.result_points = None
+            return
+        variables = {}
+        versions = {}
+        if self.name in self.dependency_names:
+            variables[self.name] = self.last_result
+            # the last result changes with every evaluation, so sub-expressions using it are never reused
+            versions[self.name] = object()
+        for dependency in self.get_dependencies():
+            variables[dependency.name] = dependency.get_array()
+            # cached sub-expressions of a replaced element with the same name and version counter must not be reused
+            versions[dependency.name] = (id(dependency), dependency.get_version())
+
+        evaluator = self.element_buffer.evaluator
+        if evaluator is not None:
+            evaluator.submit(self, self.definition, variables, versions, self.uses_time())
+            return
+
+        eval_locals = self.get_eval_constants()
+        eval_locals.update(variables)
+        result = None
+        error = None
+        start_time = time.perf_counter()
+        try:
+            if self.uses_time():
+                result = evaluate_frames(self.compiled_definition, eval_locals, versions)
+            else:
+                result = self.compiled_definition.evaluate(eval_locals, versions)
+        except Exception as e:
+            error = repr(e)
+        self.element_buffer.add_evaluation(time.perf_counter() - start_time)
+        self.set_evaluation_result(result, error)
+
+    def is_evaluating(self) -> bool:
+        evaluator = self.element_buffer.evaluator
+        return evaluator is not None and evaluator.is_pending(self)
+
+    def receive_result(self, result, error: Optional[str]):
+        """
+        Sets the result of an evaluation in the worker process. If the result changed, the version changes, so the
+        elements using this element are evaluated again.
+        """
+        version = self.get_input_version()
+        last_result = self.get_evaluation_result()
+        last_error = self.error
+        self.set_evaluation_result(result, error)
+        if not values_equal(last_result, self.get_evaluation_result()) or self.error != last_error:
+            self.result_version += 1
+            if version == self.evaluated_version:
+                # the definition and its dependencies did not change during the evaluation
+                self.evaluated_version = self.get_input_version()
+
+    def receive_error(self, error: str):
+        """
+        Sets the error of a cancelled evaluation in the worker process. The last result is kept.
+        """
+        self.error = error
+        self.report_error()
+
+    def get_evaluation_result(self):
+        return self.last_result if self.frames is None else self.frames
+
+    def set_evaluation_result(self, result, error: Optional[str]):
+        """
+        Sets the result of an evaluation. If the definition uses the time variable, the result are the frames of the
+        animation and the frame of the current time is shown.
+        """
+        self.frames = None
+        self.frame_index = None
+        if self.uses_time() and isinstance(result, (np.ndarray, list)) and error is None:
+            self.frames = result
+            self.show_frame(self.get_frame_index())
+        else:
+            self.set_result(result, error)
+
+    def show_frame(self, frame_index: int):
+        if frame_index != self.frame_index:
+            self.frame_index = frame_index
+            self.set_result(self.frames[frame_index], None)
+
+    @abc.abstractmethod
+    def set_result(self, result, error: Optional[str]):
+        """
+        Updates last_result, result_points and error from the result of an evaluation.
+        """
+        pass
+
+    def report_error(self):
+        if self.error:
+            if not (self.last_error and self.error == self.last_error):
+                print(self.error)
+        self.last_error = self.error
+
+    def handle_event(self, event: pg.event.Event, coordinate_system, mouse_position: np.ndarray):
+        pass
+
+
+def test_replaced_dependency():
+    from linear_algebra_testcase.common.elements_core import ElementBuffer
+    from linear_algebra_testcase.dim2.elements import CustomTransformed, Vector
+
+    element_buffer = ElementBuffer()
+    a = Vector('a', np.array([1.0, 0.0]))
+    b = Vector('b', np.array([0.0, 1.0]))
+    element_buffer.elements.extend([a, b])
+    custom = CustomTransformed('c', RenderKind.POINT, element_buffer)
+    # a * 2 is cached separately, as it uses fewer names than the definition
+    custom.set_definition('a * 2 + b')
+    custom.compile_definition()
+    element_buffer.transformed.append(custom)
+    element_buffer.update()
+    assert np.allclose(custom.result_points, [[2.0], [1.0]])
+
+    # a new element with the same name and the same version counter replaces a
+    replacement = Vector('a', np.array([5.0, 5.0]))
+    replacement.version = a.version
+    element_buffer.elements[0] = replacement
+    element_buffer.update()
+    assert np.allclose(custom.result_points, [[10.0], [11.0]])
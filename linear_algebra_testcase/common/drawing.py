@@ -0,0 +1,132 @@
+from itertools import repeat
+from typing import Dict, Tuple, Optional, Iterable, List
+
+import numpy as np
+import pygame as pg
+
+
+# pre-rendered circle surfaces for every (color, radius) combination, that was drawn so far
+_point_sprites: Dict[Tuple[Tuple[int, int, int, int], int], pg.Surface] = {}
+
+
+def finite_points(points: np.ndarray) -> np.ndarray:
+    """
+    Removes all points that contain nan or inf values, as pygame can not draw them.
+
+    :param points: Screen coordinates of shape [N, 2].
+    :return: The finite points of shape [M, 2].
+    """
+    return points[np.all(np.isfinite(points), axis=1)]
+
+
+def union_rects(rects: Iterable[Optional[pg.Rect]]) -> Optional[pg.Rect]:
+    """
+    Returns the smallest rect, that contains all given rects. None entries are ignored.
+
+    :param rects: The rects to unite
+    :return: The united rect or None, if no rect was given
+    """
+    rects = [rect for rect in rects if rect is not None]
+    if not rects:
+        return None
+    return rects[0].unionall(rects[1:])
+
+
+def merge_rects(rects: Iterable[pg.Rect]) -> List[pg.Rect]:
+    """
+    Merges overlapping rects into their union, until no rects overlap anymore. Empty rects are removed.
+
+    :param rects: The rects to merge
+    :return: A list of non overlapping rects covering all given rects
+    """
+    merged = [rect for rect in rects if rect.width > 0 and rect.height > 0]
+    changed = True
+    while changed:
+        changed = False
+        result = []
+        for rect in merged:
+            for index, other in enumerate(result):
+                if rect.colliderect(other):
+                    result[index] = other.union(rect)
+                    changed = True
+                    break
+            else:
+                result.append(rect)
+        merged = result
+    return merged
+
+
+def draw_rays(
+        surface: pg.Surface, color: pg.Color, origin: np.ndarray, points: np.ndarray, width: int = 1
+) -> Optional[pg.Rect]:
+    """
+    Draws a line from origin to every point in points.
+    Instead of calling pg.draw.line for every point, all lines are drawn with a single call to pg.draw.lines by walking
+    the path origin -> p0 -> origin -> p1 -> ... .
+
+    :param surface: The surface to draw on
+    :param color: The color of the lines
+    :param origin: The start point of all lines in screen coordinates of shape [2,].
+    :param points: The end points of the lines in screen coordinates of shape [N, 2].
+    :param width: The width of the lines
+    :return: The rect of the drawn area or None, if nothing was drawn
+    """
+    points = finite_points(np.asarray(points, dtype=float).reshape(-1, 2))
+    if len(points) == 0:
+        return None
+    path = np.empty((2 * len(points), 2), dtype=float)
+    path[0::2] = np.asarray(origin, dtype=float).reshape(2)
+    path[1::2] = points
+    return pg.draw.lines(surface, color, False, path.tolist(), width)
+
+
+def get_point_sprite(color: pg.Color, radius: int) -> pg.Surface:
+    """
+    Returns a surface with a filled circle of the given color and radius. The surface is rendered only once for every
+    (color, radius) combination.
+
+    :param color: The color of the circle
+    :param radius: The radius of the circle in pixels
+    :return: A surface of size [2*radius+1, 2*radius+1] with the circle centered at (radius, radius).
+    """
+    color = pg.Color(color)
+    key = (tuple(color), radius)
+    sprite = _point_sprites.get(key)
+    if sprite is None:
+        colorkey = pg.Color(0, 0, 0) if color != pg.Color(0, 0, 0) else pg.Color(255, 255, 255)
+        sprite = pg.Surface((2 * radius + 1, 2 * radius + 1))
+        sprite.fill(colorkey)
+        pg.draw.circle(sprite, color, (radius, radius), radius)
+        sprite.set_colorkey(colorkey, pg.RLEACCEL)
+        if pg.display.get_surface() is not None:
+            sprite = sprite.convert()
+        _point_sprites[key] = sprite
+    return sprite
+
+
+def draw_points(surface: pg.Surface, color: pg.Color, points: np.ndarray, radius: int) -> Optional[pg.Rect]:
+    """
+    Draws a filled circle at every point. Instead of calling pg.draw.circle for every point, a pre-rendered circle
+    sprite is blitted to all points with a single call to Surface.blits.
+
+    :param surface: The surface to draw on
+    :param color: The color of the circles
+    :param points: The centers of the circles in screen coordinates of shape [N, 2].
+    :param radius: The radius of the circles in pixels
+    :return: The rect of the drawn area or None, if nothing was drawn
+    """
+    points = finite_points(np.asarray(points, dtype=float).reshape(-1, 2))
+    if len(points) == 0:
+        return None
+    sprite = get_point_sprite(color, radius)
+    # skip points whose sprite would not touch the surface at all
+    width, height = surface.get_size()
+    inside = ((points[:, 0] > -radius - 1) & (points[:, 0] < width + radius + 1) &
+              (points[:, 1] > -radius - 1) & (points[:, 1] < height + radius + 1))
+    positions = (np.rint(points[inside]) - radius).astype(int)
+    if len(positions) == 0:
+        return None
+    surface.blits(zip(repeat(sprite), positions.tolist()), doreturn=False)
+    top_left = positions.min(axis=0)
+    size = positions.max(axis=0) - top_left + sprite.get_size()
+    return pg.Rect(int(top_left[0]), int(top_left[1]), int(size[0]), int(size[1])).clip(surface.get_rect())
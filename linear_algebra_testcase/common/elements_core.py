@@ -1,11 +1,12 @@
 import abc
 import enum
 from itertools import chain
-from typing import List, Iterator
+from typing import List, Iterator, Optional, Hashable, Any, FrozenSet, Callable, Dict, Tuple, Iterable, Set
 
 import numpy as np
 import pygame as pg
 
+from linear_algebra_testcase.common.spatial_index import ScreenGrid
 from linear_algebra_testcase.dim2.coordinate_system import CoordinateSystem as CoordSystem2D
 from linear_algebra_testcase.dim3.coordinate_system import CoordinateSystem as CoordSystem3D
 
@@ -20,6 +21,14 @@ YELLOW = pg.Color(220, 220, 0)
 MAGENTA = pg.Color(220, 0, 220)
 
 AXIS_COLORS = [CYAN, YELLOW, MAGENTA, BLUE]
+ELEMENT_COLORS = [GREEN, RED, BLUE, CYAN, YELLOW, MAGENTA]
+
+# elements are culled, if their points are further outside the screen than this number of pixels
+CULL_MARGIN = 8
+# the mouse hovers points closer than this number of pixels
+HOVER_DISTANCE = 10
+# events, whose effect on an element depends on whether the element is under the mouse
+MOUSE_EVENT_TYPES = frozenset({pg.MOUSEMOTION, pg.MOUSEBUTTONDOWN, pg.MOUSEBUTTONUP, pg.KEYDOWN})
 
 
 def snap(coordinates: np.ndarray):
@@ -31,6 +40,113 @@ def snap(coordinates: np.ndarray):
     return coordinates
 
 
+def values_equal(a: Any, b: Any) -> bool:
+    """
+    Compares two attribute values. Numpy arrays are compared by shape and content, other values with ==.
+    """
+    if a is b:
+        return True
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        if not (isinstance(a, np.ndarray) and isinstance(b, np.ndarray)):
+            return False
+        return a.shape == b.shape and np.array_equal(a, b)
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return False
+
+
+class HomogeneousCoordinates:
+    """
+    Descriptor for the coordinates of an element, that can be stored in homogeneous form.
+    If the element has homogeneous set to True, the coordinates are kept with an additional row of ones (axis=0, dim2
+    layout [3, N]) or column of ones (axis=1, dim3 layout [N, 4]) in the attribute homogeneous_coordinates. Reading
+    the coordinates returns a view of the cartesian part in the shape that was assigned. Assigning coordinates of the
+    same size writes into the stored memory, so the homogeneous array is not allocated again.
+    Elements in the PointArena of an ElementBuffer always store their coordinates in homogeneous form, as a view of
+    their rows in the arena.
+    """
+    def __init__(self, dim: int, axis: int):
+        self.dim = dim
+        self.axis = axis
+        self.name = ''
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def _cartesian(self, homogeneous: np.ndarray) -> np.ndarray:
+        return homogeneous[:self.dim] if self.axis == 0 else homogeneous[:, :self.dim]
+
+    def to_layout(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Converts points of shape [N, dim + 1] into the layout of this descriptor and vice versa. Returns a view.
+        """
+        return rows.T if self.axis == 0 else rows
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        if self.name not in instance.__dict__:
+            raise AttributeError(self.name)
+        homogeneous = instance.__dict__.get('homogeneous_coordinates')
+        if homogeneous is None:
+            return instance.__dict__[self.name]
+        return self._cartesian(homogeneous).reshape(instance.__dict__[self.name])
+
+    def __set__(self, instance, value: np.ndarray):
+        if not instance.homogeneous and instance.arena is None:
+            instance.__dict__[self.name] = value
+            return
+        value = np.asarray(value, dtype=float)
+        cartesian = value.reshape(self.dim, -1) if self.axis == 0 else value.reshape(-1, self.dim)
+        homogeneous = instance.__dict__.get('homogeneous_coordinates')
+        if homogeneous is None or self._cartesian(homogeneous).shape != cartesian.shape:
+            num_points = cartesian.shape[1 - self.axis]
+            if instance.arena is not None:
+                homogeneous = self.to_layout(instance.arena.resize(instance, num_points))
+            else:
+                shape = (self.dim + 1, num_points) if self.axis == 0 else (num_points, self.dim + 1)
+                homogeneous = np.ones(shape, dtype=float)
+                instance.__dict__['homogeneous_coordinates'] = homogeneous
+        self._cartesian(homogeneous)[...] = cartesian
+        # in homogeneous mode the attribute itself only keeps the shape of the cartesian view
+        instance.__dict__[self.name] = value.shape
+        if instance.arena is not None:
+            instance.arena.version += 1
+
+    def get_rows(self, instance) -> np.ndarray:
+        """
+        Returns the coordinates of the given element as homogeneous points of shape [N, dim + 1].
+        """
+        homogeneous = instance.__dict__.get('homogeneous_coordinates')
+        if homogeneous is not None:
+            return self.to_layout(homogeneous)
+        cartesian = np.asarray(instance.__dict__[self.name], dtype=float)
+        cartesian = cartesian.reshape(self.dim, -1) if self.axis == 0 else cartesian.reshape(-1, self.dim)
+        rows = np.ones((cartesian.shape[1 - self.axis], self.dim + 1), dtype=float)
+        rows[:, :self.dim] = self.to_layout(cartesian)
+        return rows
+
+    def bind(self, instance, rows: np.ndarray):
+        """
+        Lets the given element use the given rows of shape [N, dim + 1] as storage. The rows have to contain the
+        coordinates of the element already.
+        """
+        if instance.__dict__.get('homogeneous_coordinates') is None:
+            instance.__dict__[self.name] = np.shape(instance.__dict__[self.name])
+        instance.__dict__['homogeneous_coordinates'] = self.to_layout(rows)
+
+    def unbind(self, instance):
+        """
+        Copies the coordinates of the given element out of the storage given to bind() into its own memory.
+        """
+        if instance.homogeneous:
+            instance.__dict__['homogeneous_coordinates'] = instance.__dict__['homogeneous_coordinates'].copy()
+        else:
+            instance.__dict__[self.name] = self.__get__(instance).copy()
+            instance.__dict__['homogeneous_coordinates'] = None
+
+
 class RenderKind(enum.Enum):
     LINE = enum.auto()
     POINT = enum.auto()
@@ -43,14 +159,102 @@ CoordinateSystem = CoordSystem2D | CoordSystem3D
 
 
 class Element:
+    """
+    Every element has a version, that is increased whenever an attribute is set to a different value. Attributes in
+    UNVERSIONED_ATTRIBUTES do not influence the scene and are ignored. Arrays modified in place have to call touch().
+    """
     __metaclass__ = abc.ABCMeta
 
+    UNVERSIONED_ATTRIBUTES: FrozenSet[str] = frozenset({'version', 'memo'})
+
+    # elements with HomogeneousCoordinates set these in their constructor
+    homogeneous: bool = False
+    homogeneous_coordinates: Optional[np.ndarray] = None
+
+    # set by the PointArena, that stores the coordinates of this element
+    arena: Optional['PointArena'] = None
+    arena_slot: int = -1
+
+    # the event types handle_event() reacts to. The ElementBuffer does not dispatch other events to this element.
+    EVENT_TYPES: FrozenSet[int] = frozenset({pg.MOUSEMOTION, pg.KEYDOWN})
+
     def __init__(self, name: str, render_kind: RenderKind):
+        self.version = 0
+        self.memo: Dict[str, Tuple[Hashable, Any]] = {}
         self.name = name
         self.hovered = False
         self.render_kind = render_kind
         self.has_to_be_removed = False
         self.visible = True
+        self.color_index = 0
+
+    def __setattr__(self, name: str, value: Any):
+        if name not in self.UNVERSIONED_ATTRIBUTES and hasattr(self, 'version'):
+            if not hasattr(self, name) or not values_equal(getattr(self, name), value):
+                object.__setattr__(self, 'version', self.version + 1)
+                if self.arena is not None and name in PointArena.METADATA:
+                    self.arena.set_metadata(self.arena_slot, name, value)
+        object.__setattr__(self, name, value)
+
+    def touch(self):
+        """
+        Marks this element as changed. Has to be called after an array of this element was modified in place.
+        """
+        self.version += 1
+        if self.arena is not None:
+            self.arena.version += 1
+
+    @classmethod
+    def get_point_storage(cls) -> Optional[HomogeneousCoordinates]:
+        """
+        Returns the descriptor, that stores the coordinates of this element type or None, if the element has no
+        coordinates, that can be stored in a PointArena.
+        """
+        storage = getattr(cls, 'coordinates', None)
+        return storage if isinstance(storage, HomogeneousCoordinates) else None
+
+    def get_color(self) -> pg.Color:
+        return ELEMENT_COLORS[self.color_index % len(ELEMENT_COLORS)]
+
+    def get_version(self) -> Hashable:
+        """
+        Returns the version of this element. Elements that depend on other elements include their versions, so the
+        version changes whenever something changes, that influences this element.
+        """
+        return self.version
+
+    def get_dependencies(self) -> List['Element']:
+        """
+        Returns the elements, this element is derived from.
+        """
+        return []
+
+    def update(self):
+        """
+        Recomputes the derived data of this element, if one of its dependencies changed. ElementBuffer.update() calls
+        this for all derived elements in topological order.
+        """
+        pass
+
+    def memoize(self, name: str, compute: Callable[[], Any], key: Hashable = None) -> Any:
+        """
+        Returns the result of compute(). The result is cached under the given name and only computed again, if the
+        version of this element or of one of its dependencies or the given key changed. Cached arrays are made
+        read-only, as they are shared.
+
+        :param name: The name of the cached value
+        :param compute: Function, that computes the value
+        :param key: Additional inputs of compute, that are not part of this element, like the coordinate system
+        """
+        version = self.get_version() if key is None else (self.get_version(), key)
+        entry = self.memo.get(name)
+        if entry is None or entry[0] != version:
+            value = compute()
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+            entry = (version, value)
+            self.memo[name] = entry
+        return entry[1]
 
     @abc.abstractmethod
     def get_array(self) -> np.ndarray:
@@ -61,22 +265,58 @@ class Element:
         """
         pass
 
+    def get_projectable_array(self) -> np.ndarray:
+        """
+        Returns the array of this element in a form, that can be passed to CoordinateSystem.transform().
+        For elements with homogeneous storage this is the stored homogeneous array, so no padded copy is created.
+        """
+        if self.homogeneous_coordinates is not None:
+            return self.homogeneous_coordinates
+        return self.get_array()
+
+    def get_render_points(self) -> Optional[np.ndarray]:
+        """
+        Returns the points in world coordinates, that are transformed into screen coordinates to render this element.
+        Render paths transform the points of all elements at once with CoordinateSystem.transform_batch().
+
+        :return: The points in the layout expected by the coordinate system or None, if the element transforms its
+                 points itself.
+        """
+        return None
+
     @abc.abstractmethod
-    def render(self, screen: pg.Surface, coordinate_system: CoordSystem2D | CoordSystem3D):
+    def render(
+            self, screen: pg.Surface, coordinate_system: CoordSystem2D | CoordSystem3D,
+            screen_points: Optional[np.ndarray] = None
+    ) -> Optional[pg.Rect]:
         """
         Renders the element in the coordinate system.
 
         :param screen: The screen to draw on
         :param coordinate_system: The coordinate system to convert coordinates into screen coordinates.
+        :param screen_points: The render points already transformed into screen coordinates. If None, the element
+                              transforms its render points itself.
+        :return: The bounding rect of the drawn area or None, if nothing was drawn.
         """
         pass
 
+    def get_render_state(self) -> Optional[Hashable]:
+        """
+        Returns a hashable description of everything that influences how this element is rendered. As long as the
+        render state and the coordinate system do not change, rendering this element again gives the same result.
+
+        :return: The render state or None, if it is unknown and the element has to be rendered every frame.
+        """
+        # arrays modified in place call touch(), so the version changes with the points without copying them
+        return self.visible, self.hovered, self.render_kind, self.color_index, self.get_version()
+
     @abc.abstractmethod
     def handle_event(self, event: pg.event.Event, coordinate_system: CoordinateSystem, mouse_position: np.ndarray):
         """
         Handles the given event.
 
-        :param event: The event to handle. All events are handled.
+        :param event: The event to handle. The ElementBuffer only dispatches events of the types in EVENT_TYPES. Mouse
+                      events are only dispatched, if the element is near the mouse or has_mouse_state() is True.
         :param coordinate_system: The coordinate system, that can be used to convert between screen and element space.
         :param mouse_position: The mouse position in screen space
         """
@@ -90,30 +330,544 @@ class Element:
     def is_hovered(self, _mouse_position: np.ndarray, _coordinate_system: CoordinateSystem):
         return False
 
+    def has_mouse_state(self) -> bool:
+        """
+        Returns True, while the element is hovered or dragged. Such elements receive all mouse events, even if they are
+        hidden or the mouse left them, so they can reset their state.
+        """
+        return self.hovered
 
-class ElementBuffer:
+    def is_animated(self) -> bool:
+        """
+        Returns True, if the element changes with the time of the element buffer.
+        """
+        return False
+
+
+def _metadata_value(value: Any) -> Any:
+    return value.value if isinstance(value, enum.Enum) else value
+
+
+def _grow(array: np.ndarray, capacity: int) -> np.ndarray:
+    grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class PointArena:
+    """
+    Stores the coordinates of many elements in one contiguous array of homogeneous points of shape [capacity, dim + 1].
+    Every element owns a slot, that is a range of rows of this array, and stores its coordinates as a view of these
+    rows. The render kind, visibility and color index of every slot are kept in compact arrays, so passes over the whole
+    scene like projection, culling and hover testing run vectorized. Hover tests use a spatial index over the
+    transformed points.
+    Whenever the rows of an element move, because the array grows or elements are removed, the views of the affected
+    elements are bound again.
+    """
+    METADATA: Dict[str, type] = {'visible': np.bool_, 'render_kind': np.int8, 'color_index': np.int16}
+
+    def __init__(self, capacity: int = 64):
+        self.dim: Optional[int] = None
+        self.axis: Optional[int] = None
+        self.points: Optional[np.ndarray] = None
+        self.size = 0
+        self.owners: List[Element] = []
+        self.starts = np.zeros(capacity, dtype=int)
+        self.counts = np.zeros(capacity, dtype=int)
+        self.metadata: Dict[str, np.ndarray] = {
+            name: np.zeros(capacity, dtype=dtype) for name, dtype in self.METADATA.items()
+        }
+        self.version = 0
+        self.screen_grid: Optional[Tuple[Hashable, ScreenGrid, np.ndarray]] = None
+        self.hover_cache: Optional[Tuple[Hashable, FrozenSet[int]]] = None
+
+    def __len__(self) -> int:
+        return len(self.owners)
+
+    def _reserve(self, num_slots: int, num_points: int):
+        if num_slots > len(self.starts):
+            capacity = max(num_slots, 2 * len(self.starts))
+            self.starts = _grow(self.starts, capacity)
+            self.counts = _grow(self.counts, capacity)
+            self.metadata = {name: _grow(array, capacity) for name, array in self.metadata.items()}
+        if num_points > len(self.points):
+            points = np.ones((max(num_points, 2 * len(self.points)), self.dim + 1), dtype=float)
+            points[:self.size] = self.points[:self.size]
+            self.points = points
+            self._bind(0)
+
+    def _bind(self, first_slot: int):
+        """
+        Binds the views of all elements starting with the given slot to their rows.
+        """
+        for slot in range(first_slot, len(self.owners)):
+            owner = self.owners[slot]
+            start = self.starts[slot]
+            owner.__dict__['arena_slot'] = slot
+            owner.get_point_storage().bind(owner, self.points[start:start + self.counts[slot]])
+
+    def _to_layout(self, rows: np.ndarray) -> np.ndarray:
+        return rows.T if self.axis == 0 else rows
+
+    def _reduce_slots(self, ufunc: np.ufunc, values: np.ndarray, empty: Any) -> np.ndarray:
+        """
+        Reduces the given values of every row to one value per slot. Slots without points get the value empty.
+        """
+        num_slots = len(self.owners)
+        counts = self.counts[:num_slots]
+        result = np.full((num_slots,) + values.shape[1:], empty, dtype=values.dtype)
+        non_empty = counts > 0
+        if np.any(non_empty):
+            result[non_empty] = ufunc.reduceat(values, self.starts[:num_slots][non_empty], axis=0)
+        return result
+
+    def sync(self, elements: List[Element]):
+        """
+        Makes the arena store the coordinates of the given elements in the given order. Elements, that are no longer
+        in the list, are removed and new elements are appended.
+        """
+        if self.owners == elements:
+            return
+        elements = [element for element in elements if element.get_point_storage() is not None]
+        members = set(map(id, elements))
+        self.remove([owner for owner in self.owners if id(owner) not in members])
+        if self.owners != elements[:len(self.owners)]:
+            # the order changed, so all elements are stored again
+            self.remove(list(self.owners))
+        self.attach(elements[len(self.owners):])
+
+    def attach(self, elements: Iterable[Element]):
+        """
+        Appends the coordinates of the given elements to the arena. From now on the elements store their coordinates
+        in the arena.
+        """
+        for element in elements:
+            storage = element.get_point_storage()
+            if element.arena is not None:
+                element.arena.remove([element])
+            if self.points is None:
+                self.dim, self.axis = storage.dim, storage.axis
+                self.points = np.ones((len(self.starts), self.dim + 1), dtype=float)
+            elif (storage.dim, storage.axis) != (self.dim, self.axis):
+                raise ValueError('Element {} does not fit into an arena of dimension {}'.format(element.name, self.dim))
+            rows = storage.get_rows(element)
+            slot = len(self.owners)
+            self._reserve(slot + 1, self.size + len(rows))
+            self.points[self.size:self.size + len(rows)] = rows
+            self.starts[slot] = self.size
+            self.counts[slot] = len(rows)
+            for name, array in self.metadata.items():
+                array[slot] = _metadata_value(getattr(element, name))
+            self.owners.append(element)
+            self.size += len(rows)
+            element.__dict__['arena'] = self
+            self._bind(slot)
+        self.version += 1
+
+    def remove(self, elements: Iterable[Element]):
+        """
+        Removes the given elements from the arena. The elements get a copy of their coordinates and the remaining
+        rows are compacted in place.
+        """
+        slots = sorted(element.arena_slot for element in elements if element.arena is self)
+        if not slots:
+            return
+        num_slots = len(self.owners)
+        keep = np.ones(num_slots, dtype=bool)
+        keep[slots] = False
+        for slot in reversed(slots):
+            owner = self.owners.pop(slot)
+            owner.get_point_storage().unbind(owner)
+            owner.__dict__['arena'] = None
+            owner.__dict__['arena_slot'] = -1
+
+        keep_rows = np.repeat(keep, self.counts[:num_slots])
+        size = int(np.count_nonzero(keep_rows))
+        self.points[:size] = self.points[:self.size][keep_rows]
+        self.size = size
+        counts = self.counts[:num_slots][keep]
+        self.counts[:len(counts)] = counts
+        self.starts[:len(counts)] = np.cumsum(counts) - counts
+        for array in self.metadata.values():
+            array[:len(counts)] = array[:num_slots][keep]
+        self._bind(slots[0])
+        self.version += 1
+
+    def resize(self, element: Element, num_points: int) -> np.ndarray:
+        """
+        Changes the number of points of the given element. The rows of the following elements are moved in place.
+
+        :return: The new rows of the element of shape [num_points, dim + 1]. The cartesian part is uninitialized.
+        """
+        slot = element.arena_slot
+        start = self.starts[slot]
+        old_num_points = self.counts[slot]
+        delta = num_points - old_num_points
+        self._reserve(len(self.owners), self.size + delta)
+        self.points[start + num_points:self.size + delta] = self.points[start + old_num_points:self.size]
+        self.points[start:start + num_points] = 1.0
+        self.size += delta
+        self.counts[slot] = num_points
+        self.starts[slot + 1:len(self.owners)] += delta
+        self._bind(slot)
+        self.version += 1
+        return self.points[start:start + num_points]
+
+    def set_metadata(self, slot: int, name: str, value: Any):
+        self.metadata[name][slot] = _metadata_value(value)
+        self.version += 1
+
+    def get_projectable_array(self) -> np.ndarray:
+        """
+        Returns the homogeneous coordinates of all elements in the layout of the coordinate system.
+        """
+        return self._to_layout(self.points[:self.size])
+
+    def get_slot_points(self, screen_points: np.ndarray, slot: int) -> np.ndarray:
+        """
+        Returns the part of the transformed points of all elements, that belongs to the given slot.
+        """
+        start = self.starts[slot]
+        stop = start + self.counts[slot]
+        return screen_points[:, start:stop] if self.axis == 0 else screen_points[start:stop]
+
+    def get_on_screen_mask(
+            self, screen_points: np.ndarray, zero_point: np.ndarray, screen_size: Tuple[int, int]
+    ) -> np.ndarray:
+        """
+        Tests for every slot, whether the element could draw onto the screen. The bounding box of the points of an
+        element, including the zero point for elements rendered as lines, is tested against the screen extended by
+        CULL_MARGIN. Elements with points, that are not finite, are never culled.
+
+        :param screen_points: The transformed points of all elements in the layout of the coordinate system.
+        :param zero_point: The zero point of the coordinate system in screen coordinates
+        :param screen_size: The size of the screen
+        :return: A bool array with one entry per slot
+        """
+        screen_points = self._to_layout(screen_points)[:, :2]
+        lower = self._reduce_slots(np.fmin, screen_points, np.inf)
+        upper = self._reduce_slots(np.fmax, screen_points, -np.inf)
+        lines = self.metadata['render_kind'][:len(self.owners)] == RenderKind.LINE.value
+        zero_point = np.asarray(zero_point, dtype=float).reshape(-1)[:2]
+        lower[lines] = np.fmin(lower[lines], zero_point)
+        upper[lines] = np.fmax(upper[lines], zero_point)
+        width, height = screen_size
+        on_screen = ((upper[:, 0] > -CULL_MARGIN) & (lower[:, 0] < width + CULL_MARGIN) &
+                     (upper[:, 1] > -CULL_MARGIN) & (lower[:, 1] < height + CULL_MARGIN))
+        finite = self._reduce_slots(np.logical_and, np.all(np.isfinite(screen_points), axis=1), True)
+        return on_screen | ~finite
+
+    def get_screen_grid(self, coordinate_system: CoordinateSystem) -> Tuple[ScreenGrid, np.ndarray]:
+        """
+        Returns a spatial index over the transformed points of all elements and the slot of every indexed point. The
+        index is only built again, after the coordinate system or the arena changed.
+        """
+        key = (coordinate_system, coordinate_system.version, self.version)
+        if self.screen_grid is None or self.screen_grid[0] != key:
+            if self.dim == 3:
+                # only points inside the clip space can be hovered
+                screen_points = coordinate_system.transform(self.get_projectable_array(), clip=False)
+                rows = np.flatnonzero(coordinate_system.get_clip_mask(screen_points))
+            else:
+                screen_points = coordinate_system.transform(self.get_projectable_array()).T
+                rows = np.arange(self.size)
+            slots = np.repeat(np.arange(len(self.owners)), self.counts[:len(self.owners)])[rows]
+            self.screen_grid = (key, ScreenGrid(screen_points[rows, :2], HOVER_DISTANCE), slots)
+        return self.screen_grid[1], self.screen_grid[2]
+
+    def get_hovered_slots(self, mouse_position: np.ndarray, coordinate_system: CoordinateSystem) -> FrozenSet[int]:
+        """
+        Returns the slots of the visible elements, that have a point near the mouse. The result is cached until the
+        mouse, the coordinate system or the arena changes.
+        """
+        if not self.owners:
+            return frozenset()
+        key = (coordinate_system, coordinate_system.version, self.version, tuple(np.ravel(mouse_position).tolist()))
+        if self.hover_cache is None or self.hover_cache[0] != key:
+            screen_grid, slots = self.get_screen_grid(coordinate_system)
+            hovered = np.unique(slots[screen_grid.query(mouse_position, HOVER_DISTANCE)])
+            self.hover_cache = (key, frozenset(hovered[self.metadata['visible'][hovered]].tolist()))
+        return self.hover_cache[1]
+
+    def is_hovered(self, element: Element, mouse_position: np.ndarray, coordinate_system: CoordinateSystem) -> bool:
+        return element.arena_slot in self.get_hovered_slots(mouse_position, coordinate_system)
+
+
+def render_elements(
+        screen: pg.Surface, coordinate_system: CoordinateSystem, elements: List[Element]
+) -> List[Optional[pg.Rect]]:
+    """
+    Renders the given elements in order. The render points of all elements are transformed with a single call to
+    transform_batch(). Elements stored in a PointArena render their stored coordinates. For them the whole arena is
+    transformed at once and elements outside the screen are culled.
+
+    :param screen: The screen to draw on
+    :param coordinate_system: The coordinate system to convert coordinates into screen coordinates.
+    :param elements: The elements to render
+    :return: The bounding rect of the drawn area for every element
+    """
+    arenas = list({id(element.arena): element.arena for element in elements if element.arena is not None}.values())
+    screen_points = coordinate_system.transform_batch(
+        [arena.get_projectable_array() for arena in arenas] +
+        [None if element.arena is not None else element.get_render_points() for element in elements]
+    )
+    arena_points = {id(arena): points for arena, points in zip(arenas, screen_points)}
+    on_screen = {
+        id(arena): arena.get_on_screen_mask(points, coordinate_system.get_zero_point(), screen.get_size())
+        for arena, points in zip(arenas, screen_points)
+    }
+    rects = []
+    for element, points in zip(elements, screen_points[len(arenas):]):
+        arena = element.arena
+        if arena is not None:
+            if not on_screen[id(arena)][element.arena_slot]:
+                rects.append(None)
+                continue
+            points = arena.get_slot_points(arena_points[id(arena)], element.arena_slot)
+        rects.append(element.render(screen, coordinate_system, points))
+    return rects
+
+
+class EventDispatcher:
+    """
+    Dispatches events to the elements of an ElementBuffer. Elements only receive the event types in their EVENT_TYPES.
+    Mouse events are dispatched to
+    - the visible elements of the arena near the mouse, which are found with its spatial index,
+    - elements, that have a mouse state after the last mouse event, so they can reset it,
+    - visible elements outside the arena like transforms, which test the mouse position themselves.
+    So the cost of dispatching a mouse event does not depend on the number of elements in the arena.
+    """
     def __init__(self):
+        self.members: Tuple[List[Element], ...] = ()
+        self.positions: Dict[int, int] = {}
+        self.subscribers: Dict[int, List[Element]] = {}
+        self.active: List[Element] = []
+
+    def update(self, element_buffer: 'ElementBuffer'):
+        """
+        Builds the subscriber lists again, if elements were added or removed.
+        """
+        members = (element_buffer.elements, element_buffer.transforms, element_buffer.transformed)
+        if len(members) == len(self.members) and all(a == b for a, b in zip(members, self.members)):
+            return
+        self.members = tuple(list(elements) for elements in members)
+        self.positions = {id(element): index for index, element in enumerate(chain(*members))}
+        self.active = [element for element in self.active if id(element) in self.positions]
+        self.subscribers = {}
+        for element in chain(*members):
+            for event_type in element.EVENT_TYPES:
+                # mouse events reach elements of the arena through the spatial index
+                if event_type not in MOUSE_EVENT_TYPES or element.arena is not element_buffer.arena:
+                    self.subscribers.setdefault(event_type, []).append(element)
+
+    def get_targets(
+            self, event: pg.event.Event, element_buffer: 'ElementBuffer', coordinate_system: CoordinateSystem,
+            mouse_position: np.ndarray
+    ) -> List[Element]:
+        """
+        Returns the elements, that receive the given event, in render order.
+        """
+        targets = {}
+        if event.type in MOUSE_EVENT_TYPES:
+            arena = element_buffer.arena
+            for element in self.active:
+                targets[id(element)] = element
+            for slot in arena.get_hovered_slots(mouse_position, coordinate_system):
+                targets[id(arena.owners[slot])] = arena.owners[slot]
+        for element in self.subscribers.get(event.type, []):
+            if element.visible:
+                targets[id(element)] = element
+        return sorted(
+            (element for element in targets.values() if event.type in element.EVENT_TYPES),
+            key=lambda element: self.positions.get(id(element), -1)
+        )
+
+    def dispatch(
+            self, event: pg.event.Event, element_buffer: 'ElementBuffer', coordinate_system: CoordinateSystem,
+            mouse_position: np.ndarray
+    ):
+        if tuple(map(len, self.members)) != (len(element_buffer.elements), len(element_buffer.transforms),
+                                             len(element_buffer.transformed)):
+            self.update(element_buffer)
+        targets = self.get_targets(event, element_buffer, coordinate_system, mouse_position)
+        for element in targets:
+            element.handle_event(event, coordinate_system, mouse_position)
+        if event.type in MOUSE_EVENT_TYPES:
+            active = {id(element): element for element in chain(self.active, targets)}
+            self.active = [element for element in active.values() if element.has_mouse_state()]
+
+
+def remove_flagged(elements: List[Element]) -> List[Element]:
+    """
+    Removes the elements, that have to be removed, from the given list in place.
+
+    :return: The removed elements
+    """
+    removed = []
+    num_kept = 0
+    for element in elements:
+        if element.has_to_be_removed:
+            removed.append(element)
+        else:
+            elements[num_kept] = element
+            num_kept += 1
+    del elements[num_kept:]
+    return removed
+
+
+def _visit_dependencies(element: Element, visited: Set[int], order: List[Element]):
+    """
+    Appends the element after its dependencies to order, if it has dependencies and was not visited.
+    A module function instead of a recursive closure, as a closure referencing itself is a reference cycle, that keeps
+    the visited ids of every update alive until the garbage collector runs.
+    """
+    if id(element) in visited:
+        return
+    visited.add(id(element))
+    dependencies = element.get_dependencies()
+    for dependency in dependencies:
+        _visit_dependencies(dependency, visited, order)
+    if dependencies:
+        order.append(element)
+
+
+class ElementBuffer:
+    """
+    Holds all elements of a scene. The coordinates of the elements in self.elements are stored in self.arena, which is
+    synchronized with the list in update(). Results of definitions evaluated by the evaluator are received in update().
+    """
+    def __init__(self, evaluator=None):
+        """
+        :param evaluator: The WorkerEvaluator, that evaluates the definitions of CustomTransformed elements. If it is
+                          None, the definitions are evaluated while updating.
+        """
         self.elements: List[Element] = []
         self.transforms: List[Element] = []
         self.transformed: List[Element] = []
+        self.arena = PointArena()
+        self.event_dispatcher = EventDispatcher()
+        self.evaluator = evaluator
+        # the time in seconds, that selects the shown frame of animated elements
+        self.time = 0.0
+        self.updates = 0
+        # the number of definitions evaluated while updating and the seconds spent on them
+        self.evaluations = 0
+        self.evaluation_seconds = 0.0
 
     def __iter__(self) -> Iterator[Element]:
         return iter(self.elements)
 
+    def all_elements(self) -> Iterator[Element]:
+        """
+        Iterates over elements, transforms and transformed in render order.
+        """
+        return chain(self.elements, self.transforms, self.transformed)
+
     def create_example_elements(self):
         # self.elements.append(Vector('v1', np.array([1, 1])))
         pass
 
+    def get_elements_by_name(self, names: Iterable[str]) -> List[Element]:
+        """
+        Returns the elements with the given names. If several elements have the same name, the last one in render order
+        is used.
+        """
+        elements_by_name = {element.name: element for element in self.all_elements()}
+        return [elements_by_name[name] for name in sorted(names) if name in elements_by_name]
+
+    def get_update_order(self) -> List[Element]:
+        """
+        Returns all elements with dependencies in topological order, so every element comes after the elements it
+        depends on. Elements with circular dependencies are ordered by the first visit.
+        """
+        order = []
+        visited = set()
+        for e in self.all_elements():
+            _visit_dependencies(e, visited, order)
+        return order
+
+    def update(self):
+        """
+        Stores new elements in the arena and updates all derived elements in topological order. Elements only
+        recompute their data, if one of their dependencies changed.
+        """
+        self.updates += 1
+        self.arena.sync(self.elements)
+        self.event_dispatcher.update(self)
+        if self.evaluator is not None:
+            self.evaluator.poll()
+        for element in self.get_update_order():
+            element.update()
+
+    def is_animated(self) -> bool:
+        return any(element.is_animated() for element in self.transformed)
+
+    def is_evaluating(self) -> bool:
+        """
+        Returns whether definitions are evaluated in the worker process of the evaluator.
+        """
+        return self.evaluator is not None and self.evaluator.has_jobs()
+
+    def get_hovered_elements(self, mouse_position: np.ndarray, coordinate_system: CoordinateSystem) -> List[Element]:
+        """
+        Returns the elements and transforms under the mouse. Elements in the arena are looked up in its spatial index.
+        """
+        slots = self.arena.get_hovered_slots(mouse_position, coordinate_system)
+        hovered = [self.arena.owners[slot] for slot in sorted(slots)]
+        # elements added since the last update are not in the arena yet
+        unindexed = [] if self.arena.owners == self.elements else self.elements
+        hovered.extend(
+            element for element in chain(unindexed, self.transforms)
+            if element.arena is not self.arena and element.is_hovered(mouse_position, coordinate_system)
+        )
+        return hovered
+
+    def get_version(self) -> Hashable:
+        """
+        Returns the versions of all elements. Changes if an element changed, was added or was removed.
+        """
+        return tuple((id(element), element.get_version()) for element in self.all_elements())
+
+    def add_evaluation(self, seconds: float):
+        """
+        Counts a definition, that was evaluated while updating.
+        """
+        self.evaluations += 1
+        self.evaluation_seconds += seconds
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Returns the number of elements, transforms, transformed elements and updates and the number and the seconds of
+        the evaluations of definitions, including the evaluations of the evaluator.
+        """
+        stats = {
+            'elements': len(self.elements),
+            'transforms': len(self.transforms),
+            'transformed': len(self.transformed),
+            'updates': self.updates,
+            'evaluations': self.evaluations,
+            'cancelled_evaluations': 0,
+            'evaluation_seconds': self.evaluation_seconds,
+        }
+        if self.evaluator is not None:
+            for name, value in self.evaluator.get_stats().items():
+                stats[name] += value
+        return stats
+
     def remove_elements(self):
-        self.elements = [e for e in self.elements if not e.has_to_be_removed]
-        self.transforms = [t for t in self.transforms if not t.has_to_be_removed]
-        self.transformed = [t for t in self.transformed if not t.has_to_be_removed]
+        self.arena.remove(remove_flagged(self.elements))
+        remove_flagged(self.transforms)
+        for element in remove_flagged(self.transformed):
+            if self.evaluator is not None:
+                self.evaluator.discard(element)
+
+    def close(self):
+        if self.evaluator is not None:
+            self.evaluator.close()
 
     def render(self, screen: pg.Surface, coordinate_system: CoordinateSystem):
-        for element in chain(self.elements, self.transforms, self.transformed):
-            if element.visible:
-                element.render(screen, coordinate_system)
+        self.update()
+        render_elements(screen, coordinate_system, [element for element in self.all_elements() if element.visible])
 
     def handle_event(self, event: pg.event.Event, coordinate_system: CoordinateSystem, mouse_position: np.ndarray):
-        for e in chain(self.elements, self.transforms, self.transformed):
-            e.handle_event(event, coordinate_system, mouse_position)
+        self.event_dispatcher.dispatch(event, self, coordinate_system, mouse_position)
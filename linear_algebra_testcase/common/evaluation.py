@@ -0,0 +1,369 @@
+import atexit
+import sys
+import time
+from typing import Any, Callable, Dict, Hashable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from linear_algebra_testcase.common.animation import evaluate_frames
+from linear_algebra_testcase.common.expressions import Expression
+
+try:
+    import multiprocessing
+    from multiprocessing import shared_memory
+except ImportError:
+    # processes are not available in the browser
+    multiprocessing = None
+    shared_memory = None
+
+# evaluations, that take longer than this number of seconds, are cancelled
+EVALUATION_TIME_BUDGET = 2.0
+# the number of milliseconds between checks for finished evaluations, while the viewer waits for events
+EVALUATION_POLL_INTERVAL = 15
+# the number of seconds to wait for the worker process to end, before it is killed
+WORKER_JOIN_TIMEOUT = 0.5
+
+
+class SharedArray:
+    """
+    Memory block, that passes a numpy array to the worker process. The block is only written, if the version of the
+    array changed, and is allocated again, if the array does not fit into it.
+    """
+    def __init__(self, size: int):
+        self.memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.shape: Tuple[int, ...] = (0,)
+        self.dtype = np.dtype(float)
+        self.version: Optional[Hashable] = None
+
+    def write(self, array: np.ndarray, version: Optional[Hashable]) -> bool:
+        """
+        Copies the given array into the memory block, if it differs from the last written array.
+
+        :param array: The array to write
+        :param version: The version of the array. If it is None, the array is always written. Has to include the
+                        identity of the element, that provides the array, like the versions of CustomTransformed, as an
+                        element can be replaced by an element with the same name and version counter.
+        :return: False, if the array does not fit into the memory block
+        """
+        if array.nbytes > self.memory.size:
+            return False
+        if version is None or version != self.version or array.shape != self.shape or array.dtype != self.dtype:
+            self.shape = array.shape
+            self.dtype = array.dtype
+            np.copyto(np.ndarray(array.shape, array.dtype, buffer=self.memory.buf), array)
+            self.version = version
+        return True
+
+    def get_descriptor(self) -> Tuple[str, Tuple[int, ...], str]:
+        return self.memory.name, self.shape, self.dtype.str
+
+    def close(self):
+        self.memory.close()
+        self.memory.unlink()
+
+
+def run_worker(connection, get_constants: Callable[[], Dict[str, Any]]):
+    """
+    The main function of the worker process. Evaluates the expressions of received jobs and sends back the results. The
+    expression of every element is kept, so sub-expressions over unchanged arrays are not evaluated again.
+
+    :param connection: The connection to the viewer
+    :param get_constants: Returns the modules and functions, that can be used in expressions
+    """
+    constants = get_constants()
+    constant_names = frozenset(constants)
+    expressions: Dict[int, Expression] = {}
+    memories: Dict[str, shared_memory.SharedMemory] = {}
+    released: List[shared_memory.SharedMemory] = []
+    connection.send(('ready',))
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            break
+        if message[0] == 'discard':
+            _kind, owner, memory_names = message
+            expressions.pop(owner, None)
+            released.extend(memories.pop(memory_name) for memory_name in memory_names if memory_name in memories)
+        elif message[0] == 'evaluate':
+            _kind, job_id, owner, source, animated, variables, shared_arrays, versions = message
+            result = None
+            error = None
+            try:
+                expression = expressions.get(owner)
+                if expression is None or expression.source != source:
+                    expression = Expression(source, constant_names)
+                    expressions[owner] = expression
+                eval_locals = dict(constants)
+                eval_locals.update(variables)
+                for name, (memory_name, shape, dtype) in shared_arrays.items():
+                    if memory_name not in memories:
+                        memories[memory_name] = shared_memory.SharedMemory(memory_name)
+                    array = np.ndarray(shape, np.dtype(dtype), buffer=memories[memory_name].buf)
+                    array.flags.writeable = False
+                    eval_locals[name] = array
+                if animated:
+                    result = evaluate_frames(expression, eval_locals, versions)
+                else:
+                    result = expression.evaluate(eval_locals, versions)
+            except Exception as e:
+                error = repr(e)
+            try:
+                connection.send(('result', job_id, result, error))
+            except Exception as e:
+                # the result can not be pickled
+                connection.send(('result', job_id, None, repr(e)))
+
+        # memory blocks can only be closed, after no cached value uses them anymore
+        for memory in list(released):
+            try:
+                memory.close()
+                released.remove(memory)
+            except BufferError:
+                pass
+
+
+class WorkerEvaluator:
+    """
+    Evaluates the definitions of CustomTransformed elements in a worker process, so slow definitions do not block the
+    viewer and the definitions can not change the state of the viewer. Arrays are passed to the worker in shared
+    memory, other values are pickled.
+    One evaluation runs at a time. An element waits for the evaluation of the elements it depends on. Evaluations,
+    that take longer than the time budget, are cancelled by terminating the worker, which is started again for the next
+    evaluation. Until the result of an evaluation arrives, the element keeps its last result.
+    """
+    def __init__(self, get_constants: Callable[[], Dict[str, Any]], time_budget: float = EVALUATION_TIME_BUDGET):
+        """
+        :param get_constants: Returns the modules and functions, that can be used in definitions. Has to be a module
+                              level function or static method, as it is passed to the worker process.
+        :param time_budget: The maximal number of seconds for one evaluation
+        """
+        self.get_constants = get_constants
+        self.time_budget = time_budget
+        self.context = multiprocessing.get_context('spawn')
+        self.process = None
+        self.connection = None
+        self.ready = False
+        # the latest job of every element, that did not start yet, by id of the element
+        self.queue: Dict[int, Tuple[Any, str, bool, Dict[str, Any], Dict[str, Hashable]]] = {}
+        # job id, element and start time of the running evaluation
+        self.running: Optional[Tuple[int, Any, float]] = None
+        self.shared_arrays: Dict[Tuple[int, str], SharedArray] = {}
+        self.job_counter = 0
+        # the number of received results and cancelled evaluations and the seconds until the results arrived
+        self.evaluations = 0
+        self.cancelled_evaluations = 0
+        self.evaluation_seconds = 0.0
+        self.start_worker()
+        # the shared memory is not freed automatically, if the viewer ends without calling close
+        atexit.register(self.close)
+
+    @classmethod
+    def create(cls, get_constants: Callable[[], Dict[str, Any]]) -> Optional['WorkerEvaluator']:
+        """
+        Creates a WorkerEvaluator. Returns None, if the platform can not start processes, like in the browser.
+        """
+        if multiprocessing is None or shared_memory is None or sys.platform == 'emscripten':
+            return None
+        try:
+            return cls(get_constants)
+        except OSError:
+            return None
+
+    def start_worker(self):
+        self.connection, worker_connection = self.context.Pipe()
+        self.process = self.context.Process(
+            target=run_worker, args=(worker_connection, self.get_constants), name='evaluation-worker', daemon=True
+        )
+        self.process.start()
+        worker_connection.close()
+        self.ready = False
+
+    def stop_worker(self):
+        if self.process is None:
+            return
+        self.process.terminate()
+        self.process.join(WORKER_JOIN_TIMEOUT)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+        self.process = None
+        self.connection = None
+        self.running = None
+
+    def is_pending(self, element) -> bool:
+        """
+        Returns whether the evaluation of the given element is queued or running.
+        """
+        return id(element) in self.queue or (self.running is not None and self.running[1] is element)
+
+    def has_jobs(self) -> bool:
+        return bool(self.queue) or self.running is not None
+
+    def submit(
+            self, element, source: str, variables: Dict[str, Any], versions: Mapping[str, Hashable],
+            animated: bool = False
+    ):
+        """
+        Queues the evaluation of the definition of the given element. A queued evaluation of the same element, that
+        did not start yet, is replaced. When the evaluation finished, element.receive_result(result, error) is called.
+
+        :param element: The CustomTransformed to evaluate
+        :param source: The definition of the element
+        :param variables: The values of the names used by the definition
+        :param versions: The versions of the names used by the definition. Arrays are only passed to the worker again,
+                         if their version changed, so the versions have to include the identity of the elements.
+        :param animated: Whether the definition uses the time variable. Then all frames of the animation are evaluated.
+        """
+        self.queue[id(element)] = (element, source, animated, variables, dict(versions))
+        # results are only delivered in poll, so elements do not change while they are rendered
+        if self.running is None and self.ready:
+            self.start_next()
+
+    def discard(self, element):
+        """
+        Drops the queued evaluation and the shared memory of the given element, after it was removed.
+        """
+        self.queue.pop(id(element), None)
+        if self.running is not None and self.running[1] is element:
+            # let the worker finish, but ignore the result
+            self.running = (self.running[0], None, self.running[2])
+        memory_names = []
+        for key in [key for key in self.shared_arrays if key[0] == id(element)]:
+            shared_array = self.shared_arrays.pop(key)
+            memory_names.append(shared_array.memory.name)
+            shared_array.close()
+        if self.process is not None:
+            self.send(('discard', id(element), memory_names))
+
+    def poll(self):
+        """
+        Delivers the result of the running evaluation, if it finished, cancels it, if it exceeds the time budget, and
+        starts the next queued evaluation.
+        """
+        if self.process is None:
+            self.start_worker()
+        try:
+            while self.connection.poll():
+                message = self.connection.recv()
+                if message[0] == 'ready':
+                    self.ready = True
+                elif message[0] == 'result' and self.running is not None and self.running[0] == message[1]:
+                    _job_id, element, start_time = self.running
+                    self.running = None
+                    self.evaluations += 1
+                    self.evaluation_seconds += time.perf_counter() - start_time
+                    if element is not None:
+                        element.receive_result(message[2], message[3])
+        except (EOFError, OSError):
+            # the worker process ended, for example because an expression called exit()
+            self.cancel('Evaluation worker stopped')
+            return
+
+        if self.running is not None and time.perf_counter() - self.running[2] > self.time_budget:
+            self.cancel('Evaluation cancelled after {} s'.format(self.time_budget))
+        if self.running is None and self.ready and self.queue:
+            self.start_next()
+
+    def cancel(self, error: str):
+        """
+        Stops the worker process and reports the error to the element of the running evaluation.
+        """
+        element = None if self.running is None else self.running[1]
+        if self.running is not None:
+            self.cancelled_evaluations += 1
+        self.stop_worker()
+        if element is not None:
+            element.receive_error(error)
+        self.start_worker()
+
+    def start_next(self):
+        key = next(iter(self.queue))
+        element, source, animated, variables, versions = self.queue.pop(key)
+        shared_descriptors = {}
+        pickled_variables = {}
+        for name, value in variables.items():
+            if isinstance(value, np.ndarray) and not value.dtype.hasobject:
+                shared_descriptors[name] = self.share_array(key, name, value, versions.get(name))
+            else:
+                pickled_variables[name] = value
+        self.job_counter += 1
+        self.running = (self.job_counter, element, time.perf_counter())
+        self.send((
+            'evaluate', self.job_counter, key, source, animated, pickled_variables, shared_descriptors, versions
+        ))
+
+    def send(self, message: Tuple):
+        try:
+            self.connection.send(message)
+        except OSError:
+            self.cancel('Evaluation worker stopped')
+
+    def share_array(
+            self, owner: int, name: str, array: np.ndarray, version: Optional[Hashable]
+    ) -> Tuple[str, Tuple[int, ...], str]:
+        shared_array = self.shared_arrays.get((owner, name))
+        if shared_array is None or not shared_array.write(array, version):
+            if shared_array is not None:
+                self.send(('discard', None, [shared_array.memory.name]))
+                shared_array.close()
+            # leave room to grow, so arrays, that grow a little, do not need new memory blocks every time
+            shared_array = SharedArray(array.nbytes * 2)
+            shared_array.write(array, version)
+            self.shared_arrays[(owner, name)] = shared_array
+        return shared_array.get_descriptor()
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Returns the number of evaluations, whose result arrived, the number of cancelled evaluations and the seconds
+        from starting the evaluations until their results arrived.
+        """
+        return {
+            'evaluations': self.evaluations,
+            'cancelled_evaluations': self.cancelled_evaluations,
+            'evaluation_seconds': self.evaluation_seconds,
+        }
+
+    def close(self):
+        """
+        Stops the worker process and frees the shared memory.
+        """
+        self.stop_worker()
+        for shared_array in self.shared_arrays.values():
+            shared_array.close()
+        self.shared_arrays.clear()
+        self.queue.clear()
+
+
+class _ResultReceiver:
+    def __init__(self):
+        self.result = None
+        self.error = None
+
+    def receive_result(self, result, error: Optional[str]):
+        self.result = result
+        self.error = error
+
+
+def _get_test_constants() -> Dict[str, Any]:
+    # a module level function, as it is passed to the worker process
+    return {'np': np}
+
+
+def test_replaced_shared_array():
+    evaluator = WorkerEvaluator(_get_test_constants)
+    try:
+        receiver = _ResultReceiver()
+        for identity, value in ((1, 1.0), (2, 5.0)):
+            # the second array replaces the first one with the same name, shape and version counter
+            evaluator.submit(receiver, 'a * 2', {'a': np.full(3, value)}, {'a': (identity, 7)})
+            receiver.result = None
+            deadline = time.perf_counter() + 10.0
+            while receiver.result is None and receiver.error is None and time.perf_counter() < deadline:
+                evaluator.poll()
+                time.sleep(0.01)
+            assert receiver.error is None, receiver.error
+            assert np.allclose(receiver.result, value * 2)
+    finally:
+        evaluator.close()
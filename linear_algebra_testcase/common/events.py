@@ -0,0 +1,48 @@
+from typing import Dict, Iterable, List
+
+import pygame as pg
+
+
+class MotionCoalescer:
+    """
+    Merges consecutive MOUSEMOTION events of a batch into one event. The merged event has the position and all other
+    attributes of the last event and the summed relative movement of all merged events. Motions are only merged, if
+    the pressed buttons did not change. The order of all other events is kept.
+    """
+    def __init__(self):
+        self.received = 0
+        self.coalesced = 0
+
+    def coalesce(self, events: Iterable[pg.event.Event]) -> List[pg.event.Event]:
+        """
+        Returns the given events with consecutive motions merged.
+
+        :param events: The events of one batch in the order they occurred
+        :return: The events to handle
+        """
+        result = []
+        num_events = 0
+        for event in events:
+            num_events += 1
+            if event.type == pg.MOUSEMOTION and result and result[-1].type == pg.MOUSEMOTION:
+                last = result[-1]
+                if last.dict.get('buttons') == event.dict.get('buttons'):
+                    attributes = dict(event.dict)
+                    attributes['rel'] = (last.rel[0] + event.rel[0], last.rel[1] + event.rel[1])
+                    result[-1] = pg.event.Event(pg.MOUSEMOTION, attributes)
+                    continue
+            result.append(event)
+        self.received += num_events
+        self.coalesced += num_events - len(result)
+        return result
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Returns the number of received events, the number of events, that were merged into another event, and the rate
+        of merged events.
+        """
+        return {
+            'received': self.received,
+            'coalesced': self.coalesced,
+            'coalesced_rate': self.coalesced / self.received if self.received else 0.0,
+        }
@@ -0,0 +1,234 @@
+import ast
+from typing import Any, Dict, FrozenSet, Hashable, List, Mapping, Optional, Set, Tuple
+
+import numpy as np
+
+# sub-expressions of these types are worth to be cached. Names, constants and attributes are cheap to evaluate and
+# generators can only be consumed once.
+FOLDABLE_TYPES = (
+    ast.BinOp, ast.UnaryOp, ast.Call, ast.Compare, ast.BoolOp, ast.Subscript, ast.IfExp,
+    ast.List, ast.Tuple, ast.Set, ast.Dict, ast.ListComp, ast.SetComp, ast.DictComp,
+)
+# calls of functions with these prefixes return a different value on every call
+IMPURE_PREFIXES = ('np.random.', 'numpy.random.')
+FOLDED_PREFIX = '_folded_'
+
+
+def _get_bound_names(node: ast.AST) -> Set[str]:
+    """
+    Returns the names, that are bound inside the given node by comprehensions, lambdas or assignment expressions.
+    """
+    names = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and not isinstance(child.ctx, ast.Load):
+            names.add(child.id)
+        elif isinstance(child, ast.arg):
+            names.add(child.arg)
+    return names
+
+
+def _get_loaded_names(node: ast.AST) -> Set[str]:
+    return {child.id for child in ast.walk(node) if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load)}
+
+
+def _is_impure(node: ast.AST) -> bool:
+    for child in ast.walk(node):
+        if isinstance(child, ast.NamedExpr):
+            return True
+        if isinstance(child, ast.Call) and ast.unparse(child.func).startswith(IMPURE_PREFIXES):
+            return True
+    return False
+
+
+def _get_eager_fields(node: ast.AST) -> List[Tuple[str, Optional[int]]]:
+    """
+    Returns the fields of the given node, that are always evaluated, when the node is evaluated. The index is None for
+    fields, that are a single node.
+    The branches of conditional expressions, the operands after the first one of boolean operators and everything
+    except the first iterable of comprehensions are only evaluated on demand, so they must not be evaluated in advance.
+    """
+    if isinstance(node, ast.IfExp):
+        return [('test', None)]
+    if isinstance(node, ast.BoolOp):
+        return [('values', 0)]
+    if isinstance(node, (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+        return [('generators', 0)]
+    if isinstance(node, ast.comprehension):
+        return [('iter', None)]
+    if isinstance(node, ast.Lambda):
+        return []
+    fields = []
+    for field, value in ast.iter_fields(node):
+        if isinstance(value, list):
+            fields.extend((field, index) for index, item in enumerate(value) if isinstance(item, ast.AST))
+        elif isinstance(value, ast.AST):
+            fields.append((field, None))
+    return fields
+
+
+class Expression:
+    """
+    A python expression, that caches the values of its sub-expressions.
+    The sub-expressions, that use only some of the names of the expression, are compiled separately. Their values are
+    kept together with the versions of the names they use and are only evaluated again, after one of these versions
+    changed. Sub-expressions, that use no names except the constants, are evaluated once.
+    """
+    def __init__(
+            self, source: str, constants: FrozenSet[str] = frozenset(), node: Optional[ast.expr] = None,
+            bound_names: FrozenSet[str] = frozenset(), counter: Optional[List[int]] = None
+    ):
+        """
+        :param source: The source code of the expression
+        :param constants: The names, whose values never change, like modules or functions
+        :param node: The parsed sub-expression. Only given for sub-expressions, that are created by the expression.
+        :param bound_names: The names bound inside the whole expression
+        :param counter: The number of sub-expressions of the whole expression, used to create unique names
+        :raise SyntaxError: If source is not a valid expression
+        """
+        if node is None:
+            node = ast.parse(source, mode='eval').body
+            bound_names = frozenset(_get_bound_names(node))
+            counter = [0]
+        self.source = source
+        self.constants = constants
+        # the names of elements or other variables, that are used by the expression
+        self.names: FrozenSet[str] = frozenset(_get_loaded_names(node) - constants - bound_names)
+        self.sorted_names = sorted(self.names)
+        self.sub_expressions: List[Tuple[str, Expression]] = []
+        self.cache_key: Optional[Tuple[Hashable, ...]] = None
+        self.cached_value: Any = None
+
+        node = self._fold(node, bound_names, counter)
+        self.code = compile(ast.fix_missing_locations(ast.Expression(body=node)), '<string>', 'eval')
+
+    def _fold(self, node: ast.AST, bound_names: FrozenSet[str], counter: List[int]) -> ast.AST:
+        """
+        Replaces the largest sub-expressions of node, that use fewer names than this expression, by a name, that refers
+        to a separately cached sub-expression.
+        """
+        for field, index in _get_eager_fields(node):
+            child = getattr(node, field) if index is None else getattr(node, field)[index]
+            if isinstance(child, FOLDABLE_TYPES) and isinstance(getattr(child, 'ctx', ast.Load()), ast.Load):
+                loaded_names = _get_loaded_names(child)
+                names = loaded_names - self.constants
+                if names < self.names and not (loaded_names & bound_names) and not _is_impure(child):
+                    name = '{}{}'.format(FOLDED_PREFIX, counter[0])
+                    counter[0] += 1
+                    sub_expression = Expression(ast.unparse(child), self.constants, child, bound_names, counter)
+                    self.sub_expressions.append((name, sub_expression))
+                    child = ast.Name(id=name, ctx=ast.Load())
+                else:
+                    child = self._fold(child, bound_names, counter)
+            else:
+                child = self._fold(child, bound_names, counter)
+            if index is None:
+                setattr(node, field, child)
+            else:
+                getattr(node, field)[index] = child
+        return node
+
+    def evaluate(self, variables: Mapping[str, Any], versions: Mapping[str, Hashable]) -> Any:
+        """
+        Evaluates the expression. Sub-expressions, whose names did not change since their last evaluation, are not
+        evaluated again.
+
+        :param variables: The values of the constants and names used by the expression
+        :param versions: The versions of the names. A sub-expression is evaluated again, if the version of one of its
+                         names changed. Names without a version are treated as constant.
+        :return: The value of the expression
+        """
+        eval_locals = dict(variables)
+        for name, sub_expression in self.sub_expressions:
+            eval_locals[name] = sub_expression.evaluate_cached(variables, versions)
+        return eval(self.code, {}, eval_locals)
+
+    def evaluate_cached(self, variables: Mapping[str, Any], versions: Mapping[str, Hashable]) -> Any:
+        """
+        Returns the cached value of the expression, if the versions of its names did not change since it was
+        evaluated. Otherwise evaluates the expression and caches the value. Cached arrays are read-only, as they are
+        shared by all evaluations.
+        """
+        key = tuple(versions.get(name) for name in self.sorted_names)
+        if self.cache_key is not None and key == self.cache_key:
+            return self.cached_value
+        value = self.evaluate(variables, versions)
+        if isinstance(value, np.ndarray):
+            value = value.view()
+            value.flags.writeable = False
+        self.cache_key = key
+        self.cached_value = value
+        return value
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Returns the number of separately cached sub-expressions.
+        """
+        return {'sub_expressions': sum(1 + expression.get_stats()['sub_expressions']
+                                       for _name, expression in self.sub_expressions)}
+
+
+def test_sub_expressions_cached():
+    expression = Expression('np.sum(a * 2) + b', frozenset({'np'}))
+    assert expression.names == {'a', 'b'}
+    assert expression.get_stats()['sub_expressions'] == 1
+    a = np.array([1.0, 2.0])
+    variables = {'np': np, 'a': a, 'b': 1.0}
+    assert expression.evaluate(variables, {'a': 1, 'b': 1}) == 7.0
+    # a did not change, so np.sum(a * 2) is not evaluated again
+    variables['a'] = np.array([10.0, 10.0])
+    assert expression.evaluate(variables, {'a': 1, 'b': 2}) == 7.0
+    assert expression.evaluate(variables, {'a': 2, 'b': 2}) == 41.0
+
+
+def test_replaced_name():
+    # the versions of elements include their identity, so an element with the same name and version counter, that
+    # replaced another element, is a change
+    expression = Expression('a * 2 + b')
+    variables = {'a': np.array([1.0]), 'b': np.array([1.0])}
+    assert expression.evaluate(variables, {'a': (1, 7), 'b': (2, 1)}) == 3.0
+    variables['a'] = np.array([5.0])
+    assert expression.evaluate(variables, {'a': (3, 7), 'b': (2, 1)}) == 11.0
+
+
+def test_constant_sub_expressions():
+    calls = []
+
+    def constant():
+        calls.append(1)
+        return 2.0
+
+    expression = Expression('f() * a', frozenset({'f'}))
+    assert expression.names == {'a'}
+    for version in range(3):
+        assert expression.evaluate({'f': constant, 'a': 3.0}, {'a': version}) == 6.0
+    assert len(calls) == 1
+
+
+def test_short_circuit():
+    # the branches of conditional expressions and later operands of boolean operators are not evaluated in advance
+    variables = {'a': None, 'b': 1.0, 'c': 2.0}
+    versions = {'a': 1, 'b': 1, 'c': 1}
+    assert Expression('b if a is None else a[0] * c').evaluate(variables, versions) == 1.0
+    assert Expression('a is None or a[0] * c').evaluate(variables, versions) is True
+    assert Expression('a is not None and a[0] * c').evaluate(variables, versions) is False
+
+
+def test_bound_names():
+    # names bound by comprehensions and lambdas are not names of the expression
+    expression = Expression('sum([x * 2 for x in a]) + b', frozenset({'sum'}))
+    assert expression.names == {'a', 'b'}
+    variables = {'sum': sum, 'a': [1, 2], 'b': 1}
+    assert expression.evaluate(variables, {'a': 1, 'b': 1}) == 7
+    variables['a'] = [3]
+    assert expression.evaluate(variables, {'a': 2, 'b': 1}) == 7
+    expression = Expression('(lambda x: x * 2)(a) + b')
+    assert expression.names == {'a', 'b'}
+    assert expression.evaluate({'a': 2, 'b': 1}, {'a': 1, 'b': 1}) == 5
+
+
+def test_impure_calls():
+    expression = Expression('np.random.random(a) + b', frozenset({'np'}))
+    assert expression.get_stats()['sub_expressions'] == 0
+    variables = {'np': np, 'a': 3, 'b': 0.0}
+    first = expression.evaluate(variables, {'a': 1, 'b': 1})
+    assert not np.array_equal(first, expression.evaluate(variables, {'a': 1, 'b': 1}))
@@ -0,0 +1,89 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import pygame as pg
+from pygame import Surface
+
+DEFAULT_FONT_SIZE = 18
+TEXT_CACHE_SIZE = 2048
+
+_fonts: Dict[Tuple[str, int], pg.font.Font] = {}
+
+
+def get_font(font_name: str = '', fontsize: int = DEFAULT_FONT_SIZE) -> pg.font.Font:
+    """
+    Returns the font with the given name and size. Every font is loaded only once per process.
+
+    :param font_name: The name of the font to use. When empty string is supplied the default system font is used.
+    :param fontsize: The size of the font
+    :return: The shared font object
+    """
+    font_name = font_name if font_name else pg.font.get_default_font()
+    key = (font_name, fontsize)
+    font = _fonts.get(key)
+    if font is None:
+        if not pg.font.get_init():
+            pg.font.init()
+        font = pg.font.Font(font_name, fontsize)
+        _fonts[key] = font
+    return font
+
+
+class TextCache:
+    """
+    A bounded LRU cache of rendered text surfaces keyed by (font, text, color, background).
+    As fonts are shared with get_font(), the font object identifies font name and size.
+    The surfaces returned are shared, so they must not be modified.
+    """
+    def __init__(self, max_size: int = TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.surfaces: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(
+            self, font: pg.font.Font, text: str, color: pg.Color, background: Optional[pg.Color] = None
+    ) -> Surface:
+        """
+        Returns the rendered antialiased text. The text is only rasterized, if it is not already in the cache.
+
+        :param font: The font to render with
+        :param text: The text to render
+        :param color: The color of the text
+        :param background: The background color of the text. If None, the background is transparent.
+        :return: The rendered text
+        """
+        key = (font, text, tuple(color), tuple(background) if background is not None else None)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, True, color, background)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Returns the number of hits and misses, the hit rate and the number of cached surfaces.
+        """
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+            'size': len(self.surfaces),
+            'max_size': self.max_size,
+        }
+
+
+text_cache = TextCache()
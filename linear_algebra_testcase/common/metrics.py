@@ -0,0 +1,152 @@
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# setting this environment variable to a file path periodically appends the metrics of the viewer to that file
+METRICS_ENV_VAR = 'LINEAR_ALGEBRA_METRICS'
+# the number of seconds between two records. Can be changed with this environment variable.
+METRICS_INTERVAL_ENV_VAR = 'LINEAR_ALGEBRA_METRICS_INTERVAL'
+METRICS_INTERVAL = 60.0
+# the file is rotated, before it grows beyond this number of bytes. The last METRICS_BACKUPS files are kept as
+# path.1 to path.METRICS_BACKUPS, the oldest has the highest number.
+METRICS_MAX_BYTES = 10 * 2**20
+METRICS_BACKUPS = 3
+FRAME_TIME_PERCENTILES = [50, 95, 99]
+
+# returns the statistics of the parts of a viewer, like ElementBuffer.get_stats(), by name
+MetricsSource = Callable[[], Dict[str, Dict[str, float]]]
+
+
+def get_rss_bytes() -> Optional[int]:
+    """
+    Returns the resident set size of the process in bytes or None, if it is not available. It is read from /proc on
+    Linux and is the maximum resident set size on other platforms with the resource module.
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, other platforms kibibytes
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+class MetricsExporter:
+    """
+    Collects the times of the frames of a viewer and appends a JSON line with the frame rate, the frame time
+    percentiles, the statistics of the viewer and the resident set size to a file every interval, so the viewer can be
+    monitored without attaching to the process. The frame rate counts rendered frames. The statistics of the viewer are
+    counters since the start, so the differences of two records are the counts of their interval.
+    The file is opened for every record and rotated, before it exceeds max_bytes.
+    """
+    def __init__(
+            self, path: str, dimension: int, interval: float = METRICS_INTERVAL, max_bytes: int = METRICS_MAX_BYTES,
+            backups: int = METRICS_BACKUPS
+    ):
+        """
+        :param path: The path of the file
+        :param dimension: The dimension of the viewer
+        :param interval: The number of seconds between two records
+        :param max_bytes: The size of the file, that causes a rotation
+        :param backups: The number of rotated files to keep
+        """
+        self.path = path
+        self.dimension = dimension
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.frame_times: List[float] = []
+        self.rendered_frames = 0
+        self.interval_start: Optional[int] = None
+
+    def record_frame(self, ticks: int, frame_seconds: float, rendered: bool, get_metrics: MetricsSource):
+        """
+        Counts a frame and writes a record, if the interval elapsed since the last record.
+
+        :param ticks: The time of the frame in milliseconds
+        :param frame_seconds: The number of seconds the frame took
+        :param rendered: Whether the frame was rendered
+        :param get_metrics: Returns the statistics of the viewer. Only called, when a record is written.
+        """
+        if self.interval_start is None:
+            self.interval_start = ticks
+        self.frame_times.append(frame_seconds * 1000.0)
+        self.rendered_frames += rendered
+        if ticks - self.interval_start >= self.interval * 1000.0:
+            self.write(self.create_record(ticks, get_metrics()))
+            self.frame_times = []
+            self.rendered_frames = 0
+            self.interval_start = ticks
+
+    def get_timeout(self, ticks: int) -> int:
+        """
+        Returns the number of milliseconds until the next record is due, so a viewer waiting for events can wake up to
+        write it.
+        """
+        if self.interval_start is None:
+            return 1
+        return max(1, int(self.interval_start + self.interval * 1000.0 - ticks))
+
+    def create_record(self, ticks: int, metrics: Dict[str, Dict[str, float]]) -> Dict:
+        seconds = (ticks - self.interval_start) / 1000.0
+        frame_times = np.asarray(self.frame_times)
+        frame_time_stats = {'mean': float(frame_times.mean())}
+        for percentile, value in zip(FRAME_TIME_PERCENTILES, np.percentile(frame_times, FRAME_TIME_PERCENTILES)):
+            frame_time_stats['p{}'.format(percentile)] = float(value)
+        frame_time_stats['max'] = float(frame_times.max())
+        record = {
+            'time': time.time(),
+            'dimension': self.dimension,
+            'interval': seconds,
+            'frames': len(frame_times),
+            'rendered_frames': self.rendered_frames,
+            'frame_rate': self.rendered_frames / seconds if seconds > 0 else 0.0,
+            'frame_time_ms': frame_time_stats,
+            'rss_bytes': get_rss_bytes(),
+        }
+        record.update(metrics)
+        return record
+
+    def write(self, record: Dict):
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        try:
+            if os.path.getsize(self.path) + len(line) > self.max_bytes:
+                self.rotate()
+        except OSError:
+            # the file does not exist yet
+            pass
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(line)
+
+    def rotate(self):
+        """
+        Renames the file to path.1 and the older rotated files to the next number. The oldest file is dropped.
+        """
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        for index in range(self.backups - 1, 0, -1):
+            source = '{}.{}'.format(self.path, index)
+            if os.path.exists(source):
+                os.replace(source, '{}.{}'.format(self.path, index + 1))
+        os.replace(self.path, self.path + '.1')
+
+
+def create_metrics_exporter(path: Optional[str], dimension: int) -> Optional[MetricsExporter]:
+    """
+    Creates a MetricsExporter for the given path or returns None, if the path is None or empty. The interval is read
+    from the environment variable METRICS_INTERVAL_ENV_VAR.
+    """
+    if not path:
+        return None
+    interval = float(os.environ.get(METRICS_INTERVAL_ENV_VAR) or METRICS_INTERVAL)
+    return MetricsExporter(path, dimension, interval)
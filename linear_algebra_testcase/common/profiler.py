@@ -0,0 +1,305 @@
+import os
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pygame as pg
+from pygame import Surface, Rect
+
+from linear_algebra_testcase.common.utils import Colors
+
+# the stages of a frame in the order they run
+FRAME_STAGES = ('events', 'update', 'build', 'coordinate_system', 'elements', 'ui', 'flip')
+# the number of frames, whose timings are kept
+PROFILER_CAPACITY = 240
+# setting this environment variable to a value other than '' or '0' enables the profiler at start
+PROFILER_ENV_VAR = 'LINEAR_ALGEBRA_PROFILE'
+# setting this environment variable to a value other than '' or '0' also measures the memory allocated by the stages
+ALLOCATIONS_ENV_VAR = 'LINEAR_ALGEBRA_TRACE_ALLOCATIONS'
+PROFILER_TOGGLE_KEY = pg.K_F3
+ALLOCATION_REPORT_KEY = pg.K_F4
+ALLOCATION_REPORT_LIMIT = 15
+OVERLAY_MARGIN = 10
+OVERLAY_PADDING = 4
+
+
+class _NullTimer:
+    """
+    Context manager, that measures nothing. Returned by a disabled profiler, so instrumented code costs one call.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    """
+    Context manager, that adds the time spent in it to one stage of the current frame.
+    """
+    def __init__(self, profiler: 'FrameProfiler', index: int):
+        self.profiler = profiler
+        self.index = index
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_args):
+        self.profiler.add_time(self.index, time.perf_counter() - self.start)
+        return False
+
+
+class _AllocationTimer(_StageTimer):
+    """
+    Stage timer, that also measures the memory allocated in the stage with tracemalloc. The peak is the most memory,
+    that was allocated at once above the memory at the start of the stage. As temporary arrays are freed soon, the peak
+    shows the churn of a stage, while the net bytes show the memory, that the stage kept.
+    """
+    def __init__(self, profiler: 'FrameProfiler', index: int):
+        super().__init__(profiler, index)
+        self.start_memory = 0
+
+    def __enter__(self):
+        tracemalloc.reset_peak()
+        self.start_memory = tracemalloc.get_traced_memory()[0]
+        return super().__enter__()
+
+    def __exit__(self, *args):
+        super().__exit__(*args)
+        current, peak = tracemalloc.get_traced_memory()
+        self.profiler.add_allocation(self.index, peak - self.start_memory, current - self.start_memory)
+        return False
+
+
+class FrameProfiler:
+    """
+    Measures how long the stages of every frame take. The timings of the last frames are kept in a ring buffer of shape
+    [capacity, stages] in milliseconds. Stages, that did not run in a frame, are NaN and do not count for their
+    statistics.
+    While the profiler is disabled, measure() returns a shared context manager, that does nothing, and frames are not
+    recorded.
+    If allocations are tracked, tracemalloc is started and the peak and net bytes allocated by every stage are kept in
+    ring buffers of the same shape. Tracing makes every allocation slower, so the timings are not comparable to frames
+    without it.
+    """
+    def __init__(
+            self, stages: Sequence[str] = FRAME_STAGES, capacity: int = PROFILER_CAPACITY, enabled: Optional[bool] = None,
+            track_allocations: Optional[bool] = None
+    ):
+        """
+        :param stages: The names of the stages of a frame
+        :param capacity: The number of frames, whose timings are kept
+        :param enabled: Whether to measure. If None, the environment variable PROFILER_ENV_VAR decides.
+        :param track_allocations: Whether to measure allocations. Enables the profiler. If None, the environment
+                                  variable ALLOCATIONS_ENV_VAR decides.
+        """
+        if track_allocations is None:
+            track_allocations = os.environ.get(ALLOCATIONS_ENV_VAR, '') not in ('', '0')
+        if enabled is None:
+            enabled = track_allocations or os.environ.get(PROFILER_ENV_VAR, '') not in ('', '0')
+        self.stages = tuple(stages)
+        self.capacity = capacity
+        self.enabled = enabled
+        self.track_allocations = track_allocations
+        timer_class = _AllocationTimer if track_allocations else _StageTimer
+        self.timers = {name: timer_class(self, index) for index, name in enumerate(self.stages)}
+        self.timings = np.full((capacity, len(self.stages)), np.nan)
+        self.num_frames = 0
+        self.current: List[float] = [np.nan] * len(self.stages)
+        self.in_frame = False
+        self.peak_bytes: Optional[np.ndarray] = None
+        self.net_bytes: Optional[np.ndarray] = None
+        self.current_peak_bytes: List[float] = []
+        self.current_net_bytes: List[float] = []
+        self.last_snapshot: Optional[tracemalloc.Snapshot] = None
+        if track_allocations:
+            self.peak_bytes = np.full((capacity, len(self.stages)), np.nan)
+            self.net_bytes = np.full((capacity, len(self.stages)), np.nan)
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.clear()
+
+    def clear(self):
+        self.timings.fill(np.nan)
+        if self.track_allocations:
+            self.peak_bytes.fill(np.nan)
+            self.net_bytes.fill(np.nan)
+        self.num_frames = 0
+        self.in_frame = False
+
+    def handle_event(self, event: pg.event.Event) -> bool:
+        """
+        Toggles the profiler, if the toggle key was pressed. Prints the allocation report, if its key was pressed and
+        allocations are tracked.
+
+        :return: True, if the profiler was toggled
+        """
+        if event.type == pg.KEYDOWN and event.key == PROFILER_TOGGLE_KEY:
+            self.toggle()
+            return True
+        if event.type == pg.KEYDOWN and event.key == ALLOCATION_REPORT_KEY and self.track_allocations:
+            print(self.get_allocation_report())
+        return False
+
+    def begin_frame(self):
+        if self.enabled:
+            self.current = [np.nan] * len(self.stages)
+            if self.track_allocations:
+                self.current_peak_bytes = [np.nan] * len(self.stages)
+                self.current_net_bytes = [np.nan] * len(self.stages)
+            self.in_frame = True
+
+    def end_frame(self):
+        """
+        Stores the timings of the current frame in the ring buffer.
+        """
+        if self.enabled and self.in_frame:
+            row = self.num_frames % self.capacity
+            self.timings[row] = self.current
+            if self.track_allocations:
+                self.peak_bytes[row] = self.current_peak_bytes
+                self.net_bytes[row] = self.current_net_bytes
+            self.num_frames += 1
+            self.in_frame = False
+
+    def measure(self, stage: str):
+        """
+        Returns a context manager, that adds the time spent in it to the given stage of the current frame.
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return self.timers[stage]
+
+    def add_time(self, index: int, seconds: float):
+        milliseconds = seconds * 1000.0
+        last = self.current[index]
+        # a stage can run several times in one frame
+        self.current[index] = milliseconds if last != last else last + milliseconds
+
+    def add_allocation(self, index: int, peak_bytes: int, net_bytes: int):
+        last_peak = self.current_peak_bytes[index]
+        last_net = self.current_net_bytes[index]
+        self.current_peak_bytes[index] = peak_bytes if last_peak != last_peak else max(last_peak, peak_bytes)
+        self.current_net_bytes[index] = net_bytes if last_net != last_net else last_net + net_bytes
+
+    def _get_frames(self, ring_buffer: np.ndarray) -> np.ndarray:
+        if self.num_frames <= self.capacity:
+            return ring_buffer[:self.num_frames].copy()
+        start = self.num_frames % self.capacity
+        return np.concatenate([ring_buffer[start:], ring_buffer[:start]])
+
+    def get_timings(self) -> np.ndarray:
+        """
+        Returns the recorded timings in milliseconds of shape [frames, stages] from the oldest to the newest frame.
+        """
+        return self._get_frames(self.timings)
+
+    def get_allocations(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the peak and the net bytes allocated by every stage of shape [frames, stages] from the oldest to the
+        newest frame.
+
+        :raise ValueError: If allocations are not tracked
+        """
+        if not self.track_allocations:
+            raise ValueError('Allocations are not tracked')
+        return self._get_frames(self.peak_bytes), self._get_frames(self.net_bytes)
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns for every stage and for the whole frame ('total') the median, the 95th percentile and the maximum in
+        milliseconds over the recorded frames and the number of frames, in which the stage ran.
+        """
+        return self._summarize(self.get_timings())
+
+    def get_allocation_stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        Returns the statistics of the peak bytes ('peak') and the net bytes ('net') allocated by every stage like
+        get_stats(). The total of the peaks of a frame is the sum of the peaks of its stages.
+
+        :raise ValueError: If allocations are not tracked
+        """
+        peak_bytes, net_bytes = self.get_allocations()
+        return {'peak': self._summarize(peak_bytes), 'net': self._summarize(net_bytes)}
+
+    def _summarize(self, frames: np.ndarray) -> Dict[str, Dict[str, float]]:
+        columns = {name: frames[:, index] for index, name in enumerate(self.stages)}
+        ran = ~np.isnan(frames)
+        columns['total'] = np.nansum(frames, axis=1)[np.any(ran, axis=1)]
+        stats = {}
+        for name, values in columns.items():
+            values = values[~np.isnan(values)]
+            if len(values):
+                p50, p95 = np.percentile(values, [50, 95])
+                stats[name] = {'p50': float(p50), 'p95': float(p95), 'max': float(values.max()), 'count': len(values)}
+            else:
+                stats[name] = {'p50': 0.0, 'p95': 0.0, 'max': 0.0, 'count': 0}
+        return stats
+
+    def get_allocation_report(self, limit: int = ALLOCATION_REPORT_LIMIT) -> str:
+        """
+        Returns the source lines, that hold the most memory traced by tracemalloc. After the first report, the lines
+        are ordered by the memory they gained since the last report, which shows memory, that grows with every frame.
+
+        :param limit: The number of lines to report
+        :raise ValueError: If allocations are not tracked
+        """
+        if not self.track_allocations:
+            raise ValueError('Allocations are not tracked')
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ])
+        if self.last_snapshot is None:
+            title = 'Top {} lines by traced memory'.format(limit)
+            statistics = snapshot.statistics('lineno')
+        else:
+            title = 'Top {} lines by traced memory gained since the last report'.format(limit)
+            statistics = snapshot.compare_to(self.last_snapshot, 'lineno')
+        self.last_snapshot = snapshot
+        return '\n'.join([title] + [str(statistic) for statistic in statistics[:limit]])
+
+    def render_overlay(self, screen: Surface, render_font: pg.font.Font) -> Optional[Rect]:
+        """
+        Draws the statistics of all stages in the top right corner of the screen. If allocations are tracked, the 95th
+        percentile of the peak allocations is drawn as well.
+
+        :return: The drawn area or None, if the profiler is disabled
+        """
+        if not self.enabled:
+            return None
+        rows = [('stage [ms]', 'p50', 'p95', 'max')]
+        for name, stage_stats in self.get_stats().items():
+            rows.append((name,) + tuple('{:.2f}'.format(stage_stats[key]) for key in ('p50', 'p95', 'max')))
+        if self.track_allocations:
+            # the 95th percentile of the peak allocations of every stage
+            peak_stats = self.get_allocation_stats()['peak']
+            rows[0] += ('peak KiB',)
+            for row_index, name in enumerate(peak_stats, 1):
+                rows[row_index] += ('{:.1f}'.format(peak_stats[name]['p95'] / 1024),)
+        # the numbers change every frame, so they are not put into the text cache
+        cells = [[render_font.render(text, True, Colors.ACTIVE) for text in row] for row in rows]
+        column_widths = [max(row[column].get_width() for row in cells) for column in range(len(rows[0]))]
+        line_height = render_font.get_linesize()
+        width = sum(column_widths) + (len(column_widths) + 1) * OVERLAY_PADDING * 2
+        height = len(rows) * line_height + 2 * OVERLAY_PADDING
+        rect = Rect(screen.get_width() - width - OVERLAY_MARGIN, OVERLAY_MARGIN, width, height)
+        screen.fill(Colors.BACKGROUND, rect)
+        for row_index, row in enumerate(cells):
+            y = rect.top + OVERLAY_PADDING + row_index * line_height
+            x = rect.left + OVERLAY_PADDING * 2
+            for column, (surface, column_width) in enumerate(zip(row, column_widths)):
+                # names are left aligned, numbers right aligned
+                offset = 0 if column == 0 else column_width - surface.get_width()
+                screen.blit(surface, (x + offset, y))
+                x += column_width + OVERLAY_PADDING * 2
+        return rect
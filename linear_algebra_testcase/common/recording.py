@@ -0,0 +1,98 @@
+import gzip
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pygame as pg
+
+# setting this environment variable to a file path records the events of the viewer into that file
+RECORDING_ENV_VAR = 'LINEAR_ALGEBRA_RECORD'
+RECORDING_FORMAT_VERSION = 1
+
+# a frame of a recording is the number of milliseconds since pygame.init() and the events of the frame
+Frame = Tuple[int, List[pg.event.Event]]
+
+
+def _to_json_value(value: Any) -> Any:
+    """
+    Converts an event attribute to a JSON value. Returns None for values, that can not be stored, like windows.
+    """
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (tuple, list)):
+        values = [_to_json_value(item) for item in value]
+        return None if any(item is None for item in values) else values
+    return None
+
+
+def serialize_event(event: pg.event.Event) -> List:
+    attributes = {}
+    for name, value in event.dict.items():
+        json_value = _to_json_value(value)
+        if json_value is not None:
+            attributes[name] = json_value
+    return [event.type, attributes]
+
+
+def deserialize_event(data: List) -> pg.event.Event:
+    event_type, attributes = data
+    # positions and button states are tuples in pygame
+    return pg.event.Event(event_type, {
+        name: tuple(value) if isinstance(value, list) else value for name, value in attributes.items()
+    })
+
+
+class EventRecorder:
+    """
+    Writes the events, that are passed to Main.handle_events(), with the time of the frame into a gzip compressed file
+    with one JSON line per frame. The first line describes the recording. Frames without events are recorded as well,
+    as the viewers also render frames for animations and evaluation results.
+    """
+    def __init__(self, path: str, dimension: int, screen_size: Tuple[int, int]):
+        self.path = path
+        self.file = gzip.open(path, 'wt', encoding='utf-8')
+        header = {
+            'version': RECORDING_FORMAT_VERSION, 'dimension': dimension, 'screen_size': list(screen_size),
+            'pygame': pg.version.ver,
+        }
+        self.file.write(json.dumps(header) + '\n')
+
+    def record(self, ticks: int, events: Iterable[pg.event.Event]):
+        line = [ticks, [serialize_event(event) for event in events]]
+        self.file.write(json.dumps(line, separators=(',', ':')) + '\n')
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def create_recorder(path: Optional[str], dimension: int, screen_size: Tuple[int, int]) -> Optional[EventRecorder]:
+    """
+    Creates an EventRecorder for the given path or returns None, if the path is None or empty.
+    """
+    if not path:
+        return None
+    return EventRecorder(path, dimension, screen_size)
+
+
+def load_recording(path: str) -> Tuple[Dict[str, Any], List[Frame]]:
+    """
+    Reads a recording written by EventRecorder.
+
+    :param path: The path of the recording
+    :return: The header of the recording and all frames
+    :raise ValueError: If the file was written with another format version
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        header = json.loads(file.readline())
+        if header.get('version') != RECORDING_FORMAT_VERSION:
+            raise ValueError('Unsupported recording version: {}'.format(header.get('version')))
+        frames = []
+        try:
+            for line in file:
+                ticks, events = json.loads(line)
+                frames.append((ticks, [deserialize_event(event) for event in events]))
+        except (EOFError, json.JSONDecodeError):
+            # the viewer ended without closing the recorder, so the last frames are lost
+            pass
+    return header, frames
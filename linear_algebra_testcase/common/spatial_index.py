@@ -0,0 +1,62 @@
+import math
+
+import numpy as np
+
+# cell coordinates are clipped to this range, so points far outside the screen share the border cells
+MAX_CELL = 2**20
+
+
+class ScreenGrid:
+    """
+    A uniform grid over points in screen coordinates. The points are sorted by the key of their cell, so the points of
+    a cell are found with a binary search. A query for the points near a position only looks at the cells around it,
+    so it does not depend on the total number of points.
+    """
+    def __init__(self, points: np.ndarray, cell_size: float):
+        """
+        :param points: The points in screen coordinates of shape [N, 2]. Points, that are not finite, are ignored.
+        :param cell_size: The edge length of a cell in pixels. Should be about the radius of the queries.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        self.cell_size = cell_size
+        self.indices = np.flatnonzero(np.all(np.isfinite(points), axis=1))
+        self.points = points[self.indices]
+        keys = self._get_keys(self._get_cells(self.points))
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.points = self.points[order]
+        self.indices = self.indices[order]
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def _get_cells(self, points: np.ndarray) -> np.ndarray:
+        return np.clip(np.floor(points / self.cell_size), -MAX_CELL, MAX_CELL).astype(np.int64)
+
+    @staticmethod
+    def _get_keys(cells: np.ndarray) -> np.ndarray:
+        return (cells[..., 0] + MAX_CELL) * (2 * MAX_CELL + 1) + (cells[..., 1] + MAX_CELL)
+
+    def _get_cell(self, value: float) -> int:
+        return min(max(math.floor(value / self.cell_size), -MAX_CELL), MAX_CELL)
+
+    def query(self, position: np.ndarray, radius: float) -> np.ndarray:
+        """
+        Returns the indices of all points, whose distance to the given position is less than radius.
+
+        :param position: The position in screen coordinates of shape [2,].
+        :param radius: The maximal distance in pixels
+        :return: The indices into the points given to the constructor in ascending order
+        """
+        x, y = np.ravel(position).tolist()
+        lower_y = self._get_cell(y - radius)
+        upper_y = self._get_cell(y + radius)
+        # the cells of one column have consecutive keys, so every column is a single range of the sorted points
+        bounds = []
+        for cell_x in range(self._get_cell(x - radius), self._get_cell(x + radius) + 1):
+            first_key = (cell_x + MAX_CELL) * (2 * MAX_CELL + 1) + (lower_y + MAX_CELL)
+            bounds.extend((first_key, first_key + upper_y - lower_y + 1))
+        bounds = np.searchsorted(self.keys, bounds).tolist()
+        candidates = np.concatenate([np.arange(start, stop) for start, stop in zip(bounds[0::2], bounds[1::2])])
+        distances = np.sum((self.points[candidates] - (x, y))**2, axis=1)
+        return np.sort(self.indices[candidates[distances < radius**2]])
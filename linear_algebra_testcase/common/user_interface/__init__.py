@@ -1,21 +1,28 @@
-from typing import Optional
+from typing import Optional, Dict, Tuple, List, Callable, Hashable
 
 import numpy as np
 import pygame as pg
 from pygame import Surface, Rect
 
-from ..user_interface.items import (Container, Label, Button, Image, RootContainer, VectorItem, TransformItem,
+from ..user_interface.items import (Item, Container, Label, Button, Image, RootContainer, VectorItem, TransformItem,
                                     ElementLabel)
 from ..user_interface.window import Window
 from linear_algebra_testcase.common.utils import Colors, Dimension
-from linear_algebra_testcase.common.elements_core import ElementBuffer
+from linear_algebra_testcase.common.elements_core import ElementBuffer, Element
 from linear_algebra_testcase.dim2.elements import (Transform2D, Transformed2D, Vector, MultiVectorObject,
                                                    CustomTransformed, Translate2D, RenderKind)
 from linear_algebra_testcase.dim3.elements import (MultiVectorObject3D, Vector3D, Transform3D, Translate3D,
-                                                   Transformed as Transformed3D)
+                                                   Transformed as Transformed3D,
+                                                   CustomTransformed as CustomTransformed3D)
 
 
 class UserInterface:
+    """
+    The user interface is retained between builds. Static items (section labels, add buttons, menu button) are created
+    once and the items of elements are kept per element, so a build only moves, relabels, adds or removes items.
+
+    The version is increased by every build, that changed how the user interface looks.
+    """
     def __init__(self):
         self.root = RootContainer()
         self.menu_rect = Rect(10, 10, 40, 40)
@@ -27,11 +34,31 @@ class UserInterface:
         self.choosing_for_transformed: Optional[Transformed2D] = None
         self.text_input_window: Optional[Window] = None
 
+        # retained items
+        self.item_container: Optional[Container] = None
+        self.section_items: Dict[str, Item] = {}
+        self.element_items: Dict[int, Tuple[Element, Item]] = {}
+        self.built_for: Optional[Tuple[ElementBuffer, Dimension]] = None
+
+        self.version = 0
+        self.render_state: Optional[Hashable] = None
+
     def render(self, screen: Surface):
         self.root.render(screen)
         if self.text_input_window:
             self.text_input_window.render(screen)
 
+    def get_rects(self, screen: Surface) -> List[Rect]:
+        """
+        Returns the areas of the screen, that are covered by the user interface.
+
+        :param screen: The screen the user interface is rendered on
+        """
+        rects = [child.rect.clip(screen.get_rect()) for child in self.root.child_items if child.visible]
+        if self.text_input_window:
+            rects.append(self.text_input_window.get_rect(screen))
+        return rects
+
     def handle_event(self, event: pg.event.Event, mouse_position: np.ndarray):
         """
         Handles the given event.
@@ -56,21 +83,57 @@ class UserInterface:
         return self.root.colliding(position) or bool(self.text_input_window)
 
     def build(self, element_buffer: ElementBuffer, dim: Dimension):
-        new_root = RootContainer()
-        item_container = Container(
-            'item_container', Rect(0, 0, 400, pg.display.get_window_size()[1]), color=Colors.BACKGROUND, visible=False
-        )
-        new_root.add_child(item_container)
+        """
+        Updates the user interface to represent the given element buffer.
+        The static items are only created on the first build. Items of elements are reused as long as their element is
+        present in the element buffer.
+
+        :param element_buffer: The element buffer to show
+        :param dim: The dimension of the element buffer
+        """
+        if self.built_for is None or self.built_for[0] is not element_buffer or self.built_for[1] != dim:
+            self.setup(element_buffer, dim)
+        self.item_container.rect.height = pg.display.get_window_size()[1]
+
+        old_element_items = self.element_items
+        self.element_items = {}
+        child_items: List[Item] = []
 
         self.item_y_position = 0
-        self.add_objects_section(item_container, element_buffer, dim)
-        self.add_transforms_section(item_container, element_buffer, dim)
-        self.add_transformed_section(item_container, element_buffer, dim)
-        self.add_menu_button(new_root, item_container)
+        self.add_objects_section(child_items, element_buffer, old_element_items)
+        self.add_transforms_section(child_items, element_buffer, old_element_items)
+        self.add_transformed_section(child_items, element_buffer, dim, old_element_items)
+        self.item_container.child_items = child_items
+        self.update_version()
 
-        # update from old root
-        new_root.update_from(self.root)
-        self.root = new_root
+    def update_version(self):
+        """
+        Increases the version, if the render state of the user interface changed since the last call.
+        """
+        window_state = None
+        if self.text_input_window:
+            window_state = (self.text_input_window.text, self.text_input_window.cursor_position)
+        render_state = (self.root.get_render_state(), window_state)
+        if render_state != self.render_state:
+            self.render_state = render_state
+            self.version += 1
+
+    def setup(self, element_buffer: ElementBuffer, dim: Dimension):
+        """
+        Creates the root container and all items, that do not depend on the elements in the element buffer.
+        """
+        self.root = RootContainer()
+        self.item_container = Container(
+            'item_container', Rect(0, 0, 400, pg.display.get_window_size()[1]), color=Colors.BACKGROUND, visible=False
+        )
+        self.root.add_child(self.item_container)
+        self.section_items = {}
+        self.element_items = {}
+        self.create_objects_section(element_buffer, dim)
+        self.create_transforms_section(element_buffer, dim)
+        self.create_transformed_section(element_buffer, dim)
+        self.add_menu_button(self.root, self.item_container)
+        self.built_for = (element_buffer, dim)
 
     @staticmethod
     def add_menu_button(new_root, item_container):
@@ -83,9 +146,26 @@ class UserInterface:
         menu_button.on_click = menu_button_on_click
         new_root.add_child(menu_button)
 
-    def add_objects_section(self, item_container, element_buffer: ElementBuffer, dim: Dimension):
+    def _add_section_item(self, item: Item):
+        self.section_items[item.name] = item
+
+    def _get_element_item(
+            self, element: Element, old_element_items: Dict[int, Tuple[Element, Item]], create_item: Callable
+    ) -> Item:
+        """
+        Returns the item of the given element from the last build or creates a new one with create_item().
+        """
+        entry = old_element_items.get(id(element))
+        if entry is not None and entry[0] is element:
+            item = entry[1]
+        else:
+            item = create_item()
+        self.element_items[id(element)] = (element, item)
+        return item
+
+    def create_objects_section(self, element_buffer: ElementBuffer, dim: Dimension):
         objects_label = Label('objects_label', (10, 60), 'Objects')
-        item_container.add_child(objects_label)
+        self._add_section_item(objects_label)
 
         if dim == Dimension.d2:
             # add vec button
@@ -98,7 +178,7 @@ class UserInterface:
                 num_elements = len(element_buffer.elements) + 1
                 element_buffer.elements.append(Vector('v{}'.format(num_elements), np.array([1.0, 0.0])))
             add_vec_button.on_click = add_vec
-            item_container.add_child(add_vec_button)
+            self._add_section_item(add_vec_button)
 
             # add circle button
             add_circle_button = Button(
@@ -111,7 +191,7 @@ class UserInterface:
                 obj = MultiVectorObject('u{}'.format(num_elements), MultiVectorObject.generate_unit_circle(40))
                 element_buffer.elements.append(obj)
             add_circle_button.on_click = add_circle
-            item_container.add_child(add_circle_button)
+            self._add_section_item(add_circle_button)
 
             # add house button
             add_house_button = Button(
@@ -124,7 +204,7 @@ class UserInterface:
                 obj = MultiVectorObject('h{}'.format(num_elements), MultiVectorObject.generate_house())
                 element_buffer.elements.append(obj)
             add_house_button.on_click = add_house
-            item_container.add_child(add_house_button)
+            self._add_section_item(add_house_button)
         elif dim == Dimension.d3:
             # add vector
             add_vec_button = Button(
@@ -138,7 +218,7 @@ class UserInterface:
                 obj = Vector3D(f'v{num_elements}', np.ones(3, dtype=float), render_kind=RenderKind.POINT)
                 element_buffer.elements.append(obj)
             add_vec_button.on_click = add_vec
-            item_container.add_child(add_vec_button)
+            self._add_section_item(add_vec_button)
 
             # add cube
             add_cube_button = Button(
@@ -155,49 +235,67 @@ class UserInterface:
                 )
                 element_buffer.elements.append(obj)
             add_cube_button.on_click = add_cube
-            item_container.add_child(add_cube_button)
+            self._add_section_item(add_cube_button)
+
+    def add_objects_section(self, child_items: List[Item], element_buffer: ElementBuffer, old_element_items):
+        for name in ('objects_label', 'add_vec_btn', 'add_circle_btn', 'add_house_btn', 'add_cube_btn'):
+            if name in self.section_items:
+                child_items.append(self.section_items[name])
 
         # add object elements
         self.item_y_position = 90
         for element in element_buffer.elements:
             if isinstance(element, Vector) or isinstance(element, Vector3D):
-                self._create_vector(element, item_container)
+                self._create_vector(element, child_items, old_element_items)
             elif isinstance(element, MultiVectorObject) or isinstance(element, MultiVectorObject3D):
-                self._create_multiobject(element, item_container)
+                self._create_multiobject(element, child_items, old_element_items)
 
-    def _create_multiobject(self, element, item_container):
+    def _create_multiobject(self, element, child_items: List[Item], old_element_items):
         text_color = Colors.ACTIVE if element.visible else Colors.INACTIVE
-        object_item = ElementLabel(
-            element.name + '_ui', (20, self.item_y_position), element.name + '   Object', element,
-            text_color=text_color
-        )
 
-        def set_multiobject_for_transformed():
-            if self.choosing_for_transformed:
-                self.choosing_for_transformed.element = element
-                self.choosing_for_transformed = None
+        def create_item():
+            object_item = ElementLabel(
+                element.name + '_ui', (20, self.item_y_position), element.name + '   Object', element,
+                text_color=text_color
+            )
 
-        object_item.on_click = set_multiobject_for_transformed
-        item_container.add_child(object_item)
+            def set_multiobject_for_transformed():
+                if self.choosing_for_transformed:
+                    self.choosing_for_transformed.element = element
+                    self.choosing_for_transformed = None
+
+            object_item.on_click = set_multiobject_for_transformed
+            return object_item
+
+        object_item = self._get_element_item(element, old_element_items, create_item)
+        object_item.set_text(element.name + '   Object', text_color)
+        object_item.rect.topleft = (20, self.item_y_position)
+        child_items.append(object_item)
         self.item_y_position += object_item.rect.height + 1
 
-    def _create_vector(self, element: Vector | Vector3D, item_container):
+    def _create_vector(self, element: Vector | Vector3D, child_items: List[Item], old_element_items):
         text_color = Colors.ACTIVE if element.visible else Colors.INACTIVE
-        vector_item = VectorItem(element.name + '_ui', (10, self.item_y_position), element, text_color=text_color)
-        item_container.add_child(vector_item)
 
-        def set_vector_for_transformed():
-            if self.choosing_for_transformed:
-                self.choosing_for_transformed.element = element
-                self.choosing_for_transformed = None
+        def create_item():
+            vector_item = VectorItem(element.name + '_ui', (10, self.item_y_position), element, text_color=text_color)
+
+            def set_vector_for_transformed():
+                if self.choosing_for_transformed:
+                    self.choosing_for_transformed.element = element
+                    self.choosing_for_transformed = None
 
-        vector_item.on_click = set_vector_for_transformed
+            vector_item.on_click = set_vector_for_transformed
+            return vector_item
+
+        vector_item = self._get_element_item(element, old_element_items, create_item)
+        vector_item.update_labels(text_color)
+        vector_item.rect.topleft = (10, self.item_y_position)
+        child_items.append(vector_item)
         self.item_y_position += vector_item.rect.height + 1
 
-    def add_transforms_section(self, item_container, element_buffer: ElementBuffer, dim: Dimension):
-        self.item_y_position += 10
-        transforms_label = Label('transforms_label', (10, self.item_y_position), 'Transforms')
-        item_container.add_child(transforms_label)
+    def create_transforms_section(self, element_buffer: ElementBuffer, dim: Dimension):
+        transforms_label = Label('transforms_label', (10, 0), 'Transforms')
+        self._add_section_item(transforms_label)
 
         def add_2d_linear_transform():
             num_transforms = len(element_buffer.transforms) + 1
@@ -226,47 +324,62 @@ class UserInterface:
 
         # add linear button
         add_linear_button = Button(
-            'add_linear_btn', (transforms_label.rect.width + 20, self.item_y_position - 2),
+            'add_linear_btn', (transforms_label.rect.width + 20, 0),
             label=Image('add_linear_btn_label', (0, 0), Button.create_plus_image())
         )
 
         add_linear_button.on_click = add_linear_transform
-        item_container.add_child(add_linear_button)
+        self._add_section_item(add_linear_button)
 
         # add affine transform button
         add_affine_button = Button(
-            'add_affine_btn', (transforms_label.rect.width + 50, self.item_y_position - 2),
+            'add_affine_btn', (transforms_label.rect.width + 50, 0),
             label=Image('add_affine_btn_label', (0, 0), Button.create_plus_image())
         )
 
         add_affine_button.on_click = add_affine_transform
-        item_container.add_child(add_affine_button)
+        self._add_section_item(add_affine_button)
+
+    def add_transforms_section(self, child_items: List[Item], element_buffer: ElementBuffer, old_element_items):
+        self.item_y_position += 10
+        transforms_label = self.section_items['transforms_label']
+        transforms_label.rect.top = self.item_y_position
+        child_items.append(transforms_label)
+        for name in ('add_linear_btn', 'add_affine_btn'):
+            button = self.section_items[name]
+            button.rect.top = self.item_y_position - 2
+            child_items.append(button)
 
         self.item_y_position += transforms_label.rect.height + 10
 
         for transform in element_buffer.transforms:
-            self._create_transform(item_container, transform)
+            self._create_transform(child_items, transform, old_element_items)
 
-    def _create_transform(self, item_container, transform):
-        transform_item = TransformItem(transform.name + '_ui', (10, self.item_y_position), transform)
+    def _create_transform(self, child_items: List[Item], transform, old_element_items):
+        def create_item():
+            transform_item = TransformItem(transform.name + '_ui', (10, self.item_y_position), transform)
 
-        def set_transform_for_transformed():
-            if self.choosing_for_transformed:
-                self.choosing_for_transformed.transform = transform
-                self.choosing_for_transformed = None
+            def set_transform_for_transformed():
+                if self.choosing_for_transformed:
+                    self.choosing_for_transformed.transform = transform
+                    self.choosing_for_transformed = None
 
-        transform_item.on_click = set_transform_for_transformed
-        item_container.add_child(transform_item)
+            transform_item.on_click = set_transform_for_transformed
+            return transform_item
+
+        transform_item = self._get_element_item(transform, old_element_items, create_item)
+        transform_item.update_labels()
+        transform_item.rect.topleft = (10, self.item_y_position)
+        child_items.append(transform_item)
         self.item_y_position += transform_item.rect.height + 1
 
-    def add_transformed_section(self, item_container, element_buffer: ElementBuffer, dim: Dimension):
-        self.item_y_position += 10
-        transformed_label = Label('transformed_label', (10, self.item_y_position), 'Transformed')
-        item_container.add_child(transformed_label)
+    def create_transformed_section(self, element_buffer: ElementBuffer, dim: Dimension):
+        transformed_label = Label('transformed_label', (10, 0), 'Transformed')
+        self._add_section_item(transformed_label)
 
         # add transformed button
         add_transformed_button = Button(
-            'add_transformed_btn', (transformed_label.rect.width + 20, self.item_y_position - 2),
+            'add_transformed_btn', (transformed_label.rect.width + 20, 0),
             label=Image('add_transformed_btn_label', (0, 0), Button.create_plus_image())
         )
 
@@ -285,49 +398,69 @@ class UserInterface:
         add_transformed = add_transformed_2d if dim == Dimension.d2 else add_transformed_3d
 
         add_transformed_button.on_click = add_transformed
-        item_container.add_child(add_transformed_button)
+        self._add_section_item(add_transformed_button)
 
-        if dim == Dimension.d2:
-            # add custom transformed button
-            add_custom_transformed_button = Button(
-                'add_custom_transform_btn', (transformed_label.rect.width + 50, self.item_y_position - 2),
-                label=Image('add_custom_transform_btn_label', (0, 0), Button.create_plus_image())
+        # add custom transformed button
+        add_custom_transformed_button = Button(
+            'add_custom_transform_btn', (transformed_label.rect.width + 50, 0),
+            label=Image('add_custom_transform_btn_label', (0, 0), Button.create_plus_image())
+        )
+        custom_transformed_class = CustomTransformed if dim == Dimension.d2 else CustomTransformed3D
+
+        def add_custom_transformed():
+            num_transformed = len(element_buffer.transformed) + 1
+            custom_transformed = custom_transformed_class(
+                't{}'.format(num_transformed), RenderKind.LINE, element_buffer
             )
+            element_buffer.transformed.append(custom_transformed)
+        add_custom_transformed_button.on_click = add_custom_transformed
+        self._add_section_item(add_custom_transformed_button)
 
-            def add_custom_transformed():
-                num_transformed = len(element_buffer.transformed) + 1
-                custom_transformed = CustomTransformed('t{}'.format(num_transformed), RenderKind.LINE, element_buffer)
-                element_buffer.transformed.append(custom_transformed)
-            add_custom_transformed_button.on_click = add_custom_transformed
-            item_container.add_child(add_custom_transformed_button)
+    def add_transformed_section(
+            self, child_items: List[Item], element_buffer: ElementBuffer, dim: Dimension, old_element_items
+    ):
+        self.item_y_position += 10
+        transformed_label = self.section_items['transformed_label']
+        transformed_label.rect.top = self.item_y_position
+        child_items.append(transformed_label)
+        for name in ('add_transformed_btn', 'add_custom_transform_btn'):
+            if name in self.section_items:
+                button = self.section_items[name]
+                button.rect.top = self.item_y_position - 2
+                child_items.append(button)
 
-            self.item_y_position += transformed_label.rect.height + 10
-        elif dim == Dimension.d3:
-            self.item_y_position += transformed_label.rect.height + 10
+        self.item_y_position += transformed_label.rect.height + 10
 
         for transformed in element_buffer.transformed:
             if isinstance(transformed, Transformed2D) or isinstance(transformed, Transformed3D):
-                self._create_transformed(item_container, transformed)
-            elif isinstance(transformed, CustomTransformed):
-                self._create_custom_transformed(item_container, transformed)
+                self._create_transformed(child_items, transformed, old_element_items)
+            elif isinstance(transformed, CustomTransformed) or isinstance(transformed, CustomTransformed3D):
+                self._create_custom_transformed(child_items, transformed, old_element_items)
 
-    def _create_transformed(self, item_container, transformed):
+    def _create_transformed(self, child_items: List[Item], transformed, old_element_items):
         transform_str = transformed.transform.name if transformed.transform is not None else '< >'
         element_str = transformed.element.name if transformed.element is not None else '< >'
+        text = '{} = {} @ {}'.format(transformed.name, transform_str, element_str)
         text_color = Colors.ACTIVE if transformed.visible else Colors.INACTIVE
-        transformed_item = ElementLabel(
-            transformed.name + '_ui', (10, self.item_y_position),
-            '{} = {} @ {}'.format(transformed.name, transform_str, element_str), transformed, text_color=text_color
-        )
 
-        def transformed_label_on_click():
-            self.choosing_for_transformed = transformed
+        def create_item():
+            transformed_item = ElementLabel(
+                transformed.name + '_ui', (10, self.item_y_position), text, transformed, text_color=text_color
+            )
 
-        transformed_item.on_click = transformed_label_on_click
-        item_container.add_child(transformed_item)
+            def transformed_label_on_click():
+                self.choosing_for_transformed = transformed
+
+            transformed_item.on_click = transformed_label_on_click
+            return transformed_item
+
+        transformed_item = self._get_element_item(transformed, old_element_items, create_item)
+        transformed_item.set_text(text, text_color)
+        transformed_item.rect.topleft = (10, self.item_y_position)
+        child_items.append(transformed_item)
         self.item_y_position += transformed_item.rect.height + 1
 
-    def _create_custom_transformed(self, item_container, transformed):
+    def _create_custom_transformed(self, child_items: List[Item], transformed, old_element_items):
         text = transformed.name
         if transformed.definition:
             text += ' = ' + transformed.definition
@@ -336,16 +469,23 @@ class UserInterface:
         else:
             text += ' = < >'
         text_color = Colors.ACTIVE if transformed.visible else Colors.INACTIVE
-        transformed_item = ElementLabel(
-            transformed.name + '_ui', (10, self.item_y_position), text, transformed, text_color=text_color
-        )
 
-        def start_custom_transform_text_input():
-            def text_window_on_close(window_text):
-                transformed.set_definition(window_text)
-                transformed.compile_definition()
-            self.text_input_window = Window(text_window_on_close, transformed.definition)
+        def create_item():
+            transformed_item = ElementLabel(
+                transformed.name + '_ui', (10, self.item_y_position), text, transformed, text_color=text_color
+            )
+
+            def start_custom_transform_text_input():
+                def text_window_on_close(window_text):
+                    transformed.set_definition(window_text)
+                    transformed.compile_definition()
+                self.text_input_window = Window(text_window_on_close, transformed.definition)
+
+            transformed_item.on_click = start_custom_transform_text_input
+            return transformed_item
 
-        transformed_item.on_click = start_custom_transform_text_input
-        item_container.add_child(transformed_item)
+        transformed_item = self._get_element_item(transformed, old_element_items, create_item)
+        transformed_item.set_text(text, text_color)
+        transformed_item.rect.topleft = (10, self.item_y_position)
+        child_items.append(transformed_item)
         self.item_y_position += transformed_item.rect.height + 1
@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from copy import copy
-from typing import Optional, List, Tuple, Union, Callable
+from typing import Optional, List, Tuple, Union, Callable, Hashable
 
 import numpy as np
 import pygame as pg
@@ -8,6 +8,7 @@ from pygame import Surface, Rect
 
 from linear_algebra_testcase.dim2.elements import Vector, Transform2D, Translate2D, Element
 from linear_algebra_testcase.dim3.elements import Vector3D, Transform3D, Translate3D
+from linear_algebra_testcase.common.fonts import get_font, text_cache
 from linear_algebra_testcase.common.utils import gray, format_float, noop, Colors
 
 
@@ -64,6 +65,13 @@ class Item(ABC):
         """
         pass
 
+    def get_render_state(self) -> Hashable:
+        """
+        Returns a hashable description of everything that influences how this item is rendered.
+        Should be extended by subclasses.
+        """
+        return self.name, tuple(self.rect), self.visible, self.hovered
+
     def update_from(self, other):
         """
         Update values from other to myself. Should be overwritten by subclasses.
@@ -132,6 +140,11 @@ class ItemContainer(Item):
     def add_child(self, child: Item):
         self.child_items.append(child)
 
+    def get_render_state(self) -> Hashable:
+        if not self.visible:
+            return super().get_render_state()
+        return super().get_render_state() + (tuple(item.get_render_state() for item in self.child_items),)
+
     def update_from(self, other):
         """
         Update values from other to myself. Should be overwritten by subclasses.
@@ -140,10 +153,11 @@ class ItemContainer(Item):
         """
         super().update_from(other)
         self.scroll_position = other.scroll_position
+        other_children = {other_child.name: other_child for other_child in other.child_items}
         for child in self.child_items:
-            for other_child in other.child_items:
-                if child.name == other_child.name:
-                    child.update_from(other_child)
+            other_child = other_children.get(child.name)
+            if other_child is not None:
+                child.update_from(other_child)
 
     def get_item_by_name(self, name: str) -> Optional[Item]:
         """
@@ -232,14 +246,14 @@ class Label(Item):
         self.fontsize = fontsize
         self.text_color = text_color if text_color is not None else Colors.ACTIVE
         self.font_name = font_name if font_name else pg.font.get_default_font()
-        self.font = pg.font.Font(self.font_name, self.fontsize)
+        self.font = get_font(self.font_name, self.fontsize)
         self.rendered_font = None
         self.render_font()
 
     def render_font(self):
         if self.rendered_font:
             return
-        self.rendered_font = self.font.render(self.text, True, self.text_color)
+        self.rendered_font = text_cache.render(self.font, self.text, self.text_color)
         self.rect.width = self.rendered_font.get_width()
         self.rect.height = self.rendered_font.get_height()
 
@@ -247,6 +261,23 @@ class Label(Item):
         self.render_font()
         surface.blit(self.rendered_font, self.rect)
 
+    def set_text(self, text: str, text_color: Optional[pg.Color] = None):
+        """
+        Changes the text and the text color of this label. The text is only rendered again, if something changed.
+
+        :param text: The new text to display
+        :param text_color: The new color of the text. If None, the color is not changed.
+        """
+        text_color = text_color if text_color is not None else self.text_color
+        if text != self.text or text_color != self.text_color:
+            self.text = text
+            self.text_color = text_color
+            self.rendered_font = None
+            self.render_font()
+
+    def get_render_state(self) -> Hashable:
+        return super().get_render_state() + (self.text, tuple(self.text_color), self.font)
+
     def update_from(self, other):
         """
         Update values from other to myself. Should be overwritten by subclasses.
@@ -256,7 +287,7 @@ class Label(Item):
         super().update_from(other)
         if (self.text != other.text or self.fontsize != other.fontsize or self.text_color != other.text_color or
                 self.font_name != other.font_name):
-            self.font = pg.font.Font(self.font_name, self.fontsize)
+            self.font = get_font(self.font_name, self.fontsize)
             self.rendered_font = None
             self.render_font()
         else:
@@ -373,6 +404,10 @@ class Button(Item):
                 self.label.image.set_alpha(alpha)
             self.label.render(sub_surface)
 
+    def get_render_state(self) -> Hashable:
+        label_state = self.label.get_render_state() if self.label else None
+        return super().get_render_state() + (tuple(self.color), label_state)
+
     def update_from(self, other):
         """
         Update values from other to myself. Should be overwritten by subclasses.
@@ -403,7 +438,7 @@ class VectorItem(ItemContainer):
         self.fontsize = fontsize
         text_color = text_color if text_color is not None else Colors.ACTIVE
         self.font_name = font_name if font_name else pg.font.get_default_font()
-        self.font: pg.font.Font = pg.font.Font(self.font_name, self.fontsize)
+        self.font: pg.font.Font = get_font(self.font_name, self.fontsize)
 
         name_label = Label(self.name + '_name_label', (10, 20), self.associated_vec.name, text_color=text_color)
         self.add_child(name_label)
@@ -418,8 +453,19 @@ class VectorItem(ItemContainer):
             self.number_labels.append(number_label)
             self.add_child(number_label)
 
+        self.name_label = name_label
         self.labels_dragged = [False for _ in self.number_labels]
 
+    def update_labels(self, text_color: Optional[pg.Color] = None):
+        """
+        Updates the labels of this item with the current values of the associated vector.
+
+        :param text_color: The text color to use. If None, the text color is not changed.
+        """
+        self.name_label.set_text(self.associated_vec.name, text_color)
+        for number_label, value in zip(self.number_labels, self.associated_vec.get_array().flatten()):
+            number_label.set_text(format_float(value), text_color)
+
     def render(self, surface: Surface):
         self.render_child_items(surface)
 
@@ -446,6 +492,7 @@ class VectorItem(ItemContainer):
             for index, dragged in enumerate(self.labels_dragged):
                 if dragged:
                     self.associated_vec.coordinates[index] -= event.rel[1] * 0.01
+                    self.associated_vec.touch()
 
     def update_from(self, other):
         """
@@ -481,10 +528,11 @@ class TransformItem(ItemContainer):
         if text_color is None:
             text_color = Colors.ACTIVE if associated_transform.visible else Colors.INACTIVE
         self.font_name = font_name if font_name else pg.font.get_default_font()
-        self.font: pg.font.Font = pg.font.Font(self.font_name, self.fontsize)
+        self.font: pg.font.Font = get_font(self.font_name, self.fontsize)
 
         name_label = Label(f'{self.name}_name_label', (10, 20), self.associated_transform.name, text_color=text_color)
         self.add_child(name_label)
+        self.name_label = name_label
 
         # add number labels
         self.number_labels = []
@@ -501,6 +549,20 @@ class TransformItem(ItemContainer):
 
         self.dragged_label_index = None
 
+    def update_labels(self, text_color: Optional[pg.Color] = None):
+        """
+        Updates the labels of this item with the current values of the associated transform.
+
+        :param text_color: The text color to use. If None, the color is determined by the visibility of the transform.
+        """
+        if text_color is None:
+            text_color = Colors.ACTIVE if self.associated_transform.visible else Colors.INACTIVE
+        self.name_label.set_text(self.associated_transform.name, text_color)
+        array = self.associated_transform.get_array()
+        for y, line_of_labels in enumerate(self.number_labels):
+            for x, number_label in enumerate(line_of_labels):
+                number_label.set_text(format_float(array[y, x]), text_color)
+
     def render(self, surface: Surface):
         self.render_child_items(surface)
 
@@ -527,6 +589,7 @@ class TransformItem(ItemContainer):
         elif event.type == pg.MOUSEMOTION:
             if self.dragged_label_index:
                 self.associated_transform.matrix[self.dragged_label_index] -= event.rel[1] * 0.01
+                self.associated_transform.touch()
 
     def update_from(self, other):
         """
@@ -2,6 +2,7 @@ from typing import Callable, Optional
 
 import pygame as pg
 
+from linear_algebra_testcase.common.fonts import get_font, text_cache
 from linear_algebra_testcase.common.utils import gray
 
 
@@ -17,16 +18,23 @@ class Window:
         self.fontsize = fontsize
         self.text_color = text_color or gray(220)
         self.font_name = font_name or pg.font.get_default_font()
-        self.font = pg.font.Font(self.font_name, self.fontsize)
+        self.font = get_font(self.font_name, self.fontsize)
         self.on_close: Callable = on_close or on_close_noop
         self.has_to_close = False
 
+    @staticmethod
+    def get_rect(screen: pg.Surface) -> pg.Rect:
+        """
+        Returns the area of the screen covered by the window.
+        """
+        return pg.Rect(200, 200, screen.get_width() - 400, 200)
+
     def render(self, screen: pg.Surface):
-        pg.draw.rect(screen, pg.Color(128, 128, 128), pg.Rect(200, 200, screen.get_width() - 400, 200))
+        pg.draw.rect(screen, pg.Color(128, 128, 128), self.get_rect(screen))
         small_rect = pg.Rect(220, 200+80, screen.get_width() - 440, 40)
         pg.draw.rect(screen, pg.Color(28, 28, 28), small_rect)
 
-        font = self.font.render(self.text, True, pg.Color(220, 220, 220))
+        font = text_cache.render(self.font, self.text, pg.Color(220, 220, 220))
         cursor_position = self.font.size(self.text[:self.cursor_position])[0]
         cursor_top_spacing = 4
         cursor_rect = small_rect.move(cursor_position+3, cursor_top_spacing)
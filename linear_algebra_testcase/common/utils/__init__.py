@@ -1,4 +1,5 @@
 from enum import IntEnum
+from typing import Tuple
 
 import pygame as pg
 import sys
@@ -45,6 +46,22 @@ def normalize_vec(vec):
     return vec / (np.linalg.norm(vec) + 0.000000001)
 
 
+def rotation_matrix(angle) -> np.ndarray:
+    """
+    Returns the matrices, that rotate 2d vectors counterclockwise by the given angles. Trailing axes of length one are
+    dropped from the angles, so for the time variable of animated definitions, the matrices of all frames can be
+    multiplied with an array of vectors of shape [2, N].
+
+    :param angle: A single angle or an array of angles in radians
+    :return: The rotation matrices of shape [..., 2, 2]
+    """
+    angle = np.asarray(angle, dtype=float)
+    while angle.ndim and angle.shape[-1] == 1:
+        angle = angle[..., 0]
+    cos, sin = np.cos(angle), np.sin(angle)
+    return np.stack([np.stack([cos, -sin], axis=-1), np.stack([sin, cos], axis=-1)], axis=-2)
+
+
 def np_cross(a: np.ndarray, b: np.ndarray) -> np.ndarray:
     """
     Workaround to fix type annotation. Just calls np.cross()
@@ -52,12 +69,35 @@ def np_cross(a: np.ndarray, b: np.ndarray) -> np.ndarray:
     return np.cross(a, b)
 
 
+class GrowingBuffer:
+    """
+    A preallocated float buffer, that is reused for arrays of changing shapes. Memory is only allocated, if a larger
+    array than ever before is requested.
+    """
+    def __init__(self, size: int = 1024):
+        self.data = np.empty(size, dtype=float)
+
+    def get(self, shape: Tuple[int, ...]) -> np.ndarray:
+        """
+        Returns a contiguous array of the given shape, that uses the memory of this buffer. The content is undefined.
+        The array is only valid until the next call of get().
+
+        :param shape: The shape of the array
+        """
+        size = int(np.prod(shape))
+        if size > len(self.data):
+            self.data = np.empty(max(size, 2 * len(self.data)), dtype=float)
+        return self.data[:size].reshape(shape)
+
+
 def prepare_vecs(vecs, dim: int) -> np.ndarray:
     """
-    Makes sure vecs are of shape [N, dim+1].
+    Makes sure vecs are of shape [N, dim+1]. Vectors, that are already homogeneous, are returned unchanged.
     """
     if vecs.shape == (dim,):
         vecs = vecs.reshape(1, dim)
+    if vecs.shape[1] == dim + 1:
+        return vecs
     # pad to 4D vec
     return np.pad(vecs, ((0, 0), (0, 1)), 'constant', constant_values=1.0)
 
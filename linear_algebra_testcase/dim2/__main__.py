@@ -1,52 +1,143 @@
 #!/usr/bin/env python3
 
 
+import argparse
+import os
 import sys
+import time
+from typing import Dict, Optional, Hashable
+
 import pygame as pg
 
 from linear_algebra_testcase.common.utils import Dimension
 from .controller import Controller
 from .coordinate_system import DEFAULT_SCREEN_SIZE, CoordinateSystem
+from linear_algebra_testcase.common.animation import ANIMATION_FRAME_INTERVAL
+from linear_algebra_testcase.common.capture import ProfileCapture, add_capture_arguments, create_profile_capture
 from linear_algebra_testcase.common.elements_core import ElementBuffer
-from .render import render
+from linear_algebra_testcase.common.evaluation import WorkerEvaluator, EVALUATION_POLL_INTERVAL
+from linear_algebra_testcase.common.events import MotionCoalescer
+from linear_algebra_testcase.common.fonts import get_font, text_cache
+from linear_algebra_testcase.common.metrics import METRICS_ENV_VAR, create_metrics_exporter
+from linear_algebra_testcase.common.profiler import FrameProfiler
+from linear_algebra_testcase.common.recording import RECORDING_ENV_VAR, create_recorder
+from .elements import CustomTransformed
+from .render import DirtyRectRenderer
 from linear_algebra_testcase.common.user_interface import UserInterface
 
 
 class Main:
-    def __init__(self):
+    def __init__(self, profile_capture: Optional[ProfileCapture] = None):
         pg.init()
         pg.key.set_repeat(130, 25)
         self.screen = pg.display.set_mode(DEFAULT_SCREEN_SIZE)
         self.controller = Controller()
         self.coordinate_system = CoordinateSystem()
-        self.element_buffer = ElementBuffer()
-        self.render_font = pg.font.Font(pg.font.get_default_font(), 18)
+        self.element_buffer = ElementBuffer(WorkerEvaluator.create(CustomTransformed.get_eval_constants))
+        self.render_font = get_font()
+        self.profiler = FrameProfiler()
+        self.profile_capture = profile_capture or ProfileCapture()
+        self.renderer = DirtyRectRenderer(profiler=self.profiler)
         self.user_interface = UserInterface()
+        self.event_coalescer = MotionCoalescer()
+        self.frame_signature: Optional[Hashable] = None
+        self.recorder = create_recorder(os.environ.get(RECORDING_ENV_VAR), Dimension.d2, self.screen.get_size())
+        self.metrics = create_metrics_exporter(os.environ.get(METRICS_ENV_VAR), Dimension.d2)
 
     def run(self):
         while self.controller.running:
-            events = [pg.event.wait()]
+            if self.element_buffer.is_evaluating():
+                # wake up regularly to receive the results of the evaluations
+                events = [pg.event.wait(EVALUATION_POLL_INTERVAL)]
+            elif self.element_buffer.is_animated():
+                # wake up for the next frame of the animation
+                events = [pg.event.wait(ANIMATION_FRAME_INTERVAL)]
+            elif self.metrics is not None:
+                # wake up for the next record of the metrics
+                events = [pg.event.wait(self.metrics.get_timeout(pg.time.get_ticks()))]
+            else:
+                events = [pg.event.wait()]
             events = events + pg.event.get()
             self.handle_events(events)
 
+        if self.recorder is not None:
+            self.recorder.close()
+        self.profile_capture.close()
+        self.element_buffer.close()
         pg.quit()
 
-    def handle_events(self, events):
-        for event in events:
-            self.controller.handle_event(event, self.coordinate_system, self.element_buffer, self.user_interface)
+    def handle_events(self, events, ticks: Optional[int] = None):
+        """
+        Handles the events of one frame and renders the frame, if something changed.
+
+        :param events: The events of the frame
+        :param ticks: The time of the frame in milliseconds. If None, the time since pygame.init() is used. Replays
+                      pass the recorded time.
+        """
+        frame_start = time.perf_counter()
+        if ticks is None:
+            ticks = pg.time.get_ticks()
+        if self.recorder is not None:
+            self.recorder.record(ticks, events)
+        self.profile_capture.begin_frame()
+        self.profiler.begin_frame()
+        self.element_buffer.time = ticks / 1000.0
+        with self.profiler.measure('events'):
+            # fast mouse movement queues many motions per frame, that only need to be handled once
+            for event in self.event_coalescer.coalesce(events):
+                self.profiler.handle_event(event)
+                self.profile_capture.handle_event(event)
+                self.controller.handle_event(event, self.coordinate_system, self.element_buffer, self.user_interface)
 
-        self.element_buffer.remove_elements()
+        with self.profiler.measure('update'):
+            self.element_buffer.remove_elements()
+            self.element_buffer.update()
 
-        self.user_interface.build(self.element_buffer, Dimension.d2)
+        with self.profiler.measure('build'):
+            self.user_interface.build(self.element_buffer, Dimension.d2)
 
-        if self.controller.update_needed:
-            render(self.screen, self.coordinate_system, self.element_buffer, self.render_font, self.user_interface)
-            pg.display.flip()
+        frame_signature = self.get_frame_signature()
+        rendered = self.controller.update_needed or frame_signature != self.frame_signature
+        if rendered:
+            dirty_rects = self.renderer.render(
+                self.screen, self.coordinate_system, self.element_buffer, self.render_font, self.user_interface
+            )
+            with self.profiler.measure('flip'):
+                if dirty_rects is None or self.controller.update_needed:
+                    pg.display.flip()
+                elif dirty_rects:
+                    pg.display.update(dirty_rects)
+            self.frame_signature = frame_signature
             self.controller.update_needed = False
+        self.profiler.end_frame()
+        self.profile_capture.end_frame()
+        if self.metrics is not None:
+            self.metrics.record_frame(ticks, time.perf_counter() - frame_start, rendered, self.get_metrics)
+
+    def get_metrics(self) -> Dict[str, Dict[str, float]]:
+        return {
+            'elements': self.element_buffer.get_stats(),
+            'text_cache': text_cache.get_stats(),
+            'events': self.event_coalescer.get_stats(),
+        }
+
+    def get_frame_signature(self) -> Hashable:
+        """
+        Returns the versions of everything visible. If the signature did not change, the frame does not change.
+        """
+        # the overlay of the enabled profiler shows the statistics of all frames, which change with every frame
+        return (
+            self.coordinate_system.version, self.element_buffer.get_version(), self.user_interface.version,
+            self.screen.get_size(), self.profiler.enabled, self.profiler.num_frames
+        )
 
 
 def main():
-    main_instance = Main()
+    parser = argparse.ArgumentParser(description='Shows vectors, transforms and transformed elements in 2d.')
+    add_capture_arguments(parser)
+    # the browser passes no arguments
+    args, _ = parser.parse_known_args()
+    main_instance = Main(create_profile_capture(args))
     if "pyodide" in sys.modules:
         # noinspection PyUnresolvedReferences
         pg.event.register_event_callback(main_instance.handle_events)
@@ -1,5 +1,3 @@
-from itertools import chain
-
 import numpy as np
 import pygame as pg
 
@@ -17,6 +15,9 @@ class Controller:
 
     def handle_event(self, event, coordinate_system: CoordinateSystem, element_buffer: ElementBuffer,
                      user_interface: UserInterface):
+        if event.type == pg.MOUSEMOTION:
+            # a motion is handled at its new position, as it can be merged from several motions
+            self.mouse_position = np.array(event.pos, dtype=int)
         user_interface.handle_event(event, self.mouse_position)
         if not user_interface.consuming_events(self.mouse_position):
             element_buffer.handle_event(event, coordinate_system, self.mouse_position)
@@ -26,24 +27,12 @@ class Controller:
             self.running = False
         elif event.type == pg.MOUSEBUTTONDOWN:
             if not user_interface.consuming_events(self.mouse_position):
-                self.is_dragging = True
-                for element in chain(element_buffer.elements, element_buffer.transforms):
-                    if element.is_hovered(self.mouse_position, coordinate_system):
-                        self.is_dragging = False
-            self.update_needed = True
+                # dragging on an element does not move the coordinate system
+                self.is_dragging = not element_buffer.get_hovered_elements(self.mouse_position, coordinate_system)
         elif event.type == pg.MOUSEBUTTONUP:
             self.is_dragging = False
-            self.update_needed = True
-        elif event.type == pg.MOUSEMOTION:
-            self.mouse_position = np.array(event.pos, dtype=int)
-            self.update_needed = True
-        elif event.type == pg.WINDOWENTER or event.type == pg.WINDOWFOCUSGAINED:
-            self.update_needed = True
-        elif event.type == pg.KEYUP:  # TODO: maybe remove
-            self.update_needed = True
-        elif event.type == pg.KEYDOWN:
-            self.update_needed = True
-        elif event.type == pg.WINDOWRESIZED:
+        elif event.type in (pg.WINDOWENTER, pg.WINDOWFOCUSGAINED, pg.WINDOWEXPOSED, pg.WINDOWRESIZED):
+            # the window content has to be presented again, although the scene did not change
             self.update_needed = True
         else:
             # print(event)
@@ -55,7 +44,6 @@ class Controller:
                 coordinate_system.zoom_out(self.mouse_position)
             else:
                 coordinate_system.zoom_in(self.mouse_position)
-            self.update_needed = True
         elif event.type == pg.MOUSEMOTION:
             if self.is_dragging:
                 coordinate_system.translate(np.array(event.rel))
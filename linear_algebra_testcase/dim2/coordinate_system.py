@@ -1,7 +1,9 @@
 from __future__ import annotations
 import numbers
 import numpy as np
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Sequence, List
+
+from linear_algebra_testcase.common.utils import GrowingBuffer
 
 DEFAULT_SCREEN_SIZE = np.array([1280, 720])
 
@@ -10,7 +12,27 @@ class CoordinateSystem:
     def __init__(self, coord: Optional[np.ndarray] = None):
         if coord is None:
             coord = create_affine_transformation(DEFAULT_SCREEN_SIZE/2, (100, -100))
-        self.coord: np.ndarray = coord
+        self.version = 0
+        self._coord: np.ndarray = coord
+        self._inverse: Optional[np.ndarray] = None
+        self._zero_point: Optional[np.ndarray] = None
+        self._batch_points = GrowingBuffer()
+        self._batch_result = GrowingBuffer()
+
+    @property
+    def coord(self) -> np.ndarray:
+        return self._coord
+
+    @coord.setter
+    def coord(self, coord: np.ndarray):
+        """
+        Sets the coordinate matrix, increases the version of the coordinate system and invalidates the cached inverse
+        and zero point.
+        """
+        self._coord = coord
+        self._inverse = None
+        self._zero_point = None
+        self.version += 1
 
     @classmethod
     def create(cls, translation=0, scale=1) -> CoordinateSystem:
@@ -40,9 +62,12 @@ class CoordinateSystem:
 
     def get_zero_point(self):
         """
-        Get the zero point of the coordinate system in screen coordinates.
+        Get the zero point of the coordinate system in screen coordinates. The returned array must not be modified.
         """
-        return self.transform(np.array([0.0, 0.0]))
+        if self._zero_point is None:
+            self._zero_point = self.transform(np.array([0.0, 0.0]))
+            self._zero_point.flags.writeable = False
+        return self._zero_point
 
     def transform(self, mat: np.ndarray):
         """
@@ -53,9 +78,61 @@ class CoordinateSystem:
         """
         return transform(self.coord, mat)
 
+    def transform_batch(self, arrays: Sequence[Optional[np.ndarray]]) -> List[Optional[np.ndarray]]:
+        """
+        Transforms the arrays of many elements with a single matrix multiplication. The arrays are copied into a
+        preallocated buffer of homogeneous coordinates, which is transformed into a second preallocated buffer.
+
+        :param arrays: A list of arrays with shape [2, N_i] or [2,] or homogeneous arrays with shape [3, N_i]. None
+                       entries are skipped.
+        :return: For every array a view of shape [2, N_i] into the result buffer or None for None entries. The views
+                 are only valid until the next call of transform_batch().
+        """
+        arrays = [None if array is None else _cartesian_view(np.asarray(array)) for array in arrays]
+        total = sum(array.shape[1] for array in arrays if array is not None)
+        points = self._batch_points.get((3, total))
+        points[2] = 1.0
+        offsets = []
+        offset = 0
+        for array in arrays:
+            offsets.append(offset)
+            if array is not None:
+                points[:2, offset:offset + array.shape[1]] = array
+                offset += array.shape[1]
+
+        result = self._batch_result.get((2, total))
+        np.matmul(self.coord[:2], points, out=result)
+        return [
+            None if array is None else result[:, start:start + array.shape[1]]
+            for array, start in zip(arrays, offsets)
+        ]
+
+    def get_inverse(self) -> np.ndarray:
+        """
+        Returns the inverse of the coordinate matrix. The inverse is computed only once after the coordinate matrix
+        changed.
+        """
+        if self._inverse is None:
+            self._inverse = invert_affine_transformation(self._coord)
+        return self._inverse
+
     def transform_inverse(self, mat: np.ndarray):
-        inv = np.linalg.pinv(self.coord)
-        return transform(inv, mat)
+        """
+        Transform the given screen coordinates back into the coordinate system.
+
+        :param mat: A list of column vectors with shape [2, N]. For vectors shape should be [2, 1] or [2,].
+        :return: A list of column vectors with shape [2, N].
+        """
+        return transform(self.get_inverse(), mat)
+
+
+def _cartesian_view(array: np.ndarray) -> np.ndarray:
+    """
+    Returns the cartesian part of shape [2, N] of the given cartesian or homogeneous array.
+    """
+    if array.ndim == 2 and array.shape[0] == 3:
+        return array[:2]
+    return array.reshape(2, -1)
 
 
 def create_affine_transformation(
@@ -79,17 +156,41 @@ def create_affine_transformation(
     return translate_coord @ scale_coord
 
 
+def invert_affine_transformation(mat: np.ndarray) -> np.ndarray:
+    """
+    Inverts an affine transformation of shape [3, 3] analytically. For a linear part A and a translation t the inverse
+    has the linear part A^-1 and the translation -A^-1 @ t.
+    If the linear part is singular, the pseudo inverse is returned.
+
+    :param mat: The affine transformation to invert of shape [3, 3]. The last row has to be [0, 0, 1].
+    :return: The inverted transformation of shape [3, 3].
+    """
+    (a, b), (c, d) = mat[0, :2], mat[1, :2]
+    det = a * d - b * c
+    if det == 0:
+        return np.linalg.pinv(mat)
+    inverse = np.empty((3, 3), dtype=float)
+    inverse[0, 0] = d / det
+    inverse[0, 1] = -b / det
+    inverse[1, 0] = -c / det
+    inverse[1, 1] = a / det
+    inverse[:2, 2] = -(inverse[:2, :2] @ mat[:2, 2])
+    inverse[2] = (0.0, 0.0, 1.0)
+    return inverse
+
+
 def transform(transform_matrix: np.ndarray, mat: np.ndarray, perspective=False):
     """
     Transforms a given matrix with the given transformation matrix.
     Transformation matrix should be of shape [2, 2] or [3, 3]. If transformation matrix is of shape [3, 3] and the
-    matrix to transform is of shape [2, N], matrix will be padded with ones to shape [3, N].
+    matrix to transform is of shape [2, N], matrix will be padded with ones to shape [3, N]. Matrices of shape [3, N]
+    are already homogeneous and are not padded.
     If mat is of shape [2,] it will be converted to [2, 1].
 
     The calculation will be transform_matrix @ mat.
 
     :param transform_matrix: A np.ndarray with shape [2, 2] or [3, 3].
-    :param mat: The matrix to convert of shape [2, N]. If mat is of shape [2,] it will be converted to [2, 1].
+    :param mat: The matrix to convert of shape [2, N] or [3, N]. If mat is of shape [2,] it will be converted to [2, 1].
     :param perspective: If perspective is True and the transform_mat is of shape (3, 3), the x- and y-axis of the
                         resulting vector are divided by the resulting z axis.
     :return:
@@ -101,7 +202,8 @@ def transform(transform_matrix: np.ndarray, mat: np.ndarray, perspective=False):
 
     padded = False
     if transform_matrix.shape == (3, 3):
-        mat = np.concatenate([mat, np.ones((1, mat.shape[1]))], axis=0)
+        if mat.shape[0] == 2:
+            mat = np.concatenate([mat, np.ones((1, mat.shape[1]))], axis=0)
         padded = True
 
     result = transform_matrix @ mat
@@ -135,6 +237,42 @@ def test_single_dimension():
     assert tuple(line_coords2.shape) == (2,), line_coords2.shape
 
 
+def test_inverse():
+    coordinate_system = CoordinateSystem()
+    coordinate_system.zoom_in(np.array([300, 200]))
+    coordinate_system.translate(np.array([12.0, -7.0]))
+
+    assert np.allclose(coordinate_system.get_inverse(), np.linalg.pinv(coordinate_system.coord))
+    points = np.array([[-2.5, 0.0, 3.0], [1.0, 4.0, -0.5]])
+    assert np.allclose(coordinate_system.transform_inverse(coordinate_system.transform(points)), points)
+
+    # the cached inverse is invalidated by changing the coordinate system
+    inverse = coordinate_system.get_inverse()
+    assert coordinate_system.get_inverse() is inverse
+    coordinate_system.zoom_out()
+    assert np.allclose(coordinate_system.get_inverse(), np.linalg.pinv(coordinate_system.coord))
+
+
+def test_transform_batch():
+    coordinate_system = CoordinateSystem()
+    coordinate_system.zoom_in(np.array([300, 200]))
+
+    arrays = [np.array([1.0, 2.0]), None, np.array([[-100, -100], [100, 100], [200, 200]]).T]
+    results = coordinate_system.transform_batch(arrays)
+    assert results[1] is None
+    assert np.allclose(results[0], coordinate_system.transform(arrays[0]).reshape(2, 1))
+    assert np.allclose(results[2], coordinate_system.transform(arrays[2]))
+
+
+def test_homogeneous():
+    coordinate_system = CoordinateSystem()
+
+    points = np.array([[-1.5, 0.0, 2.0], [1.0, 3.0, -0.5]])
+    homogeneous_points = np.concatenate([points, np.ones((1, 3))], axis=0)
+    assert np.allclose(coordinate_system.transform(homogeneous_points), coordinate_system.transform(points))
+    assert np.allclose(coordinate_system.transform_batch([homogeneous_points])[0], coordinate_system.transform(points))
+
+
 def test_multi_dimension():
     coordinate_system = CoordinateSystem()
 
@@ -5,36 +5,63 @@ import pygame as pg
 import numpy as np
 
 from .coordinate_system import CoordinateSystem, transform_perspective as transform_p
-from linear_algebra_testcase.common.utils import normalize_vec
-from linear_algebra_testcase.common.elements_core import Element, RenderKind, GREEN, RED, snap, AXIS_COLORS
+from linear_algebra_testcase.common.drawing import draw_rays, draw_points, union_rects
+from linear_algebra_testcase.common.utils import normalize_vec, rotation_matrix
+from linear_algebra_testcase.common.elements_core import (Element, RenderKind, RED, snap, AXIS_COLORS,
+                                                           HomogeneousCoordinates)
+from linear_algebra_testcase.common.custom_transformed import CustomTransformedBase
 
 
 class Vector(Element):
-    def __init__(self, name: str, coordinates: np.ndarray, render_kind: RenderKind = RenderKind.LINE):
+    UNVERSIONED_ATTRIBUTES = Element.UNVERSIONED_ATTRIBUTES | {'dragged'}
+    EVENT_TYPES = Element.EVENT_TYPES | {pg.MOUSEBUTTONDOWN, pg.MOUSEBUTTONUP}
+
+    coordinates = HomogeneousCoordinates(dim=2, axis=0)
+
+    def __init__(
+            self, name: str, coordinates: np.ndarray, render_kind: RenderKind = RenderKind.LINE,
+            homogeneous: bool = False
+    ):
         super().__init__(name, render_kind)
+        self.homogeneous = homogeneous
         self.coordinates = coordinates.reshape((2, 1))
         self.dragged = False
 
     def is_hovered(self, mouse_position: np.ndarray, coordinate_system: CoordinateSystem):
         if not self.visible:
             return False
-        pos = coordinate_system.transform(self.get_array()).flatten()
+        if self.arena is not None:
+            return self.arena.is_hovered(self, mouse_position, coordinate_system)
+        pos = coordinate_system.transform(self.get_projectable_array()).flatten()
         diff = np.sum((mouse_position - pos)**2)
         return diff < 100
 
+    def has_mouse_state(self) -> bool:
+        return self.hovered or self.dragged
+
     def __repr__(self):
         return '[{:.2f} {:.2f}]'.format(self.coordinates[0], self.coordinates[1])
 
     def get_array(self):
         return self.coordinates.reshape((2, 1))
 
-    def render(self, screen: pg.Surface, coordinate_system: CoordinateSystem):
-        transformed_vec = coordinate_system.transform(self.get_array()).flatten()
+    def get_render_points(self):
+        return self.get_projectable_array()
+
+    def render(
+            self, screen: pg.Surface, coordinate_system: CoordinateSystem, screen_points: Optional[np.ndarray] = None
+    ) -> Optional[pg.Rect]:
+        if screen_points is None:
+            screen_points = coordinate_system.transform(self.get_render_points())
+        transformed_vec = screen_points[:, 0]
         width = 3 if self.hovered else 1
         if self.render_kind == RenderKind.POINT:
-            pg.draw.circle(screen, GREEN, transformed_vec, width)
+            return pg.draw.circle(screen, self.get_color(), transformed_vec, width)
         elif self.render_kind == RenderKind.LINE:
-            pg.draw.line(screen, GREEN, coordinate_system.get_zero_point(), transformed_vec, width=width)
+            return pg.draw.line(
+                screen, self.get_color(), coordinate_system.get_zero_point(), transformed_vec, width=width
+            )
+        return None
 
     def handle_event(self, event: pg.event.Event, coordinate_system: CoordinateSystem, mouse_position: np.ndarray):
         super().handle_event(event, coordinate_system, mouse_position)
@@ -50,8 +77,14 @@ class Vector(Element):
 
 
 class MultiVectorObject(Element):
-    def __init__(self, name: str, coordinates: np.ndarray, render_kind: RenderKind = RenderKind.POINT):
+    coordinates = HomogeneousCoordinates(dim=2, axis=0)
+
+    def __init__(
+            self, name: str, coordinates: np.ndarray, render_kind: RenderKind = RenderKind.POINT,
+            homogeneous: bool = False
+    ):
         super().__init__(name, render_kind)
+        self.homogeneous = homogeneous
         self.coordinates = coordinates
         self.original_coordinates = coordinates
 
@@ -102,7 +135,9 @@ class MultiVectorObject(Element):
     def is_hovered(self, mouse_position: np.ndarray, coordinate_system: CoordinateSystem):
         if not self.visible:
             return False
-        pos = coordinate_system.transform(self.get_array()).T
+        if self.arena is not None:
+            return self.arena.is_hovered(self, mouse_position, coordinate_system)
+        pos = coordinate_system.transform(self.get_projectable_array()).T
         diff = np.sum((mouse_position - pos)**2, axis=1)
         return np.any(diff < 100)
 
@@ -113,20 +148,30 @@ class MultiVectorObject(Element):
     def get_array(self):
         return self.coordinates
 
-    def render(self, screen: pg.Surface, coordinate_system: CoordinateSystem):
-        transformed_vec = coordinate_system.transform(self.get_array()).T
+    def get_render_points(self):
+        return self.get_projectable_array()
+
+    def render(
+            self, screen: pg.Surface, coordinate_system: CoordinateSystem, screen_points: Optional[np.ndarray] = None
+    ) -> Optional[pg.Rect]:
+        if screen_points is None:
+            screen_points = coordinate_system.transform(self.get_render_points())
+        transformed_vec = screen_points.T
         width = 4 if self.hovered else 3
-        for point in transformed_vec:
-            if self.render_kind == RenderKind.POINT:
-                pg.draw.circle(screen, GREEN, point, width)
-            elif self.render_kind == RenderKind.LINE:
-                pg.draw.line(screen, GREEN, coordinate_system.get_zero_point(), point, width=1)
+        if self.render_kind == RenderKind.POINT:
+            return draw_points(screen, self.get_color(), transformed_vec, width)
+        elif self.render_kind == RenderKind.LINE:
+            return draw_rays(screen, self.get_color(), coordinate_system.get_zero_point(), transformed_vec)
+        return None
 
     def handle_event(self, event: pg.event.Event, coordinate_system: CoordinateSystem, mouse_position: np.ndarray):
         super().handle_event(event, coordinate_system, mouse_position)
 
 
 class Transform2D(Element):
+    UNVERSIONED_ATTRIBUTES = Element.UNVERSIONED_ATTRIBUTES | {'dragged_index'}
+    EVENT_TYPES = Element.EVENT_TYPES | {pg.MOUSEBUTTONDOWN, pg.MOUSEBUTTONUP}
+
     def __init__(self, name: str, render_kind: RenderKind = RenderKind.LINE):
         super().__init__(name, render_kind)
         self.matrix = np.eye(2)
@@ -134,25 +179,45 @@ class Transform2D(Element):
         self.hovered_index = None
 
     def get_array(self):
-        return snap(self.matrix)
-
-    def render(self, screen: pg.Surface, coordinate_system: CoordinateSystem):
-        transformed_vecs = coordinate_system.transform(self.get_array()).T
+        return self.memoize('array', lambda: snap(self.matrix))
+
+    def get_render_points(self):
+        return self.get_array()
+
+    def render(
+            self, screen: pg.Surface, coordinate_system: CoordinateSystem, screen_points: Optional[np.ndarray] = None
+    ) -> Optional[pg.Rect]:
+        if screen_points is None:
+            screen_points = coordinate_system.transform(self.get_render_points())
+        transformed_vecs = screen_points.T
+        rects = []
         for i, transformed_vec in enumerate(transformed_vecs):
             width = 3 if self.hovered_index == i else 1
             color = AXIS_COLORS[i]
             if self.render_kind == RenderKind.POINT:
-                pg.draw.circle(screen, color, transformed_vec, width)
+                rects.append(pg.draw.circle(screen, color, transformed_vec, width))
             elif self.render_kind == RenderKind.LINE:
-                pg.draw.line(screen, color, coordinate_system.get_zero_point(), transformed_vec, width=width)
+                rects.append(
+                    pg.draw.line(screen, color, coordinate_system.get_zero_point(), transformed_vec, width=width)
+                )
+        return union_rects(rects)
 
     def is_hovered(self, mouse_position: np.ndarray, coordinate_system: CoordinateSystem):
         return self.hovered_index is not None
 
+    def has_mouse_state(self) -> bool:
+        return self.hovered or self.hovered_index is not None or self.dragged_index is not None
+
+    def get_render_state(self):
+        return super().get_render_state() + (self.hovered_index,)
+
     def get_hovered_index(self, mouse_position: np.ndarray, coordinate_system: CoordinateSystem) -> Optional[int]:
         if not self.visible:
             return None
-        pos = coordinate_system.transform(self.get_array()).T
+        pos = self.memoize(
+            'hover_points', lambda: coordinate_system.transform(self.get_array()).T,
+            key=(coordinate_system, coordinate_system.version)
+        )
         diff = np.sum((mouse_position - pos)**2, axis=1)
         indices: np.ndarray = np.where(diff < 100)[0]
         if len(indices):
@@ -170,9 +235,13 @@ class Transform2D(Element):
             if self.dragged_index is not None:
                 pos = coordinate_system.transform_inverse(np.array(event.pos))
                 self.matrix[:, self.dragged_index] = snap(pos)
+                self.touch()
 
 
 class Translate2D(Element):
+    UNVERSIONED_ATTRIBUTES = Element.UNVERSIONED_ATTRIBUTES | {'dragged_index'}
+    EVENT_TYPES = Element.EVENT_TYPES | {pg.MOUSEBUTTONDOWN, pg.MOUSEBUTTONUP}
+
     def __init__(self, name: str, render_kind: RenderKind = RenderKind.LINE):
         super().__init__(name, render_kind)
         self.matrix = np.eye(3)
@@ -180,34 +249,48 @@ class Translate2D(Element):
         self.hovered_index = None
 
     def get_array(self):
-        return snap(self.matrix)
+        return self.memoize('array', lambda: snap(self.matrix))
 
-    def get_render_locations(self, coordinate_system: CoordinateSystem):
+    def get_render_points(self):
+        """
+        Returns the tips of both axes and the offset in world coordinates with shape [2, 3].
+        """
         vecs = self.get_array()[:2]
         offset = vecs[:, 2].reshape(2, 1)
-        first_vecs = vecs[:, :2] + offset
-        first_vecs_transformed = coordinate_system.transform(first_vecs)
-        offset_transformed = coordinate_system.transform(offset)
-        return np.concatenate([first_vecs_transformed, offset_transformed.reshape(2, 1)], axis=1)
+        return np.concatenate([vecs[:, :2] + offset, offset], axis=1)
 
-    def render(self, screen: pg.Surface, coordinate_system: CoordinateSystem):
-        render_locations = self.get_render_locations(coordinate_system).T
+    def get_render_locations(self, coordinate_system: CoordinateSystem):
+        return coordinate_system.transform(self.get_render_points())
+
+    def render(
+            self, screen: pg.Surface, coordinate_system: CoordinateSystem, screen_points: Optional[np.ndarray] = None
+    ) -> Optional[pg.Rect]:
+        if screen_points is None:
+            screen_points = self.get_render_locations(coordinate_system)
+        render_locations = screen_points.T
         offset_location = render_locations[2]
+        rects = []
         for i, transformed_vec in enumerate(render_locations):
             width = 3 if self.hovered_index == i else 1
             color = AXIS_COLORS[i]
             if self.render_kind == RenderKind.POINT:
-                pg.draw.circle(screen, color, transformed_vec, width)
+                rects.append(pg.draw.circle(screen, color, transformed_vec, width))
             elif self.render_kind == RenderKind.LINE:
                 if i < 2:
-                    pg.draw.line(screen, color, offset_location, transformed_vec, width=width)
+                    rects.append(pg.draw.line(screen, color, offset_location, transformed_vec, width=width))
                 else:
-                    pg.draw.line(screen, color, coordinate_system.get_zero_point(), offset_location, width=width)
+                    rects.append(pg.draw.line(
+                        screen, color, coordinate_system.get_zero_point(), offset_location, width=width
+                    ))
+        return union_rects(rects)
 
     def get_hovered_index(self, mouse_position: np.ndarray, coordinate_system: CoordinateSystem) -> Optional[int]:
         if not self.visible:
             return None
-        pos = self.get_render_locations(coordinate_system).T
+        pos = self.memoize(
+            'hover_points', lambda: self.get_render_locations(coordinate_system).T,
+            key=(coordinate_system, coordinate_system.version)
+        )
         diff = np.sum((mouse_position - pos)**2, axis=1)
         indices: np.ndarray = np.where(diff < 100)[0]
         if len(indices):
@@ -217,6 +300,12 @@ class Translate2D(Element):
     def is_hovered(self, _mouse_position: np.ndarray, _coordinate_system: CoordinateSystem):
         return self.hovered_index is not None
 
+    def has_mouse_state(self) -> bool:
+        return self.hovered or self.hovered_index is not None or self.dragged_index is not None
+
+    def get_render_state(self):
+        return super().get_render_state() + (self.hovered_index,)
+
     def handle_event(self, event: pg.event.Event, coordinate_system: CoordinateSystem, mouse_position: np.ndarray):
         super().handle_event(event, coordinate_system, mouse_position)
         if event.type == pg.MOUSEBUTTONDOWN:
@@ -229,9 +318,12 @@ class Translate2D(Element):
                 pos = coordinate_system.transform_inverse(np.array(event.pos))
                 offset = np.zeros(2) if self.dragged_index == 2 else self.get_array()[:2, 2]
                 self.matrix[:2, self.dragged_index] = snap(pos - offset)
+                self.touch()
 
 
 class Transformed2D(Element):
+    EVENT_TYPES = frozenset()
+
     def __init__(self, name: str, element: Union[None, Vector, MultiVectorObject], transform: Optional[Transform2D],
                  render_kind: RenderKind):
         super().__init__(name, render_kind)
@@ -240,104 +332,95 @@ class Transformed2D(Element):
 
     def get_position(self):
         if self.element is not None and self.transform is not None:
-            return transform_p(self.transform.get_array(), self.element.get_array())
+            return self.memoize('position', self._compute_position)
         return None
 
+    def _compute_position(self):
+        transform = self.transform.get_array()
+        # affine transforms can be applied directly to homogeneous elements
+        element = self.element.get_projectable_array() if transform.shape == (3, 3) else self.element.get_array()
+        return transform_p(transform, element)
+
+    def get_dependencies(self):
+        return [dependency for dependency in (self.element, self.transform) if dependency is not None]
+
+    def get_version(self):
+        element_version = self.element.get_version() if self.element is not None else None
+        transform_version = self.transform.get_version() if self.transform is not None else None
+        return self.version, element_version, transform_version
+
+    def update(self):
+        self.get_position()
+
     def get_array(self):
         return self.get_position()
 
-    def render(self, screen: pg.Surface, coordinate_system: CoordinateSystem):
-        new_vec = self.get_position()
+    def get_render_points(self):
+        return self.get_position()
+
+    def render(
+            self, screen: pg.Surface, coordinate_system: CoordinateSystem, screen_points: Optional[np.ndarray] = None
+    ) -> Optional[pg.Rect]:
+        if screen_points is None:
+            new_vec = self.get_position()
+            if new_vec is None:
+                return None
+            screen_points = coordinate_system.transform(new_vec)
         zero_point = coordinate_system.get_zero_point()
-        if new_vec is None:
-            return
-        transformed_vec = coordinate_system.transform(new_vec).T
-        for point in transformed_vec:
-            if self.render_kind == RenderKind.POINT:
-                pg.draw.circle(screen, RED, point, 3)
-            elif self.render_kind == RenderKind.LINE:
-                pg.draw.line(screen, RED, zero_point, point, width=1)
+        transformed_vec = screen_points.T
+        if self.render_kind == RenderKind.POINT:
+            return draw_points(screen, RED, transformed_vec, 3)
+        elif self.render_kind == RenderKind.LINE:
+            return draw_rays(screen, RED, zero_point, transformed_vec)
+        return None
 
     def handle_event(self, event: pg.event.Event, coordinate_system: CoordinateSystem, mouse_position: np.ndarray):
         pass
 
 
-class CustomTransformed(Element):
-    def __init__(self, name: str, render_kind: RenderKind, element_buffer):
-        super().__init__(name, render_kind)
-        self.definition = ""
-        self.compiled_definition = None
-        self.error = None
-        self.last_error = None
-        self.last_result = None
-        self.element_buffer = element_buffer
-
-    def compile_definition(self):
-        self.error = None
-        self.last_error = None
-        try:
-            self.compiled_definition = compile(self.definition, "<string>", "eval")
-        except SyntaxError as e:
-            self.compiled_definition = None
-            self.error = repr(e)
-            self.last_error = self.error
-
-    def set_definition(self, definition):
-        self.definition = definition
-        self.error = None
-        self.last_error = None
-        self.compiled_definition = None
-
-    def get_array(self):
-        return self.last_result
-
-    def render(self, screen: pg.Surface, coordinate_system: CoordinateSystem):
-        zero_point = coordinate_system.get_zero_point()
-        if self.compiled_definition:
-            # build eval locals
-            eval_locals = {'np': np, 'mm': transform_p, 'norm': normalize_vec}
-            for e in self.element_buffer.elements:
-                eval_locals[e.name] = e.get_array()
-            for t in self.element_buffer.transforms:
-                eval_locals[t.name] = t.get_array()
-            for t in self.element_buffer.transformed:
-                eval_locals[t.name] = t.get_array()
-
-            result = None
-            self.error = None
+class CustomTransformed(CustomTransformedBase):
+    @staticmethod
+    def get_eval_constants():
+        # the modules and functions, that can be used in definitions
+        return {'np': np, 'mm': transform_p, 'norm': normalize_vec, 'rot': rotation_matrix}
+
+    def set_result(self, result, error: Optional[str]):
+        """
+        Updates last_result, result_points and error from the result of an evaluation.
+        """
+        self.result_points = None
+        self.error = error
+        self.last_result = result
+        if not isinstance(result, np.ndarray) and isinstance(result, Iterable):
             try:
-                result = eval(self.compiled_definition, {}, eval_locals)
-            except Exception as e:
+                result = np.array(result)
+            except ValueError as e:
                 self.error = repr(e)
-
+        if isinstance(result, np.ndarray):
             self.last_result = result
-            if not isinstance(result, np.ndarray) and isinstance(result, Iterable):
-                try:
-                    result = np.array(result)
-                except ValueError as e:
-                    self.error = repr(e)
-            if isinstance(result, np.ndarray):
-                self.last_result = result
-                if result.shape == (2,):
-                    result = np.expand_dims(result, 0)
-                if result.shape[0] == 2 and len(result.shape) == 2:
-                    if self.visible:
-                        transformed_vecs = coordinate_system.transform(result).T
-                        # width = 3 if element.hovered else 1
-                        for point in transformed_vecs:
-                            if self.render_kind == RenderKind.POINT:
-                                pg.draw.circle(screen, RED, point, 3)
-                            elif self.render_kind == RenderKind.LINE:
-                                pg.draw.line(screen, RED, zero_point, point.real, width=1)
-                else:
-                    self.error = 'Invalid result shape: {}'.format(result.shape)
-            elif result is not None:
-                self.error = 'result is not numpy array'
-
-        if self.error:
-            if not (self.last_error and self.error == self.last_error):
-                print(self.error)
-        self.last_error = self.error
-
-    def handle_event(self, event: pg.event.Event, coordinate_system: CoordinateSystem, mouse_position: np.ndarray):
-        pass
+            if result.shape == (2,):
+                result = np.expand_dims(result, 0)
+            if result.shape[0] == 2 and len(result.shape) == 2:
+                self.result_points = result
+            else:
+                self.error = 'Invalid result shape: {}'.format(result.shape)
+        elif result is not None:
+            self.error = 'result is not numpy array'
+        self.report_error()
+
+    def render(
+            self, screen: pg.Surface, coordinate_system: CoordinateSystem, screen_points: Optional[np.ndarray] = None
+    ) -> Optional[pg.Rect]:
+        if screen_points is None:
+            points = self.get_render_points()
+            if points is None:
+                return None
+            screen_points = coordinate_system.transform(points)
+        if self.visible:
+            transformed_vecs = screen_points.T
+            # width = 3 if element.hovered else 1
+            if self.render_kind == RenderKind.POINT:
+                return draw_points(screen, RED, transformed_vecs, 3)
+            elif self.render_kind == RenderKind.LINE:
+                return draw_rays(screen, RED, coordinate_system.get_zero_point(), transformed_vecs)
+        return None
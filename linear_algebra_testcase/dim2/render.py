@@ -1,25 +1,250 @@
+from typing import Optional, Tuple, Dict, List, Hashable
+
 import numpy as np
 import pygame as pg
-from pygame import Surface, Color
+from pygame import Surface, Color, Rect
 
 from .coordinate_system import CoordinateSystem, DEFAULT_SCREEN_SIZE
-from linear_algebra_testcase.common.elements_core import ElementBuffer
+from linear_algebra_testcase.common.drawing import merge_rects
+from linear_algebra_testcase.common.elements_core import ElementBuffer, Element, render_elements
+from linear_algebra_testcase.common.fonts import text_cache
+from linear_algebra_testcase.common.profiler import FrameProfiler
 from linear_algebra_testcase.common.user_interface import UserInterface
 
 TARGET_NUM_POINTS = 12
 TARGET_DIVIDENDS = [1, 2.5, 5, 10]
+GRID_OVERSCAN = 2  # number of grid points that are drawn outside the screen in every direction
+LABEL_MARGIN = 100  # pixels, that are redrawn additionally next to exposed strips, to complete cut off labels
 
 
 def render(
     screen: Surface, coordinate_system: CoordinateSystem, element_buffer: ElementBuffer, render_font,
-    user_interface: UserInterface
+    user_interface: UserInterface, coordinate_system_layer: Optional['CoordinateSystemLayer'] = None
 ):
-    screen.fill(pg.Color(0, 0, 0))
-    draw_coordinate_system(screen, coordinate_system, render_font)
+    if coordinate_system_layer is not None:
+        coordinate_system_layer.render(screen, coordinate_system, render_font)
+    else:
+        screen.fill(pg.Color(0, 0, 0))
+        draw_coordinate_system(screen, coordinate_system, render_font)
     element_buffer.render(screen, coordinate_system)
     user_interface.render(screen)
 
 
+class CoordinateSystemLayer:
+    """
+    Caches the grid and the tick labels of the coordinate system on an off-screen surface.
+    The surface is only redrawn, if the coordinate system or the screen size changed. If the coordinate system was only
+    moved by whole pixels, the cached surface is scrolled and only the newly exposed strips are redrawn.
+    """
+    def __init__(self):
+        self.surface: Optional[Surface] = None
+        self.coord: Optional[np.ndarray] = None
+        self.axes_visible: Tuple[bool, bool] = (False, False)
+
+    def render(self, screen: Surface, coordinate_system: CoordinateSystem, render_font):
+        """
+        Blits the coordinate system onto the screen and redraws the cached surface before, if necessary.
+
+        :param screen: The screen to draw on
+        :param coordinate_system: The coordinate system to draw
+        :param render_font: The font used for the tick labels
+        """
+        if self.surface is None or self.surface.get_size() != screen.get_size():
+            self.surface = pg.Surface(screen.get_size(), 0, screen)
+            self.coord = None
+        if self.coord is None:
+            self._redraw(coordinate_system, render_font)
+        elif not np.array_equal(self.coord, coordinate_system.coord):
+            offset = self._get_scroll_offset(coordinate_system)
+            if offset is None:
+                self._redraw(coordinate_system, render_font)
+            else:
+                self._scroll(offset, coordinate_system, render_font)
+        screen.blit(self.surface, (0, 0))
+
+    def _get_scroll_offset(self, coordinate_system: CoordinateSystem) -> Optional[Tuple[int, int]]:
+        """
+        Returns the offset in pixels the cached surface has to be scrolled to match the given coordinate system or None,
+        if the surface has to be redrawn completely.
+        """
+        if not np.array_equal(self.coord[:2, :2], coordinate_system.coord[:2, :2]):
+            return None  # zoomed
+        offset = coordinate_system.coord[:2, 2] - self.coord[:2, 2]
+        rounded_offset = np.round(offset)
+        if not np.allclose(offset, rounded_offset, atol=1e-6):
+            return None
+        dx, dy = int(rounded_offset[0]), int(rounded_offset[1])
+        if abs(dx) >= self.surface.get_width() or abs(dy) >= self.surface.get_height():
+            return None
+        # tick labels are only drawn, if the corresponding axis is visible
+        if self._get_axes_visible(coordinate_system) != self.axes_visible:
+            return None
+        return dx, dy
+
+    def _get_axes_visible(self, coordinate_system: CoordinateSystem) -> Tuple[bool, bool]:
+        zero_point = np.floor(coordinate_system.get_zero_point())
+        return 0 < zero_point[1] < self.surface.get_height(), 0 < zero_point[0] < self.surface.get_width()
+
+    def _redraw(self, coordinate_system: CoordinateSystem, render_font):
+        self.surface.fill(pg.Color(0, 0, 0))
+        draw_coordinate_system(self.surface, coordinate_system, render_font)
+        self.coord = coordinate_system.coord.copy()
+        self.axes_visible = self._get_axes_visible(coordinate_system)
+
+    def _scroll(self, offset: Tuple[int, int], coordinate_system: CoordinateSystem, render_font):
+        dx, dy = offset
+        width, height = self.surface.get_size()
+        self.surface.scroll(dx, dy)
+
+        exposed_strips = []
+        if dx > 0:
+            exposed_strips.append(Rect(0, 0, dx + LABEL_MARGIN, height))
+        elif dx < 0:
+            exposed_strips.append(Rect(width + dx - LABEL_MARGIN, 0, -dx + LABEL_MARGIN, height))
+        if dy > 0:
+            exposed_strips.append(Rect(0, 0, width, dy + LABEL_MARGIN))
+        elif dy < 0:
+            exposed_strips.append(Rect(0, height + dy - LABEL_MARGIN, width, -dy + LABEL_MARGIN))
+
+        for strip in exposed_strips:
+            self.surface.set_clip(strip)
+            self.surface.fill(pg.Color(0, 0, 0))
+            draw_coordinate_system(self.surface, coordinate_system, render_font)
+        self.surface.set_clip(None)
+        self.coord = coordinate_system.coord.copy()
+
+
+class DirtyRectRenderer:
+    """
+    Renders frames by repainting only the screen regions, that changed since the last frame.
+    Every element reports the area it has drawn. If the render state of an element changed, its old and its new area
+    are repainted, together with all elements overlapping these areas. The user interface is repainted every frame.
+    If the coordinate system or the screen size changed, the whole screen is repainted.
+
+    The dirty areas are repainted on an off-screen surface without clipping and copied to the screen afterwards,
+    because pygame rasterizes clipped lines slightly different.
+    The overlay of an enabled profiler is repainted every frame like the user interface.
+    """
+    def __init__(
+            self, coordinate_system_layer: Optional[CoordinateSystemLayer] = None,
+            profiler: Optional[FrameProfiler] = None
+    ):
+        self.coordinate_system_layer = coordinate_system_layer or CoordinateSystemLayer()
+        self.profiler = profiler or FrameProfiler(enabled=False)
+        # maps id(element) to (element, render state, drawn rect) of the last frame
+        self.element_rects: Dict[int, Tuple[Element, Optional[Hashable], Optional[Rect]]] = {}
+        self.ui_rects: List[Rect] = []
+        self.coord: Optional[np.ndarray] = None
+        self.screen_size: Optional[Tuple[int, int]] = None
+        self.back_buffer: Optional[Surface] = None
+
+    def render(
+        self, screen: Surface, coordinate_system: CoordinateSystem, element_buffer: ElementBuffer, render_font,
+        user_interface: UserInterface
+    ) -> Optional[List[Rect]]:
+        """
+        Renders the next frame.
+
+        :return: The rects of the screen, that changed or None, if the whole screen was repainted.
+        """
+        with self.profiler.measure('elements'):
+            element_buffer.update()
+        elements = list(element_buffer.all_elements())
+        if (self.coord is None or self.screen_size != screen.get_size() or
+                not np.array_equal(self.coord, coordinate_system.coord)):
+            self.render_full(screen, coordinate_system, elements, render_font, user_interface)
+            return None
+
+        # render changed elements to find out their new area
+        dirty_rects = list(self.ui_rects)
+        element_rects = {}
+        changed_elements = []
+        for element in elements:
+            state = element.get_render_state()
+            entry = self.element_rects.get(id(element))
+            if entry is not None and entry[0] is element and state is not None and entry[1] == state:
+                element_rects[id(element)] = entry
+                continue
+            if entry is not None and entry[2] is not None:
+                dirty_rects.append(entry[2])
+            element_rects[id(element)] = (element, state, None)
+            if element.visible:
+                changed_elements.append(element)
+        with self.profiler.measure('elements'):
+            changed_rects = render_elements(self.back_buffer, coordinate_system, changed_elements)
+        for element, rect in zip(changed_elements, changed_rects):
+            if rect is not None:
+                dirty_rects.append(rect)
+            element_rects[id(element)] = (element, element_rects[id(element)][1], rect)
+        # removed elements
+        for key, (_element, _state, rect) in self.element_rects.items():
+            if key not in element_rects and rect is not None:
+                dirty_rects.append(rect)
+        self.element_rects = element_rects
+
+        self.ui_rects = user_interface.get_rects(screen)
+        dirty_rects.extend(self.ui_rects)
+        dirty_rects = merge_rects(rect.clip(screen.get_rect()) for rect in dirty_rects)
+        if not dirty_rects:
+            return []
+
+        # repaint dirty areas
+        with self.profiler.measure('coordinate_system'):
+            for dirty_rect in dirty_rects:
+                self.back_buffer.blit(self.coordinate_system_layer.surface, dirty_rect, dirty_rect)
+        with self.profiler.measure('elements'):
+            repaint_elements = []
+            for element in elements:
+                rect = element_rects[id(element)][2]
+                if element.visible and rect is not None and rect.collidelist(dirty_rects) != -1:
+                    repaint_elements.append(element)
+            render_elements(self.back_buffer, coordinate_system, repaint_elements)
+            for dirty_rect in dirty_rects:
+                screen.blit(self.back_buffer, dirty_rect, dirty_rect)
+        with self.profiler.measure('ui'):
+            user_interface.render(screen)
+        overlay_rect = self.render_overlay(screen, render_font)
+        if overlay_rect is not None:
+            dirty_rects.append(overlay_rect)
+        return dirty_rects
+
+    def render_full(
+        self, screen: Surface, coordinate_system: CoordinateSystem, elements: List[Element], render_font,
+        user_interface: UserInterface
+    ):
+        """
+        Repaints the whole screen and remembers the drawn areas of all elements.
+        """
+        if self.back_buffer is None or self.back_buffer.get_size() != screen.get_size():
+            self.back_buffer = pg.Surface(screen.get_size(), 0, screen)
+        with self.profiler.measure('coordinate_system'):
+            self.coordinate_system_layer.render(self.back_buffer, coordinate_system, render_font)
+        with self.profiler.measure('elements'):
+            visible_elements = [element for element in elements if element.visible]
+            rects = dict(zip(map(id, visible_elements), render_elements(self.back_buffer, coordinate_system,
+                                                                        visible_elements)))
+            self.element_rects = {
+                id(element): (element, element.get_render_state(), rects.get(id(element))) for element in elements
+            }
+            screen.blit(self.back_buffer, (0, 0))
+        with self.profiler.measure('ui'):
+            user_interface.render(screen)
+        self.ui_rects = user_interface.get_rects(screen)
+        self.render_overlay(screen, render_font)
+        self.coord = coordinate_system.coord.copy()
+        self.screen_size = screen.get_size()
+
+    def render_overlay(self, screen: Surface, render_font) -> Optional[Rect]:
+        """
+        Draws the overlay of the profiler. Its area is repainted in the next frame, so it disappears, when the profiler
+        is disabled.
+        """
+        overlay_rect = self.profiler.render_overlay(screen, render_font)
+        if overlay_rect is not None:
+            self.ui_rects.append(overlay_rect)
+        return overlay_rect
+
+
 def draw_coordinate_system(screen: Surface, coordinate_system: CoordinateSystem, render_font):
     def adapt_quotient(quotient):
         if quotient <= 0:
@@ -46,48 +271,49 @@ def draw_coordinate_system(screen: Surface, coordinate_system: CoordinateSystem,
     target_num_points = TARGET_NUM_POINTS * screen.get_width() // DEFAULT_SCREEN_SIZE[0]
     target_dividend = (extreme_points[1, 0] - extreme_points[0, 0]) / target_num_points
     dividend = adapt_quotient(target_dividend)
-    x_minimum = np.round(extreme_points[0, 0] / dividend) * dividend
-    x_maximum = np.round(extreme_points[1, 0] / dividend) * dividend
-    x_points = np.arange(x_minimum, x_maximum + dividend, dividend)
-    for x in x_points:
-        vertical_lines = np.array([[x, 0], [x, 0]])
-        transformed_vertical_lines = coordinate_system.transform(vertical_lines.T).T
-        transformed_vertical_lines[:, 1] = [0, screen.get_height()]
-        color = Color(30, 30, 30)
-        if x == 0:
-            color = Color(50, 50, 50)
-        pg.draw.line(screen, color, transformed_vertical_lines[0], transformed_vertical_lines[1])
-
-    y_minimum = np.round(extreme_points[1, 1] / dividend) * dividend
-    y_maximum = np.round(extreme_points[0, 1] / dividend) * dividend
-    y_points = np.arange(y_minimum, y_maximum + dividend, dividend)
-
-    for y in y_points:
-        horizontal_lines = np.array([[extreme_points[0, 0], y], [extreme_points[1, 0], y]])
-        transformed_horizontal_lines = coordinate_system.transform(horizontal_lines.T).T
-        transformed_horizontal_lines[:, 0] = [0, screen.get_width()]
-        color = Color(30, 30, 30)
-        if y == 0:
-            color = Color(50, 50, 50)
-        pg.draw.line(screen, color, transformed_horizontal_lines[0], transformed_horizontal_lines[1])
+    # Include some grid points outside the screen, so labels of these points are drawn partially. This way the result
+    # does not depend on the exact screen borders, which is necessary to scroll the CoordinateSystemLayer.
+    x_minimum = np.round(extreme_points[0, 0] / dividend) - GRID_OVERSCAN
+    x_maximum = np.round(extreme_points[1, 0] / dividend) + GRID_OVERSCAN
+    x_points = np.arange(x_minimum, x_maximum + 1) * dividend
+
+    y_minimum = np.round(extreme_points[1, 1] / dividend) - GRID_OVERSCAN
+    y_maximum = np.round(extreme_points[0, 1] / dividend) + GRID_OVERSCAN
+    y_points = np.arange(y_minimum, y_maximum + 1) * dividend
+
+    # transform all grid lines at once. Screen positions are floored (instead of truncated by pygame), so moving the
+    # coordinate system by whole pixels moves everything by exactly these pixels.
+    x_screen = np.floor(coordinate_system.transform(np.stack([x_points, np.zeros_like(x_points)]))[0]).astype(int)
+    y_screen = np.floor(coordinate_system.transform(np.stack([np.zeros_like(y_points), y_points]))[1]).astype(int)
+
+    for x, screen_x in zip(x_points, x_screen):
+        color = Color(50, 50, 50) if x == 0 else Color(30, 30, 30)
+        pg.draw.line(screen, color, (screen_x, 0), (screen_x, screen.get_height()))
+
+    for y, screen_y in zip(y_points, y_screen):
+        color = Color(50, 50, 50) if y == 0 else Color(30, 30, 30)
+        pg.draw.line(screen, color, (0, screen_y), (screen.get_width(), screen_y))
 
     # draw numbers
-    zero_point = coordinate_system.transform(np.array([0, 0]))
+    zero_point = np.floor(coordinate_system.transform(np.array([0, 0]))).astype(int)
+
+    def draw_number(value, position):
+        float_format = '{:.2f}' if abs(value) > 1 else '{:.2}'
+        text = float_format.format(value)
+        # skip labels outside the clip area (e.g. when only a strip of the CoordinateSystemLayer is redrawn)
+        if not clip_rect.colliderect(Rect(position, render_font.size(text))):
+            return
+        font = text_cache.render(render_font, text, pg.Color(120, 120, 120), pg.Color(0, 0, 0, 0))
+        screen.blit(font, position)
+
+    clip_rect = screen.get_clip()
 
     if 0 < zero_point[1] < screen.get_height():
-        for x in x_points:
+        for x, screen_x in zip(x_points, x_screen):
             if abs(x) > 10 ** -5:
-                float_format = '{:.2f}' if abs(x) > 1 else '{:.2}'
-                font = render_font.render(float_format.format(x), True, pg.Color(120, 120, 120), pg.Color(0, 0, 0, 0))
-                pos = coordinate_system.transform(np.array([x, 0]))
-                pos += 10
-                screen.blit(font, pos)
+                draw_number(x, (screen_x + 10, zero_point[1] + 10))
 
     if 0 < zero_point[0] < screen.get_width():
-        for y in y_points:
+        for y, screen_y in zip(y_points, y_screen):
             if abs(y) > 10 ** -5:
-                float_format = '{:.2f}' if abs(y) > 1 else '{:.2}'
-                font = render_font.render(float_format.format(y), True, pg.Color(120, 120, 120), pg.Color(0, 0, 0, 0))
-                pos = coordinate_system.transform(np.array([0, y]))
-                pos += 10
-                screen.blit(font, pos)
+                draw_number(y, (zero_point[0] + 10, screen_y + 10))
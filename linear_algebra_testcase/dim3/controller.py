@@ -1,4 +1,4 @@
-from itertools import chain
+from typing import Set
 
 import numpy as np
 import pygame as pg
@@ -7,16 +7,41 @@ from .coordinate_system import CoordinateSystem
 from linear_algebra_testcase.common.elements_core import ElementBuffer
 from linear_algebra_testcase.common.user_interface import UserInterface
 
+MOVE_SPEED = 0.02
+# the direction of the camera movement for every key
+MOVE_DIRECTIONS = {
+    pg.K_w: np.array([0.0, 0.0, -1.0]),
+    pg.K_a: np.array([-1.0, 0.0, 0.0]),
+    pg.K_s: np.array([0.0, 0.0, 1.0]),
+    pg.K_d: np.array([1.0, 0.0, 0.0]),
+    pg.K_SPACE: np.array([0.0, 1.0, 0.0]),
+    pg.K_LCTRL: np.array([0.0, -1.0, 0.0]),
+}
+
 
 class Controller:
     def __init__(self):
         self.running = True
+        self.update_needed = True
         self.is_dragging = False
         self.mouse_position = np.array(pg.mouse.get_pos(), dtype=int)
         self.controlling_camera = False
+        # the keys, that are held down. Tracked from the events instead of polling the keyboard, so replayed events
+        # move the camera as well.
+        self.pressed_keys: Set[int] = set()
 
     def handle_event(self, event, coordinate_system: CoordinateSystem, element_buffer: ElementBuffer,
                      user_interface: UserInterface):
+        if event.type == pg.MOUSEMOTION:
+            # a motion is handled at its new position, as it can be merged from several motions
+            self.mouse_position = np.array(event.pos, dtype=int)
+        elif event.type == pg.KEYDOWN:
+            self.pressed_keys.add(event.key)
+        elif event.type == pg.KEYUP:
+            self.pressed_keys.discard(event.key)
+        elif event.type == pg.WINDOWFOCUSLOST:
+            # key releases are not received without focus
+            self.pressed_keys.clear()
         user_interface.handle_event(event, self.mouse_position)
         if not user_interface.consuming_events(self.mouse_position):
             element_buffer.handle_event(event, coordinate_system, self.mouse_position)
@@ -26,21 +51,26 @@ class Controller:
             self.running = False
         elif event.type == pg.MOUSEBUTTONDOWN:
             if not user_interface.consuming_events(self.mouse_position):
-                self.is_dragging = True
-                for element in chain(element_buffer.elements, element_buffer.transforms):
-                    if element.is_hovered(self.mouse_position, coordinate_system):
-                        self.is_dragging = False
+                # dragging on an element does not move the coordinate system
+                self.is_dragging = not element_buffer.get_hovered_elements(self.mouse_position, coordinate_system)
         elif event.type == pg.MOUSEBUTTONUP:
             self.is_dragging = False
-        elif event.type == pg.MOUSEMOTION:
-            self.mouse_position = np.array(event.pos, dtype=int)
+        elif event.type in (pg.WINDOWENTER, pg.WINDOWFOCUSGAINED, pg.WINDOWEXPOSED, pg.WINDOWRESIZED):
+            # the window content has to be presented again, although the scene did not change
+            self.update_needed = True
         else:
             # print(event)
             pass
 
+    def is_moving(self) -> bool:
+        """
+        Returns whether a key is held, that moves the camera every frame.
+        """
+        return not self.pressed_keys.isdisjoint(MOVE_DIRECTIONS)
+
     def tick(self, coordinate_system, user_interface):
         if not user_interface.consuming_events(self.mouse_position):
-            handle_coordinate_system(coordinate_system)
+            handle_coordinate_system(coordinate_system, self.pressed_keys)
 
     def handle_coordinate_system_events(self, event, coordinate_system: CoordinateSystem):
         if self.controlling_camera:
@@ -50,26 +80,19 @@ class Controller:
                 coordinate_system.rotate(rotation)
         if event.type == pg.KEYUP:
             if event.key == pg.K_CAPSLOCK:
-                caps_active = bool(pg.key.get_mods() & pg.KMOD_CAPS)
+                caps_active = bool(event.mod & pg.KMOD_CAPS)
                 self.controlling_camera = caps_active
                 pg.event.set_grab(caps_active)
                 pg.mouse.set_visible(not caps_active)
 
 
-def handle_coordinate_system(coordinate_system: CoordinateSystem):
-    keys = pg.key.get_pressed()
-    speed = 0.02
-    if keys[pg.K_w]:
-        coordinate_system.move(np.array([0.0, 0.0, -speed]))
-    if keys[pg.K_a]:
-        coordinate_system.move(np.array([-speed, 0.0, 0.0]))
-    if keys[pg.K_s]:
-        coordinate_system.move(np.array([0.0, 0.0, speed]))
-    if keys[pg.K_d]:
-        coordinate_system.move(np.array([speed, 0.0, 0.0]))
-    if keys[pg.K_SPACE]:
-        coordinate_system.move(np.array([0.0, speed, 0.0]))
-    if keys[pg.K_LCTRL]:
-        coordinate_system.move(np.array([0.0, -speed, 0.0]))
+def handle_coordinate_system(coordinate_system: CoordinateSystem, keys: Set[int]):
+    # the directions of all pressed keys are added, so the view matrix is updated once per frame
+    direction = None
+    for key, key_direction in MOVE_DIRECTIONS.items():
+        if key in keys:
+            direction = key_direction if direction is None else direction + key_direction
+    if direction is not None:
+        coordinate_system.move(direction * MOVE_SPEED)
 
 
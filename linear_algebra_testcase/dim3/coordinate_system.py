@@ -1,15 +1,19 @@
 from __future__ import annotations
 import numpy as np
 from scipy.spatial.transform import Rotation
-from typing import Optional
+from typing import Optional, Sequence, List
 
-from linear_algebra_testcase.common.utils import normalize_vec, np_cross, prepare_vecs
+from linear_algebra_testcase.common.utils import normalize_vec, np_cross, prepare_vecs, GrowingBuffer
 
 DEFAULT_SCREEN_SIZE = np.array([1280, 720])
 
 
 class CoordinateSystem:
     def __init__(self, position: Optional[np.ndarray] = None):
+        self.version = 0
+        self._zero_point: Optional[np.ndarray] = None
+        self._batch_points = GrowingBuffer()
+        self._batch_result = GrowingBuffer()
         self.position = position if position is not None else np.array([0.0, 0.0, 0.0])
         self.screen_size = np.copy(DEFAULT_SCREEN_SIZE)
 
@@ -42,18 +46,23 @@ class CoordinateSystem:
 
     def _update_matrix(self):
         self.transformation_matrix = self.projection_matrix @ self.get_view_matrix()
+        self._zero_point = None
+        self.version += 1
 
     def get_zero_point(self):
         """
-        Get the zero point of the coordinate system in screen coordinates.
+        Get the zero point of the coordinate system in screen coordinates. The returned array must not be modified.
         """
-        return self.transform(np.array([0.0, 0.0, 0.0]), clip=False)
+        if self._zero_point is None:
+            self._zero_point = self.transform(np.array([0.0, 0.0, 0.0]), clip=False)
+            self._zero_point.flags.writeable = False
+        return self._zero_point
 
     def transform(self, vecs: np.ndarray, clip: bool = True) -> np.ndarray:
         """
         Transform the given world coordinates to screen coordinates.
 
-        :param vecs: A list of vectors with shape [N, 3] or [3,].
+        :param vecs: A list of vectors with shape [N, 3] or [3,] or homogeneous vectors with shape [N, 4].
         :param clip: Filter out vectors that are outside the clip space.
         :return: A list of vectors with shape [N, 3]. The z coordinate can be ignored for rendering on screen
         """
@@ -72,14 +81,68 @@ class CoordinateSystem:
             valid_indices = np.all(np.logical_and(proj_vecs < 1.0, proj_vecs > -1.0), axis=1)
             proj_vecs = proj_vecs[valid_indices]
 
-        # convert to screen space
+        self._to_screen_space(proj_vecs)
+        return proj_vecs
+
+    def transform_batch(self, arrays: Sequence[Optional[np.ndarray]]) -> List[Optional[np.ndarray]]:
+        """
+        Transforms the arrays of many elements with a single matrix multiplication. The arrays are copied into a
+        preallocated buffer of homogeneous coordinates, which is projected into a second preallocated buffer.
+        Vectors outside the clip space are not removed, use clip() for that.
+
+        :param arrays: A list of arrays with shape [N_i, 3] or [3,] or homogeneous arrays with shape [N_i, 4]. None
+                       entries are skipped.
+        :return: For every array a view of shape [N_i, 3] into the result buffer or None for None entries. The views
+                 are only valid until the next call of transform_batch().
+        """
+        arrays = [None if array is None else _cartesian_view(np.asarray(array)) for array in arrays]
+        total = sum(len(array) for array in arrays if array is not None)
+        points = self._batch_points.get((total, 4))
+        points[:, 3] = 1.0
+        offsets = []
+        offset = 0
+        for array in arrays:
+            offsets.append(offset)
+            if array is not None:
+                points[offset:offset + len(array), :3] = array
+                offset += len(array)
+
+        # projection and perspective division
+        proj_vecs = self._batch_result.get((total, 4))
+        np.matmul(points, self.transformation_matrix.T, out=proj_vecs)
+        proj_vecs[:, :3] /= proj_vecs[:, 3:]
+        self._to_screen_space(proj_vecs)
+        return [
+            None if array is None else proj_vecs[start:start + len(array), :3]
+            for array, start in zip(arrays, offsets)
+        ]
+
+    def clip(self, screen_vecs: np.ndarray) -> np.ndarray:
+        """
+        Removes the vectors, that are outside the clip space, from screen coordinates returned by transform_batch().
+
+        :param screen_vecs: Vectors in screen space of shape [N, 3].
+        :return: The vectors inside the clip space of shape [M, 3].
+        """
+        return screen_vecs[self.get_clip_mask(screen_vecs)]
+
+    def get_clip_mask(self, screen_vecs: np.ndarray) -> np.ndarray:
+        """
+        Returns for screen coordinates of shape [N, 3], which of them are inside the clip space.
+        """
+        return ((screen_vecs[:, 0] > 0.0) & (screen_vecs[:, 0] < self.screen_size[0]) &
+                (screen_vecs[:, 1] > 0.0) & (screen_vecs[:, 1] < self.screen_size[1]) &
+                (screen_vecs[:, 2] > -1.0) & (screen_vecs[:, 2] < 1.0))
+
+    def _to_screen_space(self, proj_vecs: np.ndarray):
+        """
+        Converts the given vectors in normalized device coordinates to screen space in place.
+        """
         proj_vecs[:, 1] *= -1.0  # invert y-axis
         proj_vecs[:, :2] = (proj_vecs[:, :2] + 1) / 2.0  # scale from [-1, 1] to [0, 1]
         proj_vecs[:, 0] *= self.screen_size[0]  # scale to screen size
         proj_vecs[:, 1] *= self.screen_size[1]  # scale to screen size
 
-        return proj_vecs
-
     def get_projection_matrix(self):
         projection_matrix = get_perspective_matrix(self.field_of_view, 16 / 9, self.near, self.far)
         return projection_matrix
@@ -95,6 +158,15 @@ class CoordinateSystem:
         return view_matrix
 
 
+def _cartesian_view(array: np.ndarray) -> np.ndarray:
+    """
+    Returns the cartesian part of shape [N, 3] of the given cartesian or homogeneous array.
+    """
+    if array.ndim == 2 and array.shape[1] == 4:
+        return array[:, :3]
+    return array.reshape(-1, 3)
+
+
 def get_perspective_matrix(angle: float, ratio: float, near: float, far: float) -> np.ndarray:
     perspective = np.zeros((4, 4))
     tan_half_angle = np.tan(angle / 2)
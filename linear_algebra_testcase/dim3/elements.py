@@ -4,42 +4,67 @@ import pygame as pg
 import numpy as np
 
 from .coordinate_system import CoordinateSystem
+from linear_algebra_testcase.common.drawing import draw_rays, draw_points, union_rects
 from linear_algebra_testcase.common.utils import normalize_vec
-from linear_algebra_testcase.common.elements_core import Element, RenderKind, RED, GREEN, snap, AXIS_COLORS
+from linear_algebra_testcase.common.elements_core import (Element, RenderKind, RED, snap, AXIS_COLORS,
+                                                           HomogeneousCoordinates)
+from linear_algebra_testcase.common.custom_transformed import CustomTransformedBase
 
 
 class Vector3D(Element):
-    def __init__(self, name: str, coordinates: np.ndarray, render_kind: RenderKind = RenderKind.LINE):
+    UNVERSIONED_ATTRIBUTES = Element.UNVERSIONED_ATTRIBUTES | {'dragged'}
+    EVENT_TYPES = Element.EVENT_TYPES | {pg.MOUSEBUTTONDOWN, pg.MOUSEBUTTONUP}
+
+    coordinates = HomogeneousCoordinates(dim=3, axis=1)
+
+    def __init__(
+            self, name: str, coordinates: np.ndarray, render_kind: RenderKind = RenderKind.LINE,
+            homogeneous: bool = False
+    ):
         super().__init__(name, render_kind)
+        self.homogeneous = homogeneous
         self.coordinates = coordinates.reshape((3, 1))
         self.dragged = False
 
     def is_hovered(self, mouse_position: np.ndarray, coordinate_system: CoordinateSystem):
         if not self.visible:
             return False
-        pos = coordinate_system.transform(self.get_array()).flatten()
+        if self.arena is not None:
+            return self.arena.is_hovered(self, mouse_position, coordinate_system)
+        pos = coordinate_system.transform(self.get_projectable_array()).flatten()
         if not len(pos):
             return False
         diff = np.sum((mouse_position - pos[:2])**2)
         return diff < 100
 
+    def has_mouse_state(self) -> bool:
+        return self.hovered or self.dragged
+
     def __repr__(self):
         return '[{:.2f} {:.2f} {:.2f}]'.format(self.coordinates[0], self.coordinates[1], self.coordinates[2])
 
     def get_array(self):
         return self.coordinates.reshape((1, 3))
 
-    def render(self, screen: pg.Surface, coordinate_system: CoordinateSystem):
-        transformed_vec = coordinate_system.transform(self.get_array()).flatten()
+    def get_render_points(self):
+        return self.get_projectable_array()
+
+    def render(
+            self, screen: pg.Surface, coordinate_system: CoordinateSystem, screen_points: Optional[np.ndarray] = None
+    ) -> Optional[pg.Rect]:
+        if screen_points is None:
+            transformed_vec = coordinate_system.transform(self.get_render_points()).flatten()
+        else:
+            transformed_vec = coordinate_system.clip(screen_points).flatten()
         if not len(transformed_vec):
-            return
+            return None
         width = 3 if self.hovered else 1
         if self.render_kind == RenderKind.POINT:
-            pg.draw.circle(screen, GREEN, transformed_vec[:2], width)
+            return pg.draw.circle(screen, self.get_color(), transformed_vec[:2], width)
         elif self.render_kind == RenderKind.LINE:
-            pg.draw.line(
-                screen, GREEN, coordinate_system.get_zero_point().flatten()[:2], transformed_vec[:2], width=width
-            )
+            zero_point = coordinate_system.get_zero_point().flatten()[:2]
+            return pg.draw.line(screen, self.get_color(), zero_point, transformed_vec[:2], width=width)
+        return None
 
     def handle_event(self, event: pg.event.Event, coordinate_system: CoordinateSystem, mouse_position: np.ndarray):
         super().handle_event(event, coordinate_system, mouse_position)
@@ -55,11 +80,16 @@ class Vector3D(Element):
 
 
 class MultiVectorObject3D(Element):
+    EVENT_TYPES = Element.EVENT_TYPES | {pg.MOUSEBUTTONDOWN, pg.MOUSEBUTTONUP}
+
+    coordinates = HomogeneousCoordinates(dim=3, axis=1)
+
     def __init__(
             self, name: str, coordinates: np.ndarray, line_indices: np.ndarray,
-            render_kind: RenderKind = RenderKind.LINE
+            render_kind: RenderKind = RenderKind.LINE, homogeneous: bool = False
     ):
         super().__init__(name, render_kind)
+        self.homogeneous = homogeneous
         self.coordinates = coordinates
         self.line_indices = line_indices
         self.dragged = False
@@ -67,7 +97,7 @@ class MultiVectorObject3D(Element):
     @classmethod
     def create_cube(
             cls, name: str, bot_left_back: np.ndarray, top_right_front: np.ndarray,
-            render_kind: RenderKind = RenderKind.POINT
+            render_kind: RenderKind = RenderKind.POINT, homogeneous: bool = False
     ) -> Self:
         x1, y1, z1 = bot_left_back
         x2, y2, z2 = top_right_front
@@ -98,31 +128,45 @@ class MultiVectorObject3D(Element):
             [2, 6],
             [3, 7],
         ])
-        return MultiVectorObject3D(name, coordinates, line_indices, render_kind)
+        return MultiVectorObject3D(name, coordinates, line_indices, render_kind, homogeneous)
 
     def is_hovered(self, mouse_position: np.ndarray, coordinate_system: CoordinateSystem):
         if not self.visible:
             return False
-        pos = coordinate_system.transform(self.coordinates)[:, :2]
+        if self.arena is not None:
+            return self.arena.is_hovered(self, mouse_position, coordinate_system)
+        pos = coordinate_system.transform(self.get_projectable_array())[:, :2]
         diffs = np.sum((mouse_position.reshape(1, 2) - pos)**2, axis=1)
         return np.any(diffs < 100)
 
+    def has_mouse_state(self) -> bool:
+        return self.hovered or self.dragged
+
     def __repr__(self):
         return '[{:.2f} {:.2f}]'.format(self.coordinates[0], self.coordinates[1])
 
     def get_array(self):
         return self.coordinates
 
-    def render(self, screen: pg.Surface, coordinate_system: CoordinateSystem):
-        transformed_points = coordinate_system.transform(self.coordinates, clip=False)[:, :2]
+    def get_render_points(self):
+        return self.get_projectable_array()
+
+    def render(
+            self, screen: pg.Surface, coordinate_system: CoordinateSystem, screen_points: Optional[np.ndarray] = None
+    ) -> Optional[pg.Rect]:
+        if screen_points is None:
+            screen_points = coordinate_system.transform(self.get_render_points(), clip=False)
+        transformed_points = screen_points[:, :2]
         width = 3 if self.hovered else 1
         if self.render_kind == RenderKind.POINT:
-            for index, point in enumerate(transformed_points):
-                pg.draw.circle(screen, GREEN, point, width)
+            return draw_points(screen, self.get_color(), transformed_points, width)
         elif self.render_kind == RenderKind.LINE:
+            rects = []
             for indices in self.line_indices:
                 points = transformed_points[indices]
-                pg.draw.line(screen, GREEN, points[0], points[1], width=width)
+                rects.append(pg.draw.line(screen, self.get_color(), points[0], points[1], width=width))
+            return union_rects(rects)
+        return None
 
     def handle_event(self, event: pg.event.Event, coordinate_system: CoordinateSystem, mouse_position: np.ndarray):
         super().handle_event(event, coordinate_system, mouse_position)
@@ -138,6 +182,9 @@ class MultiVectorObject3D(Element):
 
 
 class Transform3D(Element):
+    UNVERSIONED_ATTRIBUTES = Element.UNVERSIONED_ATTRIBUTES | {'dragged_index'}
+    EVENT_TYPES = Element.EVENT_TYPES | {pg.MOUSEBUTTONDOWN, pg.MOUSEBUTTONUP}
+
     def __init__(self, name: str, render_kind: RenderKind = RenderKind.LINE):
         super().__init__(name, render_kind)
         self.matrix = np.eye(3)
@@ -145,26 +192,44 @@ class Transform3D(Element):
         self.hovered_index = None
 
     def get_array(self):
-        return snap(self.matrix)
+        return self.memoize('array', lambda: snap(self.matrix))
 
-    def render(self, screen: pg.Surface, coordinate_system: CoordinateSystem):
-        transformed_vecs = coordinate_system.transform(self.get_array().T, clip=False)[:, :2]
+    def get_render_points(self):
+        return self.get_array().T
+
+    def render(
+            self, screen: pg.Surface, coordinate_system: CoordinateSystem, screen_points: Optional[np.ndarray] = None
+    ) -> Optional[pg.Rect]:
+        if screen_points is None:
+            screen_points = coordinate_system.transform(self.get_render_points(), clip=False)
+        transformed_vecs = screen_points[:, :2]
         zero_point = coordinate_system.get_zero_point().flatten()[:2]
+        rects = []
         for i, transformed_vec in enumerate(transformed_vecs):
             width = 3 if self.hovered_index == i else 1
             color = AXIS_COLORS[i]
             if self.render_kind == RenderKind.POINT:
-                pg.draw.circle(screen, color, transformed_vec, width)
+                rects.append(pg.draw.circle(screen, color, transformed_vec, width))
             elif self.render_kind == RenderKind.LINE:
-                pg.draw.line(screen, color, zero_point, transformed_vec, width=width)
+                rects.append(pg.draw.line(screen, color, zero_point, transformed_vec, width=width))
+        return union_rects(rects)
 
     def is_hovered(self, mouse_position: np.ndarray, coordinate_system: CoordinateSystem):
         return self.hovered_index is not None
 
+    def has_mouse_state(self) -> bool:
+        return self.hovered or self.hovered_index is not None or self.dragged_index is not None
+
+    def get_render_state(self):
+        return super().get_render_state() + (self.hovered_index,)
+
     def get_hovered_index(self, mouse_position: np.ndarray, coordinate_system: CoordinateSystem) -> Optional[int]:
         if not self.visible:
             return None
-        pos = coordinate_system.transform(self.get_array(), clip=False)[:, :2]
+        pos = self.memoize(
+            'hover_points', lambda: coordinate_system.transform(self.get_array(), clip=False)[:, :2],
+            key=(coordinate_system, coordinate_system.version)
+        )
         diff = np.sum((mouse_position - pos)**2, axis=1)
         indices: np.ndarray = np.where(diff < 100)[0]
         if len(indices):
@@ -185,6 +250,9 @@ class Transform3D(Element):
 
 
 class Translate3D(Element):
+    UNVERSIONED_ATTRIBUTES = Element.UNVERSIONED_ATTRIBUTES | {'dragged_index'}
+    EVENT_TYPES = Element.EVENT_TYPES | {pg.MOUSEBUTTONDOWN, pg.MOUSEBUTTONUP}
+
     def __init__(self, name: str, render_kind: RenderKind = RenderKind.LINE):
         super().__init__(name, render_kind)
         self.matrix = np.eye(4)
@@ -192,35 +260,48 @@ class Translate3D(Element):
         self.hovered_index = None
 
     def get_array(self):
-        return snap(self.matrix)
+        return self.memoize('array', lambda: snap(self.matrix))
 
-    def get_render_locations(self, coordinate_system: CoordinateSystem):
+    def get_render_points(self):
+        """
+        Returns the tips of the three axes and the offset in world coordinates with shape [4, 3].
+        """
         vecs = self.get_array().T[:3]
         offset = vecs[:, 3].reshape(1, 3)
-        first_vecs = vecs[:, :3] + offset
-        first_vecs_transformed = coordinate_system.transform(first_vecs, clip=False)[:, :2]
-        offset_transformed = coordinate_system.transform(offset, clip=False)[:, :2]
-        return np.concatenate([first_vecs_transformed, offset_transformed.reshape(1, 2)], axis=0)
+        return np.concatenate([vecs[:, :3] + offset, offset], axis=0)
 
-    def render(self, screen: pg.Surface, coordinate_system: CoordinateSystem):
-        render_locations = self.get_render_locations(coordinate_system)
+    def get_render_locations(self, coordinate_system: CoordinateSystem):
+        return coordinate_system.transform(self.get_render_points(), clip=False)[:, :2]
+
+    def render(
+            self, screen: pg.Surface, coordinate_system: CoordinateSystem, screen_points: Optional[np.ndarray] = None
+    ) -> Optional[pg.Rect]:
+        if screen_points is None:
+            render_locations = self.get_render_locations(coordinate_system)
+        else:
+            render_locations = screen_points[:, :2]
         offset_location = render_locations[3]
         zero_point = coordinate_system.get_zero_point().flatten()[:2]
+        rects = []
         for i, transformed_vec in enumerate(render_locations):
             width = 3 if self.hovered_index == i else 1
             color = AXIS_COLORS[i]
             if self.render_kind == RenderKind.POINT:
-                pg.draw.circle(screen, color, transformed_vec, width)
+                rects.append(pg.draw.circle(screen, color, transformed_vec, width))
             elif self.render_kind == RenderKind.LINE:
                 if i < 3:
-                    pg.draw.line(screen, color, offset_location, transformed_vec, width=width)
+                    rects.append(pg.draw.line(screen, color, offset_location, transformed_vec, width=width))
                 else:
-                    pg.draw.line(screen, color, zero_point, offset_location, width=width)
+                    rects.append(pg.draw.line(screen, color, zero_point, offset_location, width=width))
+        return union_rects(rects)
 
     def get_hovered_index(self, mouse_position: np.ndarray, coordinate_system: CoordinateSystem) -> Optional[int]:
         if not self.visible:
             return None
-        pos = self.get_render_locations(coordinate_system)[:, :2]
+        pos = self.memoize(
+            'hover_points', lambda: self.get_render_locations(coordinate_system)[:, :2],
+            key=(coordinate_system, coordinate_system.version)
+        )
         diff = np.sum((mouse_position - pos)**2, axis=1)
         indices: np.ndarray = np.where(diff < 100)[0]
         if len(indices):
@@ -230,6 +311,12 @@ class Translate3D(Element):
     def is_hovered(self, _mouse_position: np.ndarray, _coordinate_system: CoordinateSystem):
         return self.hovered_index is not None
 
+    def has_mouse_state(self) -> bool:
+        return self.hovered or self.hovered_index is not None or self.dragged_index is not None
+
+    def get_render_state(self):
+        return super().get_render_state() + (self.hovered_index,)
+
     def handle_event(self, event: pg.event.Event, coordinate_system: CoordinateSystem, mouse_position: np.ndarray):
         super().handle_event(event, coordinate_system, mouse_position)
         if event.type == pg.MOUSEBUTTONDOWN:
@@ -245,6 +332,8 @@ class Translate3D(Element):
 
 
 class Transformed(Element):
+    EVENT_TYPES = frozenset()
+
     def __init__(
             self, name: str, element: Union[None, MultiVectorObject3D], transform: None | Transform3D | Translate3D,
             render_kind: RenderKind
@@ -255,118 +344,116 @@ class Transformed(Element):
 
     def get_position(self):
         if self.element is not None and self.transform is not None:
-            transform = self.transform.get_array()
-            element = self.element.get_array()
-            # print('-------------------')
-            # print('element (before pad):\n', element)
-            # if affine transform
-            if transform.shape[0] == 4:
+            return self.memoize('position', self._compute_position)
+
+    def _compute_position(self):
+        transform = self.transform.get_array()
+        # print('-------------------')
+        # if affine transform
+        if transform.shape[0] == 4:
+            # homogeneous elements need no padding
+            element = self.element.get_projectable_array()
+            if element.shape[1] == 3:
                 element = np.pad(element, ((0, 0), (0, 1)), 'constant', constant_values=1.0)
-            # print('element (with pad):\n', element)
-            # print('transform:\n', transform)
-            # result = element @ transform
-            result = (transform @ element.T).T
-            # print('result:', result)
-            if transform.shape[0] == 4:
-                result = result[:, :3]
-            return result
+        else:
+            element = self.element.get_array()
+        # print('element (with pad):\n', element)
+        # print('transform:\n', transform)
+        # result = element @ transform
+        result = (transform @ element.T).T
+        # print('result:', result)
+        if transform.shape[0] == 4:
+            result = result[:, :3]
+        return result
+
+    def get_dependencies(self):
+        return [dependency for dependency in (self.element, self.transform) if dependency is not None]
+
+    def get_version(self):
+        element_version = self.element.get_version() if self.element is not None else None
+        transform_version = self.transform.get_version() if self.transform is not None else None
+        return self.version, element_version, transform_version
+
+    def update(self):
+        self.get_position()
 
     def get_array(self):
         return self.get_position()
 
-    def render(self, screen: pg.Surface, coordinate_system: CoordinateSystem):
-        points = self.get_position()
-        if points is None:
-            return
+    def get_render_points(self):
+        return self.get_position()
+
+    def render(
+            self, screen: pg.Surface, coordinate_system: CoordinateSystem, screen_points: Optional[np.ndarray] = None
+    ) -> Optional[pg.Rect]:
+        if screen_points is None:
+            points = self.get_position()
+            if points is None:
+                return None
+            screen_points = coordinate_system.transform(points)
+        else:
+            screen_points = coordinate_system.clip(screen_points)
         zero_point = coordinate_system.get_zero_point().flatten()[:2]
-        transformed_vec = coordinate_system.transform(points)
-        for point in transformed_vec[:, :2]:
-            if self.render_kind == RenderKind.POINT:
-                pg.draw.circle(screen, RED, point, 3)
-            elif self.render_kind == RenderKind.LINE:
-                pg.draw.line(screen, RED, zero_point, point, width=1)
+        transformed_vec = screen_points
+        if self.render_kind == RenderKind.POINT:
+            return draw_points(screen, RED, transformed_vec[:, :2], 3)
+        elif self.render_kind == RenderKind.LINE:
+            return draw_rays(screen, RED, zero_point, transformed_vec[:, :2])
+        return None
 
     def handle_event(self, event: pg.event.Event, coordinate_system: CoordinateSystem, mouse_position: np.ndarray):
         pass
 
 
-class CustomTransformed(Element):
-    def __init__(self, name: str, render_kind: RenderKind, element_buffer):
-        super().__init__(name, render_kind)
-        self.definition = ""
-        self.compiled_definition = None
-        self.error = None
-        self.last_error = None
-        self.last_result = None
-        self.element_buffer = element_buffer
-
-    def compile_definition(self):
-        self.error = None
-        self.last_error = None
-        try:
-            self.compiled_definition = compile(self.definition, "<string>", "eval")
-        except SyntaxError as e:
-            self.compiled_definition = None
-            self.error = repr(e)
-            self.last_error = self.error
-
-    def set_definition(self, definition):
-        self.definition = definition
-        self.error = None
-        self.last_error = None
-        self.compiled_definition = None
-
-    def get_array(self):
-        return self.last_result
-
-    def render(self, screen: pg.Surface, coordinate_system: CoordinateSystem):
-        zero_point = coordinate_system.get_zero_point()
-        if self.compiled_definition:
-            # build eval locals
-            # eval_locals = {'np': np, 'mm': transform_p, 'norm': normalize_vec}
-            eval_locals = {'np': np, 'norm': normalize_vec}
-            for e in self.element_buffer.elements:
-                eval_locals[e.name] = e.get_array()
-            for t in self.element_buffer.transforms:
-                eval_locals[t.name] = t.get_array()
-            for t in self.element_buffer.transformed:
-                eval_locals[t.name] = t.get_array()
-
-            result = None
-            self.error = None
+class CustomTransformed(CustomTransformedBase):
+    @staticmethod
+    def get_eval_constants():
+        # the modules and functions, that can be used in definitions
+        return {'np': np, 'norm': normalize_vec}
+
+    def set_result(self, result, error: Optional[str]):
+        """
+        Updates last_result, result_points and error from the result of an evaluation. Results of shape [N, 3] are
+        points like the arrays of MultiVectorObject3D, results of shape [3, N] are vectors like the columns of a matrix
+        and are transposed. A result of shape [3, 3] is read as [N, 3].
+        """
+        self.result_points = None
+        self.error = error
+        self.last_result = result
+        if not isinstance(result, np.ndarray) and isinstance(result, Iterable):
             try:
-                result = eval(self.compiled_definition, {}, eval_locals)
-            except Exception as e:
+                result = np.array(result)
+            except ValueError as e:
                 self.error = repr(e)
-
+        if isinstance(result, np.ndarray):
             self.last_result = result
-            if not isinstance(result, np.ndarray) and isinstance(result, Iterable):
-                try:
-                    result = np.array(result)
-                except ValueError as e:
-                    self.error = repr(e)
-            if isinstance(result, np.ndarray):
-                self.last_result = result
-                if result.shape == (2,):
-                    result = np.expand_dims(result, 0)
-                if result.shape[0] == 2 and len(result.shape) == 2:
-                    if self.visible:
-                        transformed_vecs = coordinate_system.transform(result).T
-                        # width = 3 if element.hovered else 1
-                        for point in transformed_vecs:
-                            if self.render_kind == RenderKind.POINT:
-                                pg.draw.circle(screen, RED, point, 3)
-                            elif self.render_kind == RenderKind.LINE:
-                                pg.draw.line(screen, RED, zero_point, point.real, width=1)
-                else:
-                    self.error = 'Invalid result shape: {}'.format(result.shape)
-            elif result is not None:
-                self.error = 'result is not numpy array'
-
-        if self.error:
-            if not (self.last_error and self.error == self.last_error):
-                print(self.error)
-        self.last_error = self.error
-
-    def handle_event(self, event: pg.event.Event, coordinate_system: CoordinateSystem, mouse_position: np.ndarray):
-        pass
+            if result.shape == (3,):
+                result = result.reshape(1, 3)
+            if len(result.shape) == 2 and result.shape[1] == 3:
+                self.result_points = result
+            elif len(result.shape) == 2 and result.shape[0] == 3:
+                self.result_points = result.T
+            else:
+                self.error = 'Invalid result shape: {}'.format(result.shape)
+        elif result is not None:
+            self.error = 'result is not numpy array'
+        self.report_error()
+
+    def render(
+            self, screen: pg.Surface, coordinate_system: CoordinateSystem, screen_points: Optional[np.ndarray] = None
+    ) -> Optional[pg.Rect]:
+        if screen_points is None:
+            points = self.get_render_points()
+            if points is None:
+                return None
+            screen_points = coordinate_system.transform(points)
+        else:
+            screen_points = coordinate_system.clip(screen_points)
+        if self.visible:
+            zero_point = coordinate_system.get_zero_point().flatten()[:2]
+            # width = 3 if element.hovered else 1
+            if self.render_kind == RenderKind.POINT:
+                return draw_points(screen, RED, screen_points[:, :2], 3)
+            elif self.render_kind == RenderKind.LINE:
+                return draw_rays(screen, RED, zero_point, screen_points[:, :2])
+        return None
@@ -1,9 +1,12 @@
+from typing import Optional
+
 import numpy as np
 import pygame as pg
 from pygame import Surface
 
 from .coordinate_system import CoordinateSystem
 from linear_algebra_testcase.common.elements_core import ElementBuffer
+from linear_algebra_testcase.common.profiler import FrameProfiler
 from linear_algebra_testcase.common.user_interface import UserInterface
 from linear_algebra_testcase.common.utils import gray
 
@@ -13,12 +16,18 @@ TARGET_DIVIDENDS = [1, 2.5, 5, 10]
 
 def render(
     screen: Surface, coordinate_system: CoordinateSystem, element_buffer: ElementBuffer, render_font,
-    user_interface: UserInterface
+    user_interface: UserInterface, profiler: Optional[FrameProfiler] = None
 ):
-    screen.fill(pg.Color(0, 0, 0))
-    draw_coordinate_system(screen, coordinate_system, render_font)
-    element_buffer.render(screen, coordinate_system)
-    user_interface.render(screen)
+    if profiler is None:
+        profiler = FrameProfiler(enabled=False)
+    with profiler.measure('coordinate_system'):
+        screen.fill(pg.Color(0, 0, 0))
+        draw_coordinate_system(screen, coordinate_system, render_font)
+    with profiler.measure('elements'):
+        element_buffer.render(screen, coordinate_system)
+    with profiler.measure('ui'):
+        user_interface.render(screen)
+    profiler.render_overlay(screen, render_font)
 
 
 def draw_coordinate_system(screen: Surface, coordinate_system: CoordinateSystem, render_font):
@@ -10,6 +10,9 @@ case "$1" in
 	r)
 		python3 -m linear_algebra_testcase.dim3.coordinate_system
 		;;
+	b)
+		python3 -m linear_algebra_testcase.benchmarks.suite
+		;;
 	*)
 		echo "invalid option"
 		;;
@@ -1,3 +1,6 @@
 #!/bin/bash
 
-pytest --pyargs src/coordinate_system.py
+pytest linear_algebra_testcase/dim2/coordinate_system.py linear_algebra_testcase/dim3/coordinate_system.py \
+    linear_algebra_testcase/common/expressions.py linear_algebra_testcase/common/custom_transformed.py \
+    linear_algebra_testcase/common/evaluation.py \
+    linear_algebra_testcase/benchmarks/allocations.py